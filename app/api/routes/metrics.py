@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from app.services.aggregation import aggregation_service
+from app.services.websocket import websocket_manager
+from app.core.cache import cache_manager
+from app.core.http import http_pool
+
+router = APIRouter()
+
+def upstream_stats(client) -> dict:
+    return {
+        "http_pool": http_pool.get_stats(client.pool_name),
+        "resilience": client.guard.get_stats(),
+        "single_flight": dict(client.flights.stats),
+        "rate_limiter": dict(client.limiter.stats, queue_depth=client.limiter.queue_depth)
+    }
+
+def upstream_clients() -> dict:
+    """Every upstream client once; the DexScreener and Jupiter sources share the service's clients"""
+    clients = {"dexscreener": aggregation_service.dexscreener, "jupiter": aggregation_service.jupiter}
+    for source in aggregation_service.sources:
+        clients.setdefault(source.name, source.client)
+    return clients
+
+@router.get("/metrics")
+async def get_metrics():
+    """Operational counters for upstream clients and WebSocket delivery"""
+    return {
+        "upstream": {name: upstream_stats(client) for name, client in upstream_clients().items()},
+        "sources": aggregation_service.source_fan_in.get_stats(),
+        "leader": aggregation_service.election.get_stats(),
+        "refresh": aggregation_service.refresh_scheduler.get_stats(),
+        "cache": cache_manager.get_stats(),
+        "stale_while_revalidate": {
+            "token_detail": aggregation_service.detail_swr.get_stats(),
+            "token_list": aggregation_service.snapshot_swr.get_stats()
+        },
+        "websocket": websocket_manager.get_stats()
+    }
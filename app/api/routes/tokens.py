@@ -1,13 +1,20 @@
 # app/api/routes/tokens.py
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from typing import Optional, List
-from app.models.token import TokenData, TokenListResponse
-from app.services.aggregation import aggregation_service
+from datetime import datetime, timedelta
+from app.models.token import TokenData, TokenListResponse, Candle, OHLCVResponse
+from app.services.aggregation import aggregation_service, token_age
+from app.services.price_history import price_history_service, naive_utc, INTERVALS
 
 router = APIRouter()
 
+def set_age(response: Response, age: float):
+    """Age header (RFC 9111): whole seconds since the data was fetched upstream"""
+    response.headers["Age"] = str(int(age))
+
 @router.get("/tokens", response_model=TokenListResponse)
 async def get_tokens(
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
     cursor: Optional[str] = Query(None),
     sort_by: str = Query("volume_sol", regex="^(volume_sol|market_cap_sol|price_1hr_change)$"),
@@ -22,16 +29,55 @@ async def get_tokens(
             time_filter=time_filter,
             search=search
         )
+        if tokens.get("snapshot_age") is not None:
+            set_age(response, tokens["snapshot_age"])
         return tokens
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/tokens/{token_address}/ohlcv", response_model=OHLCVResponse)
+async def get_token_ohlcv(
+    token_address: str,
+    interval: str = Query("1m", regex="^(1m|5m|1h)$"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None)
+):
+    # Clients usually send aware timestamps; candles are stored in naive UTC
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else None
+    # Default to the last 100 candles of the requested interval
+    start = start or end - timedelta(seconds=INTERVALS[interval] * 100)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        rows = await price_history_service.get_candles(token_address, interval, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return OHLCVResponse(
+        token_address=token_address,
+        interval=interval,
+        candles=[
+            Candle(
+                bucket_start=row.bucket_start,
+                open=row.open,
+                high=row.high,
+                low=row.low,
+                close=row.close,
+                volume_sol=row.volume_sol,
+                samples=row.samples
+            )
+            for row in rows
+        ]
+    )
+
 @router.get("/tokens/{token_address}", response_model=TokenData)
-async def get_token(token_address: str):
+async def get_token(token_address: str, response: Response):
     try:
         token = await aggregation_service.get_token_by_address(token_address)
         if not token:
             raise HTTPException(status_code=404, detail="Token not found")
+        if isinstance(token, TokenData):
+            set_age(response, token_age(token))
         return token
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,34 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.services.websocket import websocket_manager
+from app.services.aggregation import aggregation_service
+from app.services.subscriptions import TokenFilter
 import json
 
 router = APIRouter()
 
+async def subscribe_scoped(websocket: WebSocket, message: dict):
+    """Subscribe to explicit token addresses and/or a server-side filter"""
+    addresses = message.get("addresses")
+    if addresses is not None and (not isinstance(addresses, list) or not all(isinstance(a, str) for a in addresses)):
+        raise ValueError("addresses must be a list of token addresses")
+    token_filter = TokenFilter.from_message(message["filter"]) if "filter" in message else None
+    
+    snapshot = aggregation_service.broadcast_snapshot
+    if addresses:
+        websocket_manager.subscribe_tokens(websocket, addresses)
+    if token_filter is not None:
+        websocket_manager.subscribe_filter(websocket, token_filter, snapshot)
+    
+    await websocket_manager.send_personal(websocket, {
+        "type": "subscription_confirmed",
+        "addresses": addresses or [],
+        "filter": message.get("filter")
+    })
+    # Subscription deltas that follow apply on top of this snapshot
+    await websocket_manager.send_personal(
+        websocket, websocket_manager.subscription_snapshot_message(websocket, snapshot)
+    )
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket_manager.connect(websocket)
@@ -12,12 +37,37 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             message = json.loads(data)
             
-            if message.get("type") == "subscribe":
+            if message.get("type") == "subscribe" and ("addresses" in message or "filter" in message):
+                try:
+                    await subscribe_scoped(websocket, message)
+                except ValueError as e:
+                    await websocket_manager.send_personal(websocket, {"type": "error", "message": str(e)})
+            
+            elif message.get("type") == "subscribe":
                 topic = message.get("topic", "tokens")
                 websocket_manager.subscribe(websocket, topic)
-                await websocket.send_text(json.dumps({
+                await websocket_manager.send_personal(websocket, {
                     "type": "subscription_confirmed",
                     "topic": topic
-                }))
+                })
+                if topic == "tokens":
+                    # Deltas that follow apply on top of this snapshot
+                    await websocket_manager.send_personal(websocket, aggregation_service.token_snapshot_message())
+            
+            elif message.get("type") == "unsubscribe":
+                if "topic" in message:
+                    websocket_manager.unsubscribe(websocket, message["topic"])
+                else:
+                    websocket_manager.unsubscribe_tokens(websocket, message.get("addresses"))
+            
+            elif message.get("type") == "resync":
+                # Client missed a delta sequence number
+                if message.get("scope") == "subscription":
+                    await websocket_manager.send_personal(
+                        websocket,
+                        websocket_manager.subscription_snapshot_message(websocket, aggregation_service.broadcast_snapshot)
+                    )
+                else:
+                    await websocket_manager.send_personal(websocket, aggregation_service.token_snapshot_message())
     except WebSocketDisconnect:
-        websocket_manager.disconnect(websocket)
\ No newline at end of file
+        websocket_manager.disconnect(websocket)
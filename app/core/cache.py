@@ -1,45 +1,264 @@
 # app/core/cache.py
 import aioredis
+import asyncio
+import fnmatch
 import json
-from typing import Optional, Any
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Tuple
 from app.config import settings
+from app.core.codecs import encode, decode, get_codec
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+TAG_PREFIX = "cache:tag:"
+SCAN_COUNT = 500  # keys examined per SCAN step
+UNLINK_BATCH = 100  # keys per UNLINK command
+
+_MISSING = object()
+
+def _as_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+class LocalCache:
+    """Size-bounded in-process LRU whose entries also expire after a TTL.
+
+    Values are shared between readers, so callers must not mutate them.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 2.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def delete_matching(self, pattern: str):
+        for key in [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
 
 class CacheManager:
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
-    
+        self.local = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_TTL)
+        self.instance_id = uuid.uuid4().hex
+        self.stats = {"l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0}
+        self._listener: Optional[asyncio.Task] = None
+        self.codec = get_codec(settings.CACHE_CODEC)
+        self.compress_min_bytes = settings.CACHE_COMPRESS_MIN_BYTES
+
     async def connect(self):
+        # Values may be binary-framed (see app/core/codecs.py), so keep raw bytes
         self.redis = await aioredis.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
-            decode_responses=True
+            decode_responses=False
         )
-    
+        # Other workers tell us when they overwrite keys we may hold in L1
+        self._listener = asyncio.create_task(self._listen_for_invalidations())
+
     async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self.stats["l1_hits"] += 1
+            return value
+        self.stats["l1_misses"] += 1
+
         if not self.redis:
             return None
         try:
             data = await self.redis.get(key)
-            return json.loads(data) if data else None
+            value = decode(data) if data else None
         except Exception:
             return None
-    
-    async def set(self, key: str, value: Any, ttl: int = 30):
+
+        if value is None:
+            self.stats["l2_misses"] += 1
+        else:
+            self.stats["l2_hits"] += 1
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int = 30, tags: Optional[List[str]] = None):
         if not self.redis:
             return
         try:
-            await self.redis.setex(key, ttl, json.dumps(value, default=str))
+            if tags:
+                await self.set_many({key: value}, ttl=ttl, tags=tags)
+                return
+            await self.redis.setex(key, ttl, self._encode(value))
+            await self._invalidate(keys=[key])
         except Exception:
             pass
     
-    async def delete(self, pattern: str):
-        if not self.redis:
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Fetch several keys, going to Redis in one round-trip for L1 misses only"""
+        values: List[Optional[Any]] = []
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            value = self.local.get(key)
+            if value is _MISSING:
+                missing.append(i)
+                value = None
+            values.append(value)
+        self.stats["l1_hits"] += len(keys) - len(missing)
+        self.stats["l1_misses"] += len(missing)
+
+        if not self.redis or not missing:
+            return values
+        try:
+            fetched = await self.redis.mget([keys[i] for i in missing])
+        except Exception:
+            return values
+
+        for i, data in zip(missing, fetched):
+            if data:
+                values[i] = decode(data)
+                self.local.set(keys[i], values[i])
+                self.stats["l2_hits"] += 1
+            else:
+                self.stats["l2_misses"] += 1
+        return values
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = 30, tags: Optional[List[str]] = None):
+        """Write several keys with the same TTL in one pipelined round-trip.
+
+        Keys written with tags can later be dropped together with invalidate_tag.
+        """
+        if not self.redis or not items:
             return
-        keys = await self.redis.keys(pattern)
-        if keys:
-            await self.redis.delete(*keys)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(key, ttl, self._encode(value))
+                for tag in tags or []:
+                    pipe.sadd(f"{TAG_PREFIX}{tag}", *items)
+                    # Tag sets outlive their members; stale names are harmless to UNLINK
+                    pipe.expire(f"{TAG_PREFIX}{tag}", max(ttl, settings.CACHE_TAG_TTL))
+                await pipe.execute()
+            await self._invalidate(keys=list(items))
+        except Exception:
+            pass
     
+    async def delete(self, pattern: str) -> int:
+        """Delete keys matching `pattern` without blocking Redis.
+
+        Walks the keyspace incrementally with SCAN and removes keys with
+        pipelined UNLINK batches, so other clients aren't stalled.
+        """
+        if not self.redis:
+            return 0
+        deleted = 0
+        batch: List[str] = []
+        async for key in self.redis.scan_iter(match=pattern, count=SCAN_COUNT):
+            batch.append(_as_str(key))
+            if len(batch) >= SCAN_COUNT:
+                deleted += await self._unlink(batch)
+                batch = []
+        if batch:
+            deleted += await self._unlink(batch)
+        await self._invalidate(pattern=pattern)
+        return deleted
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """Delete every key written with `tag`, without walking the keyspace"""
+        if not self.redis:
+            return 0
+        tag_key = f"{TAG_PREFIX}{tag}"
+        deleted = 0
+        batch: List[str] = []
+        async for key in self.redis.sscan_iter(tag_key, count=SCAN_COUNT):
+            batch.append(_as_str(key))
+            if len(batch) >= SCAN_COUNT:
+                deleted += await self._unlink(batch)
+                await self._invalidate(keys=batch)
+                batch = []
+        if batch:
+            deleted += await self._unlink(batch)
+            await self._invalidate(keys=batch)
+        await self.redis.unlink(tag_key)
+        return deleted
+    
+    def _encode(self, value: Any):
+        return encode(value, self.codec, self.compress_min_bytes)
+    
+    async def _unlink(self, keys: List[str]) -> int:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for i in range(0, len(keys), UNLINK_BATCH):
+                pipe.unlink(*keys[i:i + UNLINK_BATCH])
+            results = await pipe.execute()
+        return sum(results)
+    
+    async def _invalidate(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None):
+        """Drop entries from our L1 and tell the other workers to do the same"""
+        self._apply_invalidation(keys, pattern)
+        try:
+            await self.redis.publish(INVALIDATION_CHANNEL, json.dumps({
+                "origin": self.instance_id,
+                "keys": keys or [],
+                "pattern": pattern
+            }))
+        except Exception as e:
+            print(f"Error publishing cache invalidation: {e}")
+
+    def _apply_invalidation(self, keys: Optional[List[str]], pattern: Optional[str]):
+        for key in keys or []:
+            self.local.delete(key)
+        if pattern:
+            self.local.delete_matching(pattern)
+
+    async def _listen_for_invalidations(self):
+        while self.redis:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything written while we were disconnected may be stale
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") != self.instance_id:
+                        self._apply_invalidation(payload.get("keys"), payload.get("pattern"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                self.local.clear()
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, l1_entries=len(self.local))
+
     async def disconnect(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
         if self.redis:
             self.redis.close()
             await self.redis.wait_closed()
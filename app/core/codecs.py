@@ -0,0 +1,115 @@
+# app/core/codecs.py
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+# Framed values start with a NUL byte, which plain JSON text never does, so
+# readers can tell new formats from legacy JSON written by older workers.
+#
+#   MAGIC (3 bytes) | FORMAT_VERSION (1) | codec id (1) | flags (1) | payload
+MAGIC = b"\x00MC"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+FLAG_ZLIB = 0x01
+
+class CodecError(ValueError):
+    pass
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+class JsonCodec:
+    codec_id = 1
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=str).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+class OrjsonCodec:
+    codec_id = 2
+    name = "orjson"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+class MsgpackCodec:
+    codec_id = 3
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+CODECS: Dict[str, Any] = {"json": JsonCodec()}
+if orjson is not None:
+    CODECS["orjson"] = OrjsonCodec()
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+def get_codec(name: str):
+    """Look up a codec by name, falling back to JSON if its library isn't installed"""
+    codec = CODECS.get(name)
+    if codec is None:
+        print(f"Cache codec '{name}' unavailable, falling back to json")
+        return CODECS["json"]
+    return codec
+
+def encode(value: Any, codec=None, compress_min_bytes: int = 0) -> Union[str, bytes]:
+    """Serialize a value for Redis.
+
+    Plain JSON that doesn't need compressing is written unframed, exactly as
+    before the codec layer existed, so older readers keep working.
+    """
+    codec = codec or CODECS["json"]
+    payload = codec.dumps(value)
+
+    flags = 0
+    if compress_min_bytes and len(payload) >= compress_min_bytes:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_ZLIB
+
+    if codec.codec_id == JsonCodec.codec_id and not flags:
+        return payload.decode("utf-8")
+    return MAGIC + bytes((FORMAT_VERSION, codec.codec_id, flags)) + payload
+
+def decode(data: Union[str, bytes]) -> Any:
+    """Inverse of encode; accepts framed values and legacy JSON"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+
+    version, codec_id, flags = data[len(MAGIC):HEADER_SIZE]
+    if version != FORMAT_VERSION:
+        raise CodecError(f"Unsupported cache format version {version}")
+    codec = CODECS_BY_ID.get(codec_id)
+    if codec is None:
+        raise CodecError(f"Cache codec {codec_id} is not available")
+
+    payload = data[HEADER_SIZE:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return codec.loads(payload)
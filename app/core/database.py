@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import Column, String, Float, Integer, DateTime
+from sqlalchemy import Column, String, Float, Integer, DateTime, Index
 from datetime import datetime
 from app.config import settings
 
@@ -42,13 +42,44 @@ class TokenModel(Base):
     token_ticker = Column(String, nullable=False)
     price_sol = Column(Float, nullable=False)
     market_cap_sol = Column(Float, nullable=False)
-    volume_sol = Column(Float, nullable=False)
+    volume_sol = Column(Float, nullable=False, index=True)
     liquidity_sol = Column(Float, nullable=False)
     transaction_count = Column(Integer, nullable=False)
     price_1hr_change = Column(Float, nullable=False)
     protocol = Column(String, nullable=False)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Append-only price/volume samples, one row per token per change
+class TokenPriceHistoryModel(Base):
+    __tablename__ = "token_price_history"
+    
+    token_address = Column(String, primary_key=True)
+    recorded_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    price_sol = Column(Float, nullable=False)
+    volume_sol = Column(Float, nullable=False)
+    liquidity_sol = Column(Float, nullable=False)
+    market_cap_sol = Column(Float, nullable=False)
+    transaction_count = Column(Integer, nullable=False)
+    
+    # Rows arrive in time order, so a BRIN index covers range scans at a tiny size
+    __table_args__ = (
+        Index("ix_token_price_history_recorded_at", "recorded_at", postgresql_using="brin"),
+    )
+
+# OHLCV candles rolled up from token_price_history
+class TokenCandleModel(Base):
+    __tablename__ = "token_candles"
+    
+    token_address = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume_sol = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False)
+
 # Initialize database tables
 async def init_db():
     async with engine.begin() as conn:
@@ -0,0 +1,171 @@
+# app/core/http.py
+import importlib.util
+from typing import Any, Callable, Dict, Optional
+import httpx
+from app.config import settings
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body that reports when it has been fully consumed or closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, done: Callable[[], None]):
+        self._stream = stream
+        self._done = done
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._done()
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Connection pool for one upstream host that counts its own saturation.
+
+    A request is in flight from the moment it asks the pool for a connection
+    until its body is closed, so streamed responses count for as long as
+    they hold the connection.
+    """
+
+    def __init__(self, max_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.stats = {
+            "requests": 0,
+            "peak_in_flight": 0,
+            "tcp_connects": 0,
+            "tls_handshakes": 0,
+            "pool_timeouts": 0,
+            "connect_timeouts": 0,
+            "read_timeouts": 0
+        }
+
+    async def _trace(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self.stats["tcp_connects"] += 1
+        elif event == "connection.start_tls.complete":
+            self.stats["tls_handshakes"] += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: Dict[str, Any]):
+            await self._trace(event, info)
+            if outer_trace is not None:
+                await outer_trace(event, info)
+
+        request.extensions["trace"] = trace
+        self.stats["requests"] += 1
+        self.in_flight += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        try:
+            response = await super().handle_async_request(request)
+        except httpx.PoolTimeout:
+            self.stats["pool_timeouts"] += 1
+            release()
+            raise
+        except httpx.ConnectTimeout:
+            self.stats["connect_timeouts"] += 1
+            release()
+            raise
+        except httpx.ReadTimeout:
+            self.stats["read_timeouts"] += 1
+            release()
+            raise
+        except BaseException:
+            release()
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(response.stream, release),
+            extensions=response.extensions
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        connections = getattr(self._pool, "connections", [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return dict(
+            self.stats,
+            in_flight=self.in_flight,
+            connections=len(connections),
+            idle_connections=idle,
+            saturation=round(self.in_flight / self.max_connections, 3) if self.max_connections else None
+        )
+
+class HttpPool:
+    """One tuned AsyncClient per upstream host, opened and closed by the app lifespan.
+
+    Each host gets its own pool, so connection limits apply per host and a
+    burst against one upstream can't starve the other. Clients are created
+    lazily, which also serves callers running outside the lifespan (tests,
+    benchmarks).
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.transports: Dict[str, InstrumentedTransport] = {}
+        self.http2 = settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+        if settings.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            print("h2 not installed, upstream clients use HTTP/1.1")
+
+    def client(self, name: str, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+        """The pooled client for `name`; `headers` (e.g. API keys) apply to every request it sends"""
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            client = self.clients[name] = self._create(name, headers)
+        return client
+
+    def _create(self, name: str, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        transport = InstrumentedTransport(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            limits=limits,
+            http2=self.http2,
+            retries=0  # retries are the callers' business (see UpstreamGuard in app/utils/resilience.py)
+        )
+        self.transports[name] = transport
+        return httpx.AsyncClient(
+            transport=transport,
+            headers=headers,
+            timeout=httpx.Timeout(
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                read=settings.HTTP_READ_TIMEOUT,
+                write=settings.HTTP_WRITE_TIMEOUT,
+                pool=settings.HTTP_POOL_TIMEOUT
+            )
+        )
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Error closing HTTP client: {e}")
+
+    def get_stats(self, name: str) -> Optional[Dict[str, Any]]:
+        transport = self.transports.get(name)
+        return dict(transport.get_stats(), http2=self.http2) if transport else None
+
+http_pool = HttpPool()
@@ -2,21 +2,28 @@
 import uvicorn
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.api.routes import tokens, websocket
+from app.api.routes import tokens, websocket, metrics
 from app.core.cache import cache_manager
+from app.core.http import http_pool
 from app.services.aggregation import aggregation_service
+from app.services.websocket import websocket_manager
 from app.middleware.middleware import RateLimitMiddleware  # Import the middleware
+from app.config import settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code
     await cache_manager.connect()
+    if settings.WS_BROADCAST_BUS:
+        await websocket_manager.start_bus(cache_manager.redis)
     await aggregation_service.start()
     
     yield  # This is where the application runs
     
     # Shutdown code
     await aggregation_service.stop()
+    await websocket_manager.stop_bus()
+    await http_pool.close()
 
 app = FastAPI(
     title="Meme Coin Aggregator API",
@@ -26,11 +33,18 @@ app = FastAPI(
 )
 
 # Add the rate limit middleware
-app.add_middleware(RateLimitMiddleware, calls=100, period=60)
+app.add_middleware(
+    RateLimitMiddleware,
+    calls=settings.RATE_LIMIT_CALLS,
+    period=settings.RATE_LIMIT_PERIOD,
+    max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+    use_redis=settings.RATE_LIMIT_REDIS
+)
 
 # Include routers
 app.include_router(tokens.router, prefix="/api/v1", tags=["tokens"])
 app.include_router(websocket.router, prefix="/api/v1", tags=["websocket"])
+app.include_router(metrics.router, prefix="/api/v1", tags=["metrics"])
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -38,5 +52,5 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=False,
-        workers=1  # Single worker for WebSocket state management
+        workers=settings.WORKERS  # broadcasts reach every worker through the Redis bus
     )
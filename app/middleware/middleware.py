@@ -1,31 +1,100 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+import math
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Optional, Tuple
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.cache import cache_manager
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
+# GCRA in Redis: returns 0 when allowed, otherwise ms until the next request may pass.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - tolerance
+if now < allow_at then return allow_at - now end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return 0
+"""
+
+class RateLimitMiddleware:
+    """Per-client rate limiting using GCRA (generic cell rate algorithm).
+
+    Each client costs a single float (its theoretical arrival time), and idle
+    clients are evicted least-recently-used once `max_clients` is reached.
+    Runs as plain ASGI middleware so allowed requests pass straight through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        calls: int = 100,
+        period: int = 60,
+        max_clients: int = 100_000,
+        use_redis: bool = False
+    ):
+        self.app = app
         self.calls = calls
         self.period = period
-        self.requests = defaultdict(list)
-    
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        now = time.time()
-        
-        # Clean old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if now - req_time < self.period
-        ]
-        
-        # Check rate limit
-        if len(self.requests[client_ip]) >= self.calls:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        
-        # Add current request
-        self.requests[client_ip].append(now)
-        
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        self.max_clients = max_clients
+        self.use_redis = use_redis
+        self.emission_interval = period / calls
+        self.tolerance = float(period)  # allows a burst of `calls` requests
+        self.requests: "OrderedDict[str, float]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+
+        allowed, retry_after = await self.check(client_ip)
+        if not allowed:
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def check(self, client_ip: str) -> Tuple[bool, float]:
+        """Record a request from `client_ip`; returns (allowed, seconds until allowed)"""
+        if self.use_redis and cache_manager.redis:
+            retry_after = await self._check_redis(client_ip)
+            if retry_after is not None:
+                return retry_after == 0, retry_after
+        return self._check_local(client_ip, time.monotonic())
+
+    def _check_local(self, client_ip: str, now: float) -> Tuple[bool, float]:
+        tat = max(self.requests.get(client_ip, now), now)
+        new_tat = tat + self.emission_interval
+        allow_at = new_tat - self.tolerance
+        if now < allow_at:
+            return False, allow_at - now
+
+        self.requests[client_ip] = new_tat
+        self.requests.move_to_end(client_ip)
+        while len(self.requests) > self.max_clients:
+            self.requests.popitem(last=False)
+        return True, 0.0
+
+    async def _check_redis(self, client_ip: str) -> Optional[float]:
+        try:
+            wait_ms = await cache_manager.redis.eval(
+                GCRA_SCRIPT, 1, f"ratelimit:client:{client_ip}",
+                self.emission_interval * 1000, self.tolerance * 1000
+            )
+            return int(wait_ms) / 1000
+        except Exception as e:
+            # Fall back to the in-process limiter if Redis is unavailable
+            print(f"Error checking shared rate limit: {e}")
+            return None
@@ -14,6 +14,7 @@ class TokenData(BaseModel):
     transaction_count: int = Field(..., description="Transaction count")
     price_1hr_change: float = Field(..., description="1hr price change %")
     protocol: str = Field(..., description="DEX protocol name")
+    price_change: Optional[float] = Field(None, description="Price change % over the requested time_filter window")
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
 class TokenListResponse(BaseModel):
@@ -21,6 +22,22 @@ class TokenListResponse(BaseModel):
     total_count: int
     next_cursor: Optional[str] = None
     has_more: bool = False
+    snapshot_version: Optional[int] = Field(None, description="Version of the snapshot the page was read from")
+    snapshot_age: Optional[float] = Field(None, description="Seconds since the listed data was fetched from upstream")
+
+class Candle(BaseModel):
+    bucket_start: datetime = Field(..., description="Start of the candle interval (UTC)")
+    open: float
+    high: float
+    low: float
+    close: float
+    volume_sol: float = Field(..., description="24h volume in SOL at the end of the interval")
+    samples: int = Field(..., description="Price samples folded into the candle")
+
+class OHLCVResponse(BaseModel):
+    token_address: str
+    interval: str
+    candles: List[Candle]
 
 class WebSocketMessage(BaseModel):
     type: str = Field(..., description="Message type")
@@ -1,61 +1,430 @@
 # app/services/aggregation.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_STOPPED
 from app.services.dex_clients import DexScreenerClient, JupiterPriceClient
+from app.utils.rate_limiter import PRIORITY_DETAIL
 from app.services.websocket import websocket_manager
+from app.services.token_store import (
+    TokenStore, TokenSnapshot, SnapshotDiff, encode_cursor, decode_cursor, windowed_ordering, diff_snapshots
+)
+from app.services.token_windows import TokenWindows, project_all
+from app.services.search_index import SearchIndex
+from app.services.persistence import token_repository
+from app.services.price_history import price_history_service
+from app.services.leader import LeaderElection
+from app.services.refresh_scheduler import RefreshScheduler
+from app.services.sources import (
+    Quote, SourceFanIn, create_sources, merge_pair, merge_quotes, parse_jupiter_prices
+)
+from app.utils.swr import StaleWhileRevalidate
 from app.models.token import TokenData, WebSocketMessage
 import asyncio
+import json
+import time
+from collections import OrderedDict
 from typing import List, Dict, Optional, Any
 from app.core.cache import cache_manager
-from datetime import datetime
+from app.core.codecs import encode
+from app.config import settings
+from datetime import datetime, timezone
+
+# The leader's latest universe, which followers adopt instead of polling upstream
+LEADER_SNAPSHOT_KEY = "aggregator:snapshot"
+
+LEADER_JOBS = ('token_update', 'price_refresh', 'candle_rollup')
+
+def token_age(token: TokenData) -> float:
+    """Seconds since `token` was fetched from upstream"""
+    return max(0.0, (datetime.utcnow() - token.last_updated).total_seconds())
+
+def newest_update(tokens: List[TokenData]) -> Optional[float]:
+    """Epoch time of the most recently fetched token, for data whose fetch time is unknown"""
+    if not tokens:
+        return None
+    return max(token.last_updated for token in tokens).replace(tzinfo=timezone.utc).timestamp()
 
 class DataAggregationService:
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
         self.dexscreener = DexScreenerClient()
         self.jupiter = JupiterPriceClient()
+        self.sources = create_sources(settings.TOKEN_SOURCES, {"dexscreener": self.dexscreener, "jupiter": self.jupiter})
+        self.source_fan_in = SourceFanIn(self.sources, settings.SOURCE_DEADLINES, settings.SOURCE_DEFAULT_DEADLINE)
+        self.token_store = TokenStore()
+        self.token_windows = TokenWindows()
+        self.search_index = SearchIndex()
+        self.snapshot: Optional[TokenSnapshot] = None
+        self._snapshot_version = 0
+        self._fetched_at: Optional[float] = None  # last successful upstream list fetch
+        self._recent_snapshots: "OrderedDict[int, TokenSnapshot]" = OrderedDict()
+        self.snapshot_swr = StaleWhileRevalidate("snapshot", settings.TOKEN_LIST_SOFT_TTL, settings.TOKEN_LIST_HARD_TTL)
+        self.detail_swr = StaleWhileRevalidate("token_detail", settings.TOKEN_DETAIL_SOFT_TTL, settings.TOKEN_DETAIL_HARD_TTL)
+        self._delta_seq = 0
+        self._delta_base: Optional[TokenSnapshot] = None
+        # Follower: relayed delta entries not yet in the published snapshot
+        self._relayed: Optional[Dict[str, Any]] = None
+        self.repository = token_repository
+        self.price_history = price_history_service
+        self._pending_persist: Dict[str, TokenData] = {}
+        self.election = LeaderElection(
+            self._become_leader,
+            self._become_follower,
+            ttl=settings.LEADER_LEASE_TTL
+        )
+        self.refresh_scheduler = RefreshScheduler(
+            base_interval=settings.REFRESH_BASE_INTERVAL,
+            min_interval=settings.REFRESH_MIN_INTERVAL,
+            max_interval=settings.REFRESH_MAX_INTERVAL,
+            batch_size=settings.JUPITER_MAX_IDS_PER_REQUEST,
+            calls_per_minute=settings.REFRESH_CALLS_PER_MINUTE
+        )
+        self.is_leader = False
+        self._followed: Optional[tuple] = None  # (fencing token, version) last adopted
         self.is_running = False
     
     async def start(self):
         if not self.is_running:
-            self.scheduler.add_job(
-                self.update_token_data,
-                'interval',
-                seconds=30,
-                id='token_update'
-            )
+            # A scheduler that was shut down can't be started again
+            if self.scheduler.state == STATE_STOPPED:
+                self.scheduler = AsyncIOScheduler()
+            
+            # Serve the last persisted universe until the first upstream fetch lands
+            await self.warm_start()
+            
             self.scheduler.start()
             self.is_running = True
+            
+            # Only one instance polls upstream; the rest follow its results
+            if settings.LEADER_ELECTION:
+                await self.election.start(cache_manager.redis)
+            else:
+                await self._become_leader()
     
     async def stop(self):
         if self.is_running:
+            await self.election.stop()
             self.scheduler.shutdown()
             self.is_running = False
+            self.is_leader = False
+    
+    async def _become_leader(self):
+        print("Elected aggregation leader")
+        self.is_leader = True
+        self._remove_jobs('follower_sync')
+        
+        # Run the first refresh right away so the snapshot is ready early
+        self.scheduler.add_job(
+            self.scheduled_refresh,
+            'interval',
+            seconds=30,
+            id='token_update',
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+        if settings.ADAPTIVE_REFRESH:
+            self.scheduler.add_job(
+                self.refresh_due_prices,
+                'interval',
+                seconds=settings.REFRESH_TICK_SECONDS,
+                id='price_refresh',
+                replace_existing=True
+            )
+        if settings.PRICE_HISTORY_ENABLED:
+            self.scheduler.add_job(
+                self.rollup_candles,
+                'interval',
+                seconds=settings.CANDLE_ROLLUP_INTERVAL,
+                id='candle_rollup',
+                replace_existing=True
+            )
+    
+    async def _become_follower(self):
+        print("Following the aggregation leader")
+        self.is_leader = False
+        websocket_manager.relay_hook = self.apply_relayed_delta
+        self._remove_jobs(*LEADER_JOBS)
+        self.scheduler.add_job(
+            self.scheduled_refresh,
+            'interval',
+            seconds=settings.FOLLOWER_SYNC_INTERVAL,
+            id='follower_sync',
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+    
+    def _remove_jobs(self, *job_ids: str):
+        for job_id in job_ids:
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+    
+    @property
+    def is_follower(self) -> bool:
+        return self.is_running and not self.is_leader
+    
+    async def publish_to_followers(self):
+        """Share this cycle's universe and delta sequence with the followers"""
+        if not self.is_leader or self.election.standalone or self.snapshot is None:
+            return
+        payload = encode(
+            {
+                "fencing_token": self.election.fencing_token,
+                "version": self.snapshot.version,
+                "seq": self._delta_seq,
+                "fetched_at": self._fetched_at,
+                "tokens": [token.dict() for token in self.snapshot.tokens.values()]
+            },
+            cache_manager.codec,
+            cache_manager.compress_min_bytes
+        )
+        try:
+            await self.election.fenced_set(LEADER_SNAPSHOT_KEY, payload, ttl=120)
+        except Exception as e:
+            print(f"Error publishing snapshot to followers: {e}")
+    
+    async def sync_from_leader(self):
+        """Follower refresh: adopt the leader's latest universe, without upstream calls"""
+        self._publish_relayed()
+        try:
+            published = await cache_manager.get(LEADER_SNAPSHOT_KEY)
+            if not published:
+                return
+            followed = (published["fencing_token"], published["version"])
+            if followed == self._followed:
+                return
+            if self._followed and followed[0] == self._followed[0] and published["seq"] < self._delta_seq:
+                # Deltas relayed since have already moved us past this version
+                return
+            self._followed = followed
+            
+            tokens = [TokenData(**token) for token in published["tokens"]]
+            # The leader's data is as old as its last successful fetch, not our sync
+            self._fetched_at = published.get("fetched_at")
+            changed, removed = self.token_store.replace(tokens)
+            self.search_index.update(changed, removed)
+            self.token_windows.forget(removed)
+            self.token_windows.observe(tokens)
+            self.publish_snapshot()
+            
+            # Topic deltas arrive from the leader over the bus; only scoped routing is local.
+            # Taking over its sequence keeps resyncs, and deltas after a failover, consistent.
+            await self.broadcast_token_updates(self.snapshot, publish=False)
+            self._delta_seq = published["seq"]
+        except Exception as e:
+            print(f"Error syncing from leader: {e}")
+    
+    def apply_relayed_delta(self, topic: str, payload: str):
+        """Follower: fold a leader delta from the bus into local state before it is delivered.
+        
+        Runs before this worker's sockets get the delta, so a client that
+        subscribes or resyncs afterwards gets a snapshot at least as new as
+        every delta it has seen, rather than waiting for the next sync. Only
+        the store is updated here; the snapshot is rebuilt once per loop tick
+        (or on the next resync) for all deltas relayed in between.
+        """
+        if topic != "tokens" or not self.is_follower:
+            return
+        message = json.loads(payload)
+        if message.get("type") != "token_delta":
+            return
+        data = message["data"]
+        if data["seq"] <= self._delta_seq:
+            return
+        # A skipped seq means a lost message; the next sync from the leader repairs the state
+        
+        removed = [address for address in data["removed"] if self.token_store.remove(address)]
+        added = [TokenData(**token) for token in data["added"]]
+        changed = {address: fields for address, fields in data["changed"].items() if address in self.token_store}
+        updated = added + [
+            TokenData(**{**self.token_store.get(address).dict(), **fields}) for address, fields in changed.items()
+        ]
+        for token in updated:
+            self.token_store.upsert(token)
+        self.search_index.update(updated, removed)
+        self.token_windows.forget(removed)
+        self._delta_seq = data["seq"]
+        
+        pending = self._relayed
+        if pending is None:
+            pending = self._relayed = {"added": {}, "removed": {}, "changed": {}}
+            asyncio.get_event_loop().call_soon(self._publish_relayed)
+        for address in removed:
+            pending["removed"][address] = None
+        for token in added:
+            pending["added"][token.token_address] = None
+        for address, fields in changed.items():
+            pending["changed"].setdefault(address, {}).update(fields)
+    
+    def _publish_relayed(self):
+        """Follower: publish the deltas relayed since the last call and route them to scoped subscribers"""
+        pending, self._relayed = self._relayed, None
+        if pending is None:
+            return
+        self.publish_snapshot()
+        self._delta_base = self.snapshot
+        if not websocket_manager.token_subscriptions:
+            return
+        
+        # Only the relayed entries are routed; no diff over the whole universe
+        tokens = self.snapshot.tokens
+        diff = SnapshotDiff(
+            [tokens[address] for address in pending["added"] if address in tokens],
+            [address for address in pending["removed"] if address not in tokens],
+            {
+                address: fields for address, fields in pending["changed"].items()
+                if address in tokens and address not in pending["added"]
+            }
+        )
+        if diff:
+            asyncio.ensure_future(websocket_manager.broadcast_token_delta(diff, self.snapshot))
     
     async def update_token_data(self):
         try:
-            # Fetch data from multiple sources
-            tasks = [
-                self.fetch_trending_tokens(),
-                self.update_price_data()
-            ]
+            # Fetch data from multiple sources; with adaptive refresh, prices are re-fetched per token
+            tasks = [self.fetch_trending_tokens()]
+            if not settings.ADAPTIVE_REFRESH:
+                tasks.append(self.update_price_data())
+            
+            await asyncio.gather(*tasks, return_exceptions=True)
             
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if settings.ADAPTIVE_REFRESH:
+                self.refresh_scheduler.plan(
+                    self.token_store.tokens.values(),
+                    self._subscriber_interest,
+                    time.monotonic()
+                )
+            
+            # Roll every tracked token's windows forward by one tick
+            self.token_windows.observe(self.token_store.tokens.values())
+            
+            # Readers switch to the new data in one step
+            self.publish_snapshot()
+            
+            # Write everything that changed this cycle in one batch
+            await self.persist_pending()
             
-            # Process results and broadcast updates
-            if results[0] and not isinstance(results[0], Exception):
-                await self.broadcast_token_updates(results[0])
+            # Tell subscribers what changed since the last broadcast
+            await self.broadcast_token_updates(self.snapshot)
+            await self.publish_to_followers()
                 
         except Exception as e:
             # Log error but don't stop the scheduler
             print(f"Error in data update: {e}")
     
-    async def update_price_data(self):
-        """Update token prices in real-time"""
+    async def warm_start(self):
+        """Load persisted tokens into the store, snapshot and cache"""
+        if not settings.PERSIST_TOKENS:
+            return
         try:
-            # Get cached token addresses
-            cached_data = await cache_manager.get("trending_tokens")
-            if not cached_data:
-                return
+            tokens = await self.repository.load_tokens(settings.WARM_START_LIMIT)
+        except Exception as e:
+            print(f"Error loading persisted tokens: {e}")
+            return
+        
+        if not tokens:
+            return
+        self._fetched_at = newest_update(tokens)
+        self.token_store.replace(tokens)
+        self.search_index.update(tokens)
+        self.token_windows.observe(tokens)
+        self.publish_snapshot()
+        if not await cache_manager.get("trending_tokens"):
+            await cache_manager.set("trending_tokens", [t.dict() for t in tokens], ttl=int(settings.TOKEN_LIST_HARD_TTL))
+    
+    def _queue_persist(self, tokens: List[TokenData]):
+        for token in tokens:
+            self._pending_persist[token.token_address] = token
+    
+    async def persist_pending(self):
+        """Upsert the tokens that changed since the last flush and record price samples"""
+        if not self._pending_persist:
+            return
+        batch, self._pending_persist = self._pending_persist, {}
+        
+        if settings.PRICE_HISTORY_ENABLED:
+            try:
+                await self.price_history.record(batch.values())
+            except Exception as e:
+                print(f"Error recording price history: {e}")
+        
+        if not settings.PERSIST_TOKENS:
+            return
+        try:
+            await self.repository.upsert_tokens(batch.values())
+        except Exception as e:
+            print(f"Error persisting tokens: {e}")
+            # Keep them for the next cycle unless a newer version was queued meanwhile
+            for address, token in batch.items():
+                self._pending_persist.setdefault(address, token)
+    
+    async def rollup_candles(self):
+        try:
+            await self.price_history.rollup()
+        except Exception as e:
+            print(f"Error rolling up candles: {e}")
+    
+    def publish_snapshot(self) -> TokenSnapshot:
+        """Freeze the token store into a new immutable snapshot for request handlers"""
+        self._snapshot_version += 1
+        self.snapshot = self.token_store.snapshot(
+            self._snapshot_version,
+            self.token_windows.snapshot(self.token_store.tokens),
+            fetched_at=self._fetched_at
+        )
+        
+        # Keep a few previous versions so clients can finish paging through them
+        self._recent_snapshots[self.snapshot.version] = self.snapshot
+        while len(self._recent_snapshots) > settings.SNAPSHOT_RETENTION:
+            self._recent_snapshots.popitem(last=False)
+        return self.snapshot
+    
+    async def get_snapshot(self) -> TokenSnapshot:
+        """Return the current snapshot, refreshing it if the scheduler has fallen behind.
+        
+        A snapshot past the soft TTL is still served while one refresh runs in the
+        background; on cold start or past the hard TTL, requests wait on a single
+        shared refresh.
+        """
+        cached = (self.snapshot, self.snapshot.age) if self.snapshot is not None else None
+        snapshot, _ = await self.snapshot_swr.get("snapshot", cached, self._refresh_snapshot)
+        return snapshot
+    
+    async def scheduled_refresh(self):
+        """The periodic refresh, run as the same single flight as request-triggered ones"""
+        await self.snapshot_swr.flights.do("snapshot", self._refresh_snapshot)
+    
+    async def _refresh_snapshot(self) -> TokenSnapshot:
+        await (self.sync_from_leader() if self.is_follower else self.update_token_data())
+        return self.snapshot if self.snapshot is not None else TokenSnapshot.empty()
+    
+    def _subscriber_interest(self, token_address: str) -> int:
+        return len(websocket_manager.token_subscriptions.subscribers.get(token_address, ()))
+    
+    async def refresh_due_prices(self):
+        """Re-price the tokens whose adaptive refresh interval has elapsed"""
+        batch = self.refresh_scheduler.take_due(time.monotonic())
+        if not batch:
+            return
+        try:
+            updated_tokens = await self.update_price_data(batch, fresh=True)
+        finally:
+            self.refresh_scheduler.completed(batch, time.monotonic())
+        
+        if updated_tokens:
+            self.publish_snapshot()
+            await self.persist_pending()
+            await self.broadcast_token_updates(self.snapshot)
+            await self.publish_to_followers()
+    
+    async def update_price_data(self, token_addresses: Optional[List[str]] = None, fresh: bool = False):
+        """Update token prices in real-time; defaults to every cached trending token"""
+        try:
+            if token_addresses is None:
+                # Get cached token addresses
+                cached_data = await cache_manager.get("trending_tokens")
+                if not cached_data:
+                    return
+            else:
+                cached_data = [token.dict() for token in map(self.token_store.get, token_addresses) if token]
             
             token_addresses = [token.get("token_address") for token in cached_data if "token_address" in token]
             
@@ -63,7 +432,7 @@ class DataAggregationService:
                 return
                 
             # Get latest price data for these tokens
-            jupiter_data = await self.jupiter.get_prices(token_addresses)
+            jupiter_data = await self.jupiter.get_prices(token_addresses, fresh=fresh)
             
             # Update prices and broadcast if there are significant changes
             updated_tokens = []
@@ -72,6 +441,9 @@ class DataAggregationService:
                 token_address = token_data.get("token_address")
                 if not token_address:
                     continue
+                
+                # Cached values are shared with other readers; work on a copy
+                token_data = dict(token_data)
                     
                 # Get new price from Jupiter if available
                 new_price = jupiter_data.get("data", {}).get(token_address, {}).get("price")
@@ -91,6 +463,11 @@ class DataAggregationService:
                         token_data["last_updated"] = datetime.utcnow().isoformat()
                         updated_tokens.append(TokenData(**token_data))
             
+            # Keep the sort indexes in step with the new prices
+            for token in updated_tokens:
+                if token.token_address in self.token_store and self.token_store.upsert(token):
+                    self._queue_persist([token])
+            
             # Broadcast price updates if any
             if updated_tokens:
                 message = WebSocketMessage(
@@ -105,29 +482,32 @@ class DataAggregationService:
             return []
     
     async def fetch_trending_tokens(self) -> List[TokenData]:
-        """Fetch trending tokens from multiple sources and merge them"""
+        """Fetch trending tokens from every configured source and merge them"""
         try:
-            # Fetch tokens from DexScreener
-            dex_data = await self.dexscreener.search_tokens("solana trending")
-            
-            # Fetch tokens from Jupiter
-            # Get top token addresses from DexScreener
-            token_addresses = []
-            if "pairs" in dex_data:
-                token_addresses = [pair.get("baseToken", {}).get("address") 
-                                for pair in dex_data.get("pairs", [])[:50] 
-                                if "baseToken" in pair]
+            # All sources at once, each within its own deadline
+            targets = self._quote_targets()
+            results = await self.source_fan_in.fetch(targets)
+            listed = [name for name in self.source_fan_in.discovering if name in results]
+            if not listed:
+                raise RuntimeError("no token source answered in time")
+            await self._quote_discovered(results, targets)
+            merged = merge_quotes(results, settings.SOURCE_WEIGHTS, settings.SOURCE_MAX_DEVIATION)
+            self._fetched_at = time.time()
             
-            # Get price data from Jupiter
-            jupiter_data = {}
-            if token_addresses:
-                jupiter_data = await self.jupiter.get_prices(token_addresses)
+            if len(listed) < len(self.source_fan_in.discovering):
+                # Don't drop what a missing source listed; it goes once every source has answered
+                for address, token in self.token_store.tokens.items():
+                    merged.setdefault(address, token)
+            merged_tokens = list(merged.values())
             
-            # Merge data from multiple sources
-            merged_tokens = self._merge_token_data(dex_data, jupiter_data)
+            # Update the indexed store incrementally
+            changed, removed = self.token_store.replace(merged_tokens)
+            self.token_windows.forget(removed)
+            self.search_index.update(changed, removed)
+            self._queue_persist(changed)
             
             # Cache the merged data
-            await cache_manager.set("trending_tokens", [t.dict() for t in merged_tokens], ttl=60)
+            await cache_manager.set("trending_tokens", [t.dict() for t in merged_tokens], ttl=int(settings.TOKEN_LIST_HARD_TTL))
             
             return merged_tokens
         except Exception as e:
@@ -135,96 +515,95 @@ class DataAggregationService:
             # Try to return cached data if available
             cached_data = await cache_manager.get("trending_tokens")
             if cached_data:
-                return [TokenData(**token) for token in cached_data]
+                tokens = [TokenData(**token) for token in cached_data]
+                if not len(self.token_store):
+                    self._fetched_at = newest_update(tokens)
+                    self.token_store.replace(tokens)
+                    self.search_index.update(tokens)
+                return tokens
             return []
     
-    def _merge_token_data(self, dex_data: Dict, jupiter_data: Dict) -> List[TokenData]:
-        """Merge token data from multiple sources"""
-        result = []
-        
-        # Process DexScreener data
-        if "pairs" in dex_data:
-            for pair in dex_data.get("pairs", []):
-                base_token = pair.get("baseToken", {})
-                token_address = base_token.get("address")
-                
-                if not token_address:
-                    continue
-                
-                # Check if token already in result (avoid duplicates)
-                existing_token = next((t for t in result if t.token_address == token_address), None)
-                
-                if existing_token:
-                    # Update existing token with additional data
-                    txns = pair.get("txns", {}).get("h24", {})
-                    # Make sure we're handling the different possible formats of txns
-                    if isinstance(txns, dict):
-                        txn_count = txns.get("buys", 0) + txns.get("sells", 0)
-                    else:
-                        txn_count = int(txns) if txns else 0
-                        
-                    existing_token.transaction_count += txn_count
-                    
-                    # Use the protocol with higher liquidity
-                    liquidity_usd = pair.get("liquidity", {}).get("usd", 0)
-                    if isinstance(liquidity_usd, (int, float)) and liquidity_usd > existing_token.liquidity_sol:
-                        existing_token.protocol = pair.get("dexId", "Unknown")
-                        existing_token.liquidity_sol = float(liquidity_usd)
-                else:
-                    # Create new token entry
-                    try:
-                        # Get price
-                        price_usd = pair.get("priceUsd", 0)
-                        price_sol = float(price_usd) if price_usd else 0
-                        
-                        # Get liquidity
-                        liquidity = pair.get("liquidity", {}).get("usd", 0)
-                        liquidity_sol = float(liquidity) if liquidity else 0
-                        
-                        # Get volume
-                        volume = pair.get("volume", {}).get("h24", 0)
-                        volume_sol = float(volume) if volume else 0
-                        
-                        # Get transaction count
-                        txns = pair.get("txns", {}).get("h24", {})
-                        if isinstance(txns, dict):
-                            txn_count = txns.get("buys", 0) + txns.get("sells", 0)
-                        else:
-                            txn_count = int(txns) if txns else 0
-                        
-                        # Get price change
-                        price_change = pair.get("priceChange", {}).get("h1", 0)
-                        price_1hr_change = float(price_change) if price_change else 0
-                        
-                        # Get market cap (fdv)
-                        market_cap = pair.get("fdv", 0)
-                        market_cap_sol = float(market_cap) if market_cap else 0
-                        
-                        token = TokenData(
-                            token_address=token_address,
-                            token_name=base_token.get("name", "Unknown"),
-                            token_ticker=base_token.get("symbol", "UNKNOWN"),
-                            price_sol=price_sol,
-                            market_cap_sol=market_cap_sol,
-                            volume_sol=volume_sol,
-                            liquidity_sol=liquidity_sol,
-                            transaction_count=txn_count,
-                            price_1hr_change=price_1hr_change,
-                            protocol=pair.get("dexId", "Unknown")
-                        )
-                        result.append(token)
-                    except Exception as e:
-                        print(f"Error creating token data: {e}")
+    def _quote_targets(self) -> List[str]:
+        """Highest-volume tracked tokens, for sources that only quote known addresses"""
+        if self.snapshot is None:
+            return []
+        return [token.token_address for token in self.snapshot.orderings["volume_sol"][:settings.SOURCE_QUOTE_LIMIT]]
+    
+    async def _quote_discovered(self, results: Dict[str, Dict[str, Quote]], targets: List[str]):
+        """Second pass: price-only sources quote the tokens listed for the first time this cycle.
         
-        return result
+        The first pass can only ask about tokens tracked before the cycle;
+        without this, a new token would go unreconciled until the next one.
+        """
+        if not self.source_fan_in.quoting:
+            return
+        asked = set(targets)
+        volumes: Dict[str, float] = {}
+        for name in self.source_fan_in.discovering:
+            for address, quote in results.get(name, {}).items():
+                if address not in asked and quote.token is not None:
+                    volumes[address] = max(volumes.get(address, 0.0), quote.token.volume_sol)
+        if not volumes:
+            return
+        discovered = sorted(volumes, key=volumes.get, reverse=True)[:settings.SOURCE_QUOTE_LIMIT]
+        for name, quotes in (await self.source_fan_in.quote(discovered)).items():
+            results.setdefault(name, {}).update(quotes)
     
-    async def broadcast_token_updates(self, tokens: List[TokenData]):
+    async def broadcast_token_updates(self, snapshot: TokenSnapshot, publish: bool = True):
+        """Broadcast the difference from the previously broadcast snapshot.
+        
+        Deltas carry consecutive sequence numbers; a client that sees a gap
+        asks for a full snapshot (see token_snapshot_message) and resumes.
+        With publish=False only this worker's scoped subscriptions are served.
+        """
+        base = self._delta_base
+        self._delta_base = snapshot
+        # With the bus, subscribers on other workers are invisible to us
+        topic = publish and (websocket_manager.has_subscribers("tokens") or websocket_manager.bus is not None)
+        if not topic and not websocket_manager.token_subscriptions:
+            # Nobody holds the previous state; new subscribers start from this snapshot
+            return
+        
+        diff = diff_snapshots(base.tokens if base else {}, snapshot.tokens)
+        
+        # Per-token and filtered subscriptions get their own slice of the diff
+        if websocket_manager.token_subscriptions:
+            await websocket_manager.broadcast_token_delta(diff, snapshot)
+        
+        if not topic or not diff:
+            return
+        
+        self._delta_seq += 1
         message = WebSocketMessage(
-            type="token_update",
-            data={"tokens": [token.dict() for token in tokens]}
+            type="token_delta",
+            data={
+                "seq": self._delta_seq,
+                "added": [token.dict() for token in diff.added],
+                "removed": diff.removed,
+                "changed": diff.changed
+            }
         )
         await websocket_manager.broadcast_to_topic("tokens", message.dict())
     
+    @property
+    def broadcast_snapshot(self) -> TokenSnapshot:
+        """Snapshot the latest deltas were computed against"""
+        if self._delta_base is not None:
+            return self._delta_base
+        return self.snapshot if self.snapshot is not None else TokenSnapshot.empty()
+    
+    def token_snapshot_message(self) -> Dict[str, Any]:
+        """Full state matching the latest delta sequence number, for new or resyncing clients"""
+        self._publish_relayed()
+        base = self.broadcast_snapshot
+        return WebSocketMessage(
+            type="token_snapshot",
+            data={
+                "seq": self._delta_seq,
+                "tokens": [token.dict() for token in base.orderings["volume_sol"]]
+            }
+        ).dict()
+    
     async def get_filtered_tokens(
         self, 
         limit: int = 20, 
@@ -234,91 +613,132 @@ class DataAggregationService:
         search: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get filtered and sorted tokens with pagination"""
-        # Fetch tokens (or use cache)
-        tokens = await self.fetch_trending_tokens()
-        
-        # Apply search filter if provided
-        if search:
-            search = search.lower()
-            tokens = [t for t in tokens if search in t.token_name.lower() or 
-                    search in t.token_ticker.lower() or 
-                    search in t.token_address.lower()]
+        # Handlers only read the published snapshot; upstream calls happen in the scheduler
+        snapshot = await self.get_snapshot()
         
-        # Apply time filter
-        # The time_filter parameter is already used when fetching data from the APIs
+        if sort_by not in snapshot.orderings:
+            sort_by = "volume_sol"
         
-        # Sort tokens based on criteria
-        if sort_by == "volume_sol":
-            tokens.sort(key=lambda x: x.volume_sol, reverse=True)
-        elif sort_by == "market_cap_sol":
-            tokens.sort(key=lambda x: x.market_cap_sol, reverse=True)
-        elif sort_by == "price_1hr_change":
-            tokens.sort(key=lambda x: x.price_1hr_change, reverse=True)
-        
-        # Apply cursor-based pagination
-        total_count = len(tokens)
-        start_idx = 0
+        # Window-dependent sorts use the ordering computed for that window
+        ordering_name = windowed_ordering(sort_by, time_filter)
+        if ordering_name not in snapshot.orderings:
+            ordering_name = sort_by
         
+        # Resolve the keyset cursor: (sort value, token_address) in a given snapshot version
+        after = None
         if cursor:
             try:
-                # Cursor is the index of the last item from previous page
-                start_idx = int(cursor) + 1
+                cursor_sort_by, after, version = decode_cursor(cursor)
+                if cursor_sort_by != ordering_name:
+                    # Cursor belongs to a different ordering; start over
+                    after = None
+                else:
+                    # Page from the same version the client started on while we still have it
+                    snapshot = self._recent_snapshots.get(version, snapshot)
             except ValueError:
-                start_idx = 0
+                after = None
+        
+        if ordering_name not in snapshot.orderings:
+            # An older snapshot from before this window existed
+            ordering_name = sort_by
+            after = None
+        ordering = snapshot.orderings[ordering_name]
+        keys = snapshot.keys[ordering_name]
+        
+        if search:
+            # Ranked by match tier, then by the requested ordering; cursor keys carry the tier
+            if after is not None and len(after) != 3:
+                after = None
+            total_count, ranked = self.search_index.search(
+                search,
+                key=snapshot.key_map(ordering_name).get,
+                limit=limit + 1,
+                after=after
+            )
+            has_more = len(ranked) > limit
+            ranked = ranked[:limit]
+            tokens = [snapshot.tokens[rank[-1]] for rank in ranked]
+            last_key = ranked[-1] if ranked else None
+        else:
+            if after is not None and len(after) != 2:
+                after = None
+            start_idx = snapshot.seek(ordering_name, after)
+            total_count = len(ordering)
+            end_idx = min(start_idx + limit, total_count)
+            has_more = end_idx < total_count
+            tokens = ordering[start_idx:end_idx]
+            last_key = keys[end_idx - 1] if end_idx > start_idx else None
+        
+        # Cursor points at the last item of this page
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(ordering_name, last_key, snapshot.version)
         
-        end_idx = min(start_idx + limit, total_count)
-        has_more = end_idx < total_count
+        # Report volume, txns and price change over the requested window
+        page = project_all(tokens, snapshot.windows.get(time_filter, {}))
         
         # Create the pagination response
         return {
-            "tokens": tokens[start_idx:end_idx],
+            "tokens": page,
             "total_count": total_count,
-            "next_cursor": str(end_idx - 1) if has_more else None,
-            "has_more": has_more
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "snapshot_version": snapshot.version,
+            "snapshot_age": round(snapshot.age, 3)
         }
     
     async def get_token_by_address(self, token_address: str) -> Optional[TokenData]:
-        """Get detailed information for a specific token"""
+        """Get detailed information for a specific token.
+        
+        Cached details are served up to TOKEN_DETAIL_HARD_TTL old; past the soft
+        TTL one background refresh replaces them, so in steady state a lookup
+        costs a cache read.
+        """
         try:
-            # Try to get from cache first
             cache_key = f"token_detail:{token_address}"
             cached_data = await cache_manager.get(cache_key)
             
+            cached = None
             if cached_data:
-                return TokenData(**cached_data)
-            
-            # Fetch fresh data
-            dex_data = await self.dexscreener.get_token_data(token_address)
-            
-            # Get Jupiter price data
-            jupiter_data = await self.jupiter.get_prices([token_address])
-            
-            # Process and merge data
-            token = None
-            if "pairs" in dex_data and dex_data["pairs"]:
-                # Use the pair with highest liquidity
-                pair = max(dex_data["pairs"], key=lambda x: float(x.get("liquidity", {}).get("usd", 0)))
-                base_token = pair.get("baseToken", {})
-                
-                token = TokenData(
-                    token_address=token_address,
-                    token_name=base_token.get("name", "Unknown"),
-                    token_ticker=base_token.get("symbol", "UNKNOWN"),
-                    price_sol=float(pair.get("priceUsd", 0)),
-                    market_cap_sol=float(pair.get("fdv", 0)),
-                    volume_sol=float(pair.get("volume", {}).get("h24", 0)),
-                    liquidity_sol=float(pair.get("liquidity", {}).get("usd", 0)),
-                    transaction_count=int(pair.get("txns", {}).get("h24", 0)),
-                    price_1hr_change=float(pair.get("priceChange", {}).get("h1", 0)),
-                    protocol=pair.get("dexId", "Unknown")
-                )
-                
-                # Cache the token data
-                await cache_manager.set(cache_key, token.dict(), ttl=30)
+                token = TokenData(**cached_data)
+                cached = (token, token_age(token))
             
+            token, _ = await self.detail_swr.get(
+                cache_key,
+                cached,
+                lambda: self._fetch_token_detail(token_address, cache_key)
+            )
             return token
         except Exception as e:
             print(f"Error fetching token details: {e}")
             return None
+    
+    async def _fetch_token_detail(self, token_address: str, cache_key: str) -> Optional[TokenData]:
+        dex_data, prices = await asyncio.gather(
+            self.dexscreener.get_token_data(token_address, priority=PRIORITY_DETAIL),
+            self.jupiter.get_prices([token_address], priority=PRIORITY_DETAIL),
+            return_exceptions=True
+        )
+        if isinstance(dex_data, Exception):
+            raise dex_data
+        
+        # Pairs fold the same way as in the trending list
+        merged: Dict[str, TokenData] = {}
+        for pair in dex_data.get("pairs") or []:
+            merge_pair(merged, pair)
+        if token_address not in merged:
+            return None
+        
+        # Reconciled with Jupiter's price like every trending cycle; without it the pairs stand alone
+        results = {"dexscreener": {token_address: Quote.of(merged[token_address])}}
+        if isinstance(prices, Exception):
+            print(f"Error fetching Jupiter price for {token_address}: {prices}")
+        else:
+            results["jupiter"] = parse_jupiter_prices(prices)
+        token = merge_quotes(results, settings.SOURCE_WEIGHTS, settings.SOURCE_MAX_DEVIATION)[token_address]
+        
+        # Kept until the hard TTL; its last_updated tells readers how stale it is
+        await cache_manager.set(cache_key, token.dict(), ttl=int(settings.TOKEN_DETAIL_HARD_TTL))
+        return token
 
 aggregation_service = DataAggregationService()
@@ -0,0 +1,99 @@
+# app/services/broadcast.py
+import asyncio
+from typing import Callable, Dict, Optional
+
+BROADCAST_CHANNEL = "ws:broadcast"
+
+class BroadcastBus:
+    """Relays pre-serialized WebSocket broadcasts between workers via Redis pub/sub.
+
+    The publishing worker doesn't deliver locally; every worker, itself
+    included, delivers what it receives on the channel to its own sockets.
+    Frames are "<topic>\\n<payload>", so payloads are never re-serialized.
+    """
+
+    def __init__(self, deliver: Callable[[str, str], None], channel: str = BROADCAST_CHANNEL):
+        self.deliver = deliver
+        self.channel = channel
+        self.redis = None
+        self.connected = False
+        self.stats = {"published": 0, "relayed": 0, "publish_errors": 0}
+        self._listener: Optional[asyncio.Task] = None
+        self._pubsub = None
+        self._attempted = asyncio.Event()
+
+    async def start(self, redis, timeout: float = 2.0):
+        self.redis = redis
+        self._listener = asyncio.create_task(self._listen())
+        try:
+            # Wait for the first subscribe attempt; until it succeeds we deliver locally
+            await asyncio.wait_for(self._attempted.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if not self.connected:
+            print("Broadcast bus not connected; delivering locally")
+
+    async def stop(self):
+        self.connected = False
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._close_pubsub(unsubscribe=True)
+
+    async def _close_pubsub(self, unsubscribe: bool = False):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is None:
+            return
+        try:
+            if unsubscribe:
+                await pubsub.unsubscribe()
+            # close() is deprecated in redis.asyncio; older clients only have close()
+            close = getattr(pubsub, "aclose", None) or pubsub.close
+            await close()
+        except Exception as e:
+            print(f"Error closing broadcast bus subscription: {e}")
+
+    async def publish(self, topic: str, payload: str) -> bool:
+        """Send a payload to every worker. Returns False if the caller should deliver locally."""
+        if not self.connected:
+            return False
+        try:
+            await self.redis.publish(self.channel, f"{topic}\n{payload}")
+            self.stats["published"] += 1
+            return True
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            print(f"Error publishing broadcast: {e}")
+            return False
+
+    async def _listen(self):
+        while self.redis:
+            try:
+                pubsub = self._pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                self._attempted.set()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    topic, _, payload = data.partition("\n")
+                    self.deliver(topic, payload)
+                    self.stats["relayed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Broadcast bus listener error: {e}")
+                self.connected = False
+                self._attempted.set()
+                await self._close_pubsub()
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, connected=int(self.connected))
@@ -1,64 +1,285 @@
 # app/services/dex_clients.py
 import httpx
 import asyncio
-from typing import List, Dict, Any
-from app.utils.retry import retry_with_backoff
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional
+from app.utils.json_stream import aiter_array_items
+from app.utils.resilience import UpstreamGuard
+from app.utils.singleflight import SingleFlight
+from app.utils.rate_limiter import TokenBucket, PRIORITY_REFRESH, PRIORITY_DETAIL, parse_retry_after
 from app.core.cache import cache_manager
+from app.core.http import http_pool
+from app.config import settings
 
-class DexScreenerClient:
+async def limited_get(
+    client: httpx.AsyncClient,
+    limiter: TokenBucket,
+    url: str,
+    params: Dict[str, Any] = None,
+    priority: int = PRIORITY_DETAIL
+) -> httpx.Response:
+    """GET through the upstream's token bucket, backing off when it answers 429"""
+    await limiter.acquire(priority)
+    response = await client.get(url, params=params)
+    if response.status_code == 429:
+        limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+    response.raise_for_status()
+    return response
+
+@asynccontextmanager
+async def limited_stream(
+    client: httpx.AsyncClient,
+    limiter: TokenBucket,
+    url: str,
+    params: Dict[str, Any] = None,
+    priority: int = PRIORITY_DETAIL
+) -> AsyncIterator[httpx.Response]:
+    """Like limited_get, but the body is left unread for the caller to stream"""
+    await limiter.acquire(priority)
+    async with client.stream("GET", url, params=params) as response:
+        if response.status_code == 429:
+            limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+        response.raise_for_status()
+        yield response
+
+def _pick(value: Any, *keys: str) -> Any:
+    """Keep only `keys` of a nested object, passing through anything that isn't a dict"""
+    if not isinstance(value, dict):
+        return value
+    return {key: value[key] for key in keys if key in value}
+
+def project_pair(pair: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a DexScreener pair that TokenData is built from"""
+    projected = {
+        "baseToken": _pick(pair.get("baseToken"), "address", "name", "symbol"),
+        "liquidity": _pick(pair.get("liquidity"), "usd"),
+        "volume": _pick(pair.get("volume"), "h24"),
+        "txns": _pick(pair.get("txns"), "h24"),
+        "priceChange": _pick(pair.get("priceChange"), "h1")
+    }
+    for key in ("priceUsd", "fdv", "dexId"):
+        if key in pair:
+            projected[key] = pair[key]
+    return {key: value for key, value in projected.items() if value is not None}
+
+def upstream_guard(name: str) -> UpstreamGuard:
+    return UpstreamGuard(
+        name,
+        max_retries=settings.UPSTREAM_MAX_RETRIES,
+        base_delay=settings.UPSTREAM_RETRY_BASE_DELAY,
+        max_delay=settings.UPSTREAM_RETRY_MAX_DELAY,
+        failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+        recovery_time=settings.CIRCUIT_RECOVERY_SECONDS,
+        retry_ratio=settings.UPSTREAM_RETRY_BUDGET_RATIO,
+        hedge_min_samples=settings.HEDGE_MIN_SAMPLES
+    )
+
+class PooledClient:
+    """Upstream client whose HTTP connections come from the shared, lifespan-owned pool"""
+    pool_name = ""
+    headers: Optional[Dict[str, str]] = None
+    _client: Optional[httpx.AsyncClient] = None
+    limiter: TokenBucket
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Looked up per call, so a pool reopened by a new lifespan is picked up
+        return self._client or http_pool.client(self.pool_name, self.headers)
+    
+    @client.setter
+    def client(self, value: httpx.AsyncClient):
+        self._client = value
+    
+    async def _get_json(self, url: str, params: Dict[str, Any] = None, priority: int = PRIORITY_DETAIL) -> Any:
+        response = await limited_get(self.client, self.limiter, url, params, priority)
+        return response.json()
+
+class DexScreenerClient(PooledClient):
+    pool_name = "dexscreener"
+    
     def __init__(self):
         self.base_url = "https://api.dexscreener.com"
-        self.rate_limit = 300  # requests per minute
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.rate_limit = settings.DEXSCREENER_RATE_LIMIT  # requests per minute
+        self.flights = SingleFlight()
+        self.limiter = TokenBucket("dexscreener", self.rate_limit, per=60, shared=settings.RATE_LIMIT_SHARED)
+        self.guard = upstream_guard("dexscreener")
+    
+    async def get_token_data(self, token_address: str, priority: int = PRIORITY_DETAIL) -> Dict[str, Any]:
+        # Concurrent lookups for the same token share one upstream call
+        return await self.flights.do(
+            ("token", token_address),
+            lambda: self._get_token_data(token_address, priority)
+        )
     
-    @retry_with_backoff(max_retries=3, base_delay=1.0)
-    async def get_token_data(self, token_address: str) -> Dict[str, Any]:
+    async def search_tokens(self, query: str, priority: int = PRIORITY_REFRESH) -> Dict[str, Any]:
+        return await self.flights.do(("search", query), lambda: self._search_tokens(query, priority))
+    
+    async def _get_token_data(self, token_address: str, priority: int) -> Dict[str, Any]:
         cache_key = f"dexscreener:token:{token_address}"
         cached_data = await cache_manager.get(cache_key)
         if cached_data:
             return cached_data
         
         url = f"{self.base_url}/latest/dex/tokens/{token_address}"
-        response = await self.client.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        await cache_manager.set(cache_key, data, ttl=30)
+        # A user is waiting on detail lookups, so a slow one gets a hedged twin
+        hedge = settings.HEDGE_DETAIL_REQUESTS and priority == PRIORITY_DETAIL
+        data = await self.guard.call(lambda: self._get_json(url, priority=priority), hedge=hedge)
+        await cache_manager.set(cache_key, data, ttl=30, tags=["dexscreener:token"])
         return data
     
-    @retry_with_backoff(max_retries=3, base_delay=1.0)
-    async def search_tokens(self, query: str) -> Dict[str, Any]:
+    async def _search_tokens(self, query: str, priority: int) -> Dict[str, Any]:
+        async def collect():
+            return {"pairs": [pair async for pair in self.stream_search(query, priority)]}
+        return await self.guard.call(collect)
+    
+    async def stream_search(self, query: str, priority: int = PRIORITY_REFRESH) -> AsyncIterator[Dict[str, Any]]:
+        """Projected pairs for `query`, yielded as they are parsed off the response stream.
+
+        The body is never held or decoded as a whole, and consumers can start
+        merging before the last pair arrives. Not guarded or retried itself;
+        callers wrap the whole consumption in self.guard.call.
+        """
         cache_key = f"dexscreener:search:{query}"
         cached_data = await cache_manager.get(cache_key)
         if cached_data:
-            return cached_data
+            for pair in cached_data.get("pairs") or []:
+                yield pair
+            return
         
         url = f"{self.base_url}/latest/dex/search"
         params = {"q": query}
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
+        pairs = []
+        async with limited_stream(self.client, self.limiter, url, params, priority) as response:
+            async for pair in aiter_array_items(response.aiter_bytes(), "pairs"):
+                pair = project_pair(pair)
+                pairs.append(pair)
+                yield pair
         
-        data = response.json()
-        await cache_manager.set(cache_key, data, ttl=30)
-        return data
+        # Only the projected fields are cached, which also keeps the entry small
+        await cache_manager.set(cache_key, {"pairs": pairs}, ttl=30, tags=["dexscreener:search"])
 
-class JupiterPriceClient:
+class JupiterPriceClient(PooledClient):
+    pool_name = "jupiter"
+    
     def __init__(self):
         self.base_url = "https://price.jup.ag"
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.flights = SingleFlight()
+        self.limiter = TokenBucket("jupiter", settings.JUPITER_RATE_LIMIT, per=60, shared=settings.RATE_LIMIT_SHARED)
+        self.guard = upstream_guard("jupiter")
+    
+    async def get_prices(
+        self,
+        token_ids: List[str],
+        priority: int = PRIORITY_REFRESH,
+        fresh: bool = False
+    ) -> Dict[str, Any]:
+        """Prices for `token_ids`, fetching only ids without a fresh per-token cache entry.
+
+        With fresh=True every id goes upstream; scheduled refreshes want the
+        current price, not one cached up to 30s ago.
+        """
+        ids = sorted(set(i for i in token_ids if i))
+        if fresh:
+            cached = [None] * len(ids)
+        else:
+            cached = await cache_manager.get_many([f"jupiter:price:{i}" for i in ids])
+        
+        prices = {}
+        missing = []
+        for token_id, entry in zip(ids, cached):
+            if entry is None:
+                missing.append(token_id)
+            elif entry:
+                prices[token_id] = entry
+            # An empty entry means Jupiter recently had no price for this id
+        
+        # Split into chunks that fit the upstream ids limit and fetch them concurrently
+        size = settings.JUPITER_MAX_IDS_PER_REQUEST
+        chunks = [missing[n:n + size] for n in range(0, len(missing), size)]
+        results = await asyncio.gather(
+            *(self._fetch_chunk(chunk, priority) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        errors = [r for r in results if isinstance(r, Exception)]
+        for result in results:
+            if not isinstance(result, Exception):
+                prices.update(result)
+        
+        if errors and not prices:
+            raise errors[0]
+        for error in errors:
+            print(f"Error fetching Jupiter price chunk: {error}")
+        
+        return {"data": prices}
+    
+    async def _fetch_chunk(self, token_ids: List[str], priority: int) -> Dict[str, Any]:
+        # Identical chunks requested concurrently share one upstream call
+        return await self.flights.do(
+            ("prices", tuple(token_ids)),
+            lambda: self._get_price_chunk(token_ids, priority)
+        )
+    
+    async def _get_price_chunk(self, token_ids: List[str], priority: int) -> Dict[str, Any]:
+        url = f"{self.base_url}/v4/price"
+        params = {"ids": ",".join(token_ids)}
+        response = await self.guard.call(lambda: self._get_json(url, params, priority))
+        
+        data = response.get("data") or {}
+        # Cache every id, including misses, so the next cycle doesn't ask again
+        await cache_manager.set_many(
+            {f"jupiter:price:{token_id}": data.get(token_id) or {} for token_id in token_ids},
+            ttl=30,
+            tags=["jupiter:price"]
+        )
+        return {token_id: price for token_id, price in data.items() if price}
+
+class GeckoTerminalClient(PooledClient):
+    pool_name = "geckoterminal"
+    
+    def __init__(self):
+        self.base_url = "https://api.geckoterminal.com/api/v2"
+        self.flights = SingleFlight()
+        self.limiter = TokenBucket("geckoterminal", settings.GECKOTERMINAL_RATE_LIMIT, per=60, shared=settings.RATE_LIMIT_SHARED)
+        self.guard = upstream_guard("geckoterminal")
     
-    @retry_with_backoff(max_retries=3, base_delay=1.0)
-    async def get_prices(self, token_ids: List[str]) -> Dict[str, Any]:
-        cache_key = f"jupiter:prices:{':'.join(sorted(token_ids))}"
+    async def trending_pools(self, network: str = "solana", priority: int = PRIORITY_REFRESH) -> Dict[str, Any]:
+        """Trending pools on `network`, with their base tokens under "included" (JSON:API)"""
+        return await self.flights.do(("trending", network), lambda: self._trending_pools(network, priority))
+    
+    async def _trending_pools(self, network: str, priority: int) -> Dict[str, Any]:
+        cache_key = f"geckoterminal:trending:{network}"
         cached_data = await cache_manager.get(cache_key)
         if cached_data:
             return cached_data
         
-        url = f"{self.base_url}/v4/price"
-        params = {"ids": ",".join(token_ids)}
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
+        url = f"{self.base_url}/networks/{network}/trending_pools"
+        params = {"include": "base_token,dex"}
+        data = await self.guard.call(lambda: self._get_json(url, params, priority))
+        await cache_manager.set(cache_key, data, ttl=30, tags=["geckoterminal:trending"])
+        return data
+
+class BirdeyeClient(PooledClient):
+    pool_name = "birdeye"
+    
+    def __init__(self, api_key: Optional[str] = None):
+        self.base_url = "https://public-api.birdeye.so"
+        self.headers = {"X-API-KEY": api_key or settings.BIRDEYE_API_KEY or "", "x-chain": "solana"}
+        self.flights = SingleFlight()
+        self.limiter = TokenBucket("birdeye", settings.BIRDEYE_RATE_LIMIT, per=60, shared=settings.RATE_LIMIT_SHARED)
+        self.guard = upstream_guard("birdeye")
+    
+    async def trending_tokens(self, limit: int = 20, priority: int = PRIORITY_REFRESH) -> Dict[str, Any]:
+        return await self.flights.do(("trending", limit), lambda: self._trending_tokens(limit, priority))
+    
+    async def _trending_tokens(self, limit: int, priority: int) -> Dict[str, Any]:
+        cache_key = f"birdeye:trending:{limit}"
+        cached_data = await cache_manager.get(cache_key)
+        if cached_data:
+            return cached_data
         
-        data = response.json()
-        await cache_manager.set(cache_key, data, ttl=30)
+        url = f"{self.base_url}/defi/token_trending"
+        params = {"sort_by": "rank", "sort_type": "asc", "offset": 0, "limit": limit}
+        data = await self.guard.call(lambda: self._get_json(url, params, priority))
+        await cache_manager.set(cache_key, data, ttl=30, tags=["birdeye:trending"])
         return data
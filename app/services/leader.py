@@ -0,0 +1,190 @@
+# app/services/leader.py
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+LEADER_KEY = "aggregator:leader"
+
+# Take the lease if it's free and hand out the next fencing token with it
+ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+# Extend or release the lease only if we still hold it
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Write only while our fencing token is still the latest one handed out
+FENCED_SET_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[2], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+def _as_str(value) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+class LeaderElection:
+    """Redis lease deciding which instance runs the upstream polling jobs.
+
+    The holder renews the lease every ttl/3; if it can't renew before the
+    lease runs out it steps down, and another instance takes over once the
+    key expires. Every acquisition increments a fencing token, and the
+    leader's shared writes go through fenced_set, so a paused ex-leader
+    can't overwrite its successor's results. Without Redis the instance
+    assumes it is alone and leads.
+    """
+
+    def __init__(
+        self,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+        ttl: float = 15.0,
+        key: str = LEADER_KEY
+    ):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl = ttl
+        self.key = key
+        self.epoch_key = f"{key}:epoch"
+        self.instance_id = uuid.uuid4().hex
+        self.redis = None
+        self.is_leader = False
+        self.standalone = False
+        self.fencing_token = 0
+        self.leader: Optional[str] = None  # last known holder
+        self.stats = {"elections": 0, "demotions": 0, "fenced_writes_rejected": 0}
+        self.last_failover_seconds: Optional[float] = None
+        self._elected_at = 0.0
+        self._renewed_at = 0.0
+        self._leader_seen_at: Optional[float] = None
+        self._reached = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, redis):
+        self.redis = redis
+        # Decide our role before the app starts serving
+        await self._step()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader and not self.standalone:
+            # Let a follower take over at its next attempt instead of after the TTL
+            try:
+                await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.instance_id)
+            except Exception:
+                pass
+        self.is_leader = False
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self._step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Leader election error: {e}")
+
+    async def _step(self):
+        ttl_ms = int(self.ttl * 1000)
+        holder = None
+        try:
+            if self.is_leader and not self.standalone:
+                held = await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.instance_id, ttl_ms)
+            else:
+                token = await self.redis.eval(ACQUIRE_SCRIPT, 2, self.key, self.epoch_key, self.instance_id, ttl_ms)
+                held = bool(token)
+                if held:
+                    self.fencing_token = int(token)
+                else:
+                    holder = _as_str(await self.redis.get(self.key))
+        except Exception as e:
+            if not self.is_leader and not self._reached:
+                # Never reached Redis: assume we're the only instance
+                print(f"Leader election unavailable ({e}); running standalone")
+                self.standalone = True
+                await self._elect()
+            elif self.is_leader and not self.standalone and time.monotonic() - self._renewed_at > self.ttl:
+                # Our lease has run out, so another instance may hold it by now
+                await self._demote()
+            return
+
+        self._reached = True
+        now = time.monotonic()
+        if held:
+            self._renewed_at = now
+            self.leader = self.instance_id
+            if not self.is_leader or self.standalone:
+                if self._leader_seen_at is not None:
+                    # Upper bound: the old lease lapsed somewhere after we last saw it held
+                    self.last_failover_seconds = now - self._leader_seen_at
+                    self._leader_seen_at = None
+                self.standalone = False
+                if not self.is_leader:
+                    await self._elect()
+        else:
+            self.leader = holder
+            if holder is not None:
+                self._leader_seen_at = now
+            if self.is_leader:
+                # Lost the lease, or Redis came back and another instance leads
+                self.standalone = False
+                await self._demote()
+
+    async def fenced_set(self, key: str, value: Union[str, bytes], ttl: float) -> bool:
+        """Write a shared result as leader; a stale token demotes us instead"""
+        if not self.is_leader or self.standalone:
+            return False
+        written = await self.redis.eval(
+            FENCED_SET_SCRIPT, 2, self.epoch_key, key, self.fencing_token, value, int(ttl * 1000)
+        )
+        if not written:
+            print(f"Fencing token {self.fencing_token} is stale; stepping down")
+            self.stats["fenced_writes_rejected"] += 1
+            await self._demote()
+            return False
+        return True
+
+    async def _elect(self):
+        self.is_leader = True
+        self._elected_at = time.monotonic()
+        self.stats["elections"] += 1
+        await self.on_elected()
+
+    async def _demote(self):
+        self.is_leader = False
+        self.stats["demotions"] += 1
+        await self.on_demoted()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            instance_id=self.instance_id,
+            is_leader=self.is_leader,
+            standalone=self.standalone,
+            leader=self.leader,
+            fencing_token=self.fencing_token,
+            leader_for_seconds=round(time.monotonic() - self._elected_at, 3) if self.is_leader else None,
+            last_failover_seconds=self.last_failover_seconds
+        )
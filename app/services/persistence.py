@@ -0,0 +1,80 @@
+# app/services/persistence.py
+from typing import Dict, Iterable, List
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.config import settings
+from app.core.database import TokenModel, async_session, engine
+from app.models.token import TokenData
+
+COLUMNS = [column.name for column in TokenModel.__table__.columns]
+UPDATE_COLUMNS = [name for name in COLUMNS if name != "token_address"]
+
+class TokenRepository:
+    """Bulk persistence of the aggregated token universe to the tokens table"""
+
+    def __init__(self, session_factory=async_session, db_engine=engine):
+        self.session_factory = session_factory
+        self.engine = db_engine
+
+    @staticmethod
+    def to_row(token: TokenData) -> Dict:
+        return {name: getattr(token, name) for name in COLUMNS}
+
+    @staticmethod
+    def upsert_statement(rows: List[Dict]):
+        """One INSERT ... ON CONFLICT (token_address) DO UPDATE for all rows"""
+        stmt = pg_insert(TokenModel).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[TokenModel.token_address],
+            set_={name: stmt.excluded[name] for name in UPDATE_COLUMNS}
+        )
+
+    async def upsert_tokens(self, tokens: Iterable[TokenData]) -> int:
+        """Write tokens in a single transaction, using COPY for large batches"""
+        rows = [self.to_row(token) for token in tokens]
+        if not rows:
+            return 0
+        if len(rows) >= settings.DB_COPY_THRESHOLD:
+            return await self._copy_upsert(rows)
+
+        # Postgres caps bind parameters per statement, so very wide cycles are chunked
+        size = settings.DB_UPSERT_BATCH
+        async with self.session_factory() as session:
+            async with session.begin():
+                for i in range(0, len(rows), size):
+                    await session.execute(self.upsert_statement(rows[i:i + size]))
+        return len(rows)
+
+    async def _copy_upsert(self, rows: List[Dict]) -> int:
+        # COPY into a temporary staging table, then merge it in one statement
+        assignments = ", ".join(f"{name} = EXCLUDED.{name}" for name in UPDATE_COLUMNS)
+        async with self.engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            await driver.execute(
+                "CREATE TEMP TABLE tokens_staging (LIKE tokens INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            await driver.copy_records_to_table(
+                "tokens_staging",
+                records=[tuple(row[name] for name in COLUMNS) for row in rows],
+                columns=COLUMNS
+            )
+            await driver.execute(
+                f"INSERT INTO tokens ({', '.join(COLUMNS)}) "
+                f"SELECT {', '.join(COLUMNS)} FROM tokens_staging "
+                f"ON CONFLICT (token_address) DO UPDATE SET {assignments}"
+            )
+        return len(rows)
+
+    async def load_tokens(self, limit: int) -> List[TokenData]:
+        """Top tokens by volume, used to warm state before the first upstream fetch"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(TokenModel).order_by(TokenModel.volume_sol.desc()).limit(limit)
+            )
+            return [
+                TokenData(**{name: getattr(row, name) for name in COLUMNS if getattr(row, name) is not None})
+                for row in result.scalars()
+            ]
+
+token_repository = TokenRepository()
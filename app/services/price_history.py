@@ -0,0 +1,124 @@
+# app/services/price_history.py
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.config import settings
+from app.core.database import TokenCandleModel, TokenPriceHistoryModel, async_session
+from app.models.token import TokenData
+
+# Candle interval name -> bucket width in seconds
+INTERVALS = {"1m": 60, "5m": 300, "1h": 3600}
+
+# Buckets rows by flooring the epoch; open/close come from the first/last sample.
+# volume_sol is the rolling 24h volume last reported in the bucket.
+ROLLUP_SQL = text("""
+INSERT INTO token_candles
+    (token_address, interval, bucket_start, open, high, low, close, volume_sol, samples)
+SELECT
+    token_address,
+    :interval,
+    bucket_start,
+    (array_agg(price_sol ORDER BY recorded_at))[1],
+    max(price_sol),
+    min(price_sol),
+    (array_agg(price_sol ORDER BY recorded_at DESC))[1],
+    (array_agg(volume_sol ORDER BY recorded_at DESC))[1],
+    count(*)
+FROM (
+    SELECT *,
+        to_timestamp(floor(extract(epoch FROM recorded_at) / :seconds) * :seconds)
+            AT TIME ZONE 'UTC' AS bucket_start
+    FROM token_price_history
+    WHERE recorded_at >= :since
+) samples
+GROUP BY token_address, bucket_start
+ON CONFLICT (token_address, interval, bucket_start) DO UPDATE SET
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume_sol = EXCLUDED.volume_sol,
+    samples = EXCLUDED.samples
+""")
+
+def naive_utc(moment: datetime) -> datetime:
+    """`moment` as the naive UTC datetime the tables store; naive input is taken as UTC"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def bucket_floor(moment: datetime, seconds: int) -> datetime:
+    moment = naive_utc(moment)
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(seconds=int((moment - epoch).total_seconds()) // seconds * seconds)
+
+class PriceHistoryService:
+    """Append-only price samples with candle rollups and range queries"""
+
+    def __init__(self, session_factory=async_session):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def to_row(token: TokenData) -> Dict:
+        return {
+            "token_address": token.token_address,
+            "recorded_at": token.last_updated,
+            "price_sol": token.price_sol,
+            "volume_sol": token.volume_sol,
+            "liquidity_sol": token.liquidity_sol,
+            "market_cap_sol": token.market_cap_sol,
+            "transaction_count": token.transaction_count
+        }
+
+    async def record(self, tokens: Iterable[TokenData]) -> int:
+        """Append one sample per token; duplicates of the same instant are ignored"""
+        rows = [self.to_row(token) for token in tokens]
+        if not rows:
+            return 0
+        size = settings.DB_UPSERT_BATCH
+        async with self.session_factory() as session:
+            async with session.begin():
+                for i in range(0, len(rows), size):
+                    await session.execute(
+                        pg_insert(TokenPriceHistoryModel).values(rows[i:i + size]).on_conflict_do_nothing()
+                    )
+        return len(rows)
+
+    async def rollup(self, now: Optional[datetime] = None):
+        """Recompute recent candles for every interval; safe to re-run"""
+        now = now or datetime.utcnow()
+        async with self.session_factory() as session:
+            async with session.begin():
+                for interval, seconds in INTERVALS.items():
+                    # Redo the previous bucket too so late samples are folded in
+                    since = bucket_floor(now, seconds) - timedelta(seconds=seconds)
+                    await session.execute(ROLLUP_SQL, {"interval": interval, "seconds": seconds, "since": since})
+
+                cutoff = now - timedelta(days=settings.PRICE_HISTORY_RETENTION_DAYS)
+                await session.execute(
+                    delete(TokenPriceHistoryModel).where(TokenPriceHistoryModel.recorded_at < cutoff)
+                )
+
+    async def get_candles(
+        self,
+        token_address: str,
+        interval: str,
+        start: datetime,
+        end: datetime
+    ) -> List[TokenCandleModel]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(TokenCandleModel)
+                .where(
+                    TokenCandleModel.token_address == token_address,
+                    TokenCandleModel.interval == interval,
+                    TokenCandleModel.bucket_start >= bucket_floor(start, INTERVALS[interval]),
+                    TokenCandleModel.bucket_start < end
+                )
+                .order_by(TokenCandleModel.bucket_start)
+                .limit(settings.OHLCV_MAX_CANDLES)
+            )
+            return list(result.scalars())
+
+price_history_service = PriceHistoryService()
@@ -0,0 +1,153 @@
+# app/services/refresh_scheduler.py
+import heapq
+import math
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from app.models.token import TokenData
+
+class RefreshScheduler:
+    """Per-token price refresh intervals, batched into budgeted upstream calls.
+
+    A token's share of the refresh rate grows with its volatility, volume and
+    subscriber interest. Shares are normalized so the universe as a whole is
+    re-priced no more often than a fixed `base_interval` cycle would, and
+    calls are spent no faster than that cycle spends them (nor faster than
+    `calls_per_minute`): hot tokens get fresher by taking refreshes away
+    from dead ones, not by asking upstream for more.
+    """
+
+    def __init__(
+        self,
+        base_interval: float = 30.0,
+        min_interval: float = 5.0,
+        max_interval: float = 300.0,
+        batch_size: int = 100,
+        calls_per_minute: float = 12.0
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self.max_call_rate = calls_per_minute / 60  # calls per second
+        self.call_rate = self.max_call_rate
+        self.burst = 1.0
+        self.intervals: Dict[str, float] = {}
+        self._due: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []  # (due, address); stale entries are skipped
+        self._allowance = 1.0
+        self._updated = None
+        self.stats = {"batches": 0, "calls": 0, "tokens_refreshed": 0, "deferred": 0}
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    @staticmethod
+    def weight(token: TokenData, interest: int) -> float:
+        change = token.price_change if token.price_change is not None else token.price_1hr_change
+        volatility = abs(change or 0.0)
+        activity = math.log1p(max(token.volume_sol, 0.0))
+        return (1 + volatility / 5) * (1 + activity / 10) * (1 + interest)
+
+    def plan(self, tokens: Iterable[TokenData], interest: Callable[[str], int], now: float):
+        """Recompute intervals for the current universe.
+
+        New tokens become due one interval from now; tokens that got hotter
+        are pulled forward, and dropped tokens are forgotten.
+        """
+        weights = {t.token_address: self.weight(t, interest(t.token_address)) for t in tokens}
+        total = sum(weights.values())
+        # Spend calls no faster than re-pricing everything every base_interval would
+        fixed_calls = math.ceil(len(weights) / self.batch_size) / self.base_interval
+        self.call_rate = min(self.max_call_rate, fixed_calls) or self.max_call_rate
+        self.burst = max(1.0, self.call_rate * 10)  # ten seconds' worth
+        # Refreshes per second the whole universe may use
+        rate = min(len(weights) / self.base_interval, self.call_rate * self.batch_size)
+
+        intervals = {}
+        for address, weight in weights.items():
+            share = rate * weight / total if total else 0.0
+            interval = 1 / share if share else self.max_interval
+            intervals[address] = min(self.max_interval, max(self.min_interval, interval))
+
+        for address in set(self.intervals) - set(intervals):
+            self._due.pop(address, None)
+        self.intervals = intervals
+        for address, interval in intervals.items():
+            due = self._due.get(address)
+            if due is None or due > now + interval:
+                self._schedule(address, now + interval)
+
+        # Rebuild once stale entries dominate the heap
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, address) for address, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def _schedule(self, address: str, due: float):
+        self._due[address] = due
+        heapq.heappush(self._heap, (due, address))
+
+    def _peek(self):
+        while self._heap:
+            due, address = self._heap[0]
+            if self._due.get(address) == due:
+                return due, address
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop(self) -> str:
+        _, address = heapq.heappop(self._heap)
+        del self._due[address]
+        return address
+
+    def take_due(self, now: float) -> List[str]:
+        """Addresses to re-price now, most overdue first, within the call budget.
+
+        The last call is topped up with the tokens due soonest, since a
+        partly filled batch costs the same upstream request as a full one.
+        """
+        if self._updated is not None:
+            self._allowance = min(self.burst, self._allowance + (now - self._updated) * self.call_rate)
+        self._updated = now
+
+        head = self._peek()
+        if head is None or head[0] > now:
+            return []
+        calls = int(self._allowance)
+        if not calls:
+            self.stats["deferred"] += 1
+            return []
+
+        batch: List[str] = []
+        limit = calls * self.batch_size
+        while len(batch) < limit:
+            head = self._peek()
+            if head is None or head[0] > now:
+                break
+            batch.append(self._pop())
+
+        filled = math.ceil(len(batch) / self.batch_size) * self.batch_size
+        while len(batch) < filled and self._peek() is not None:
+            batch.append(self._pop())
+
+        used = math.ceil(len(batch) / self.batch_size)
+        self._allowance -= used
+        self.stats["batches"] += 1
+        self.stats["calls"] += used
+        self.stats["tokens_refreshed"] += len(batch)
+        return batch
+
+    def completed(self, addresses: Iterable[str], now: float):
+        """Schedule the next refresh of a batch, whether or not it succeeded"""
+        for address in addresses:
+            interval = self.intervals.get(address)
+            if interval is not None:
+                self._schedule(address, now + interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        intervals = sorted(self.intervals.values())
+        return dict(
+            self.stats,
+            tracked=len(intervals),
+            min_interval=round(intervals[0], 2) if intervals else None,
+            median_interval=round(intervals[len(intervals) // 2], 2) if intervals else None,
+            max_interval=round(intervals[-1], 2) if intervals else None
+        )
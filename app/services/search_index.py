@@ -0,0 +1,182 @@
+# app/services/search_index.py
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from app.models.token import TokenData
+
+GRAM = 3  # queries at least this long match substrings of ticker and name
+PREFIX = GRAM - 1  # shorter queries match word prefixes instead
+
+# Match tiers, best first
+EXACT = 0  # ticker or full address equals the query
+TICKER_PREFIX = 1
+PREFIX_MATCH = 2  # name, any word in the name, or address starts with the query
+SUBSTRING = 3
+
+RankKey = Tuple  # (tier, *sort key)
+
+_WORD = re.compile(r"[^\W_]+")
+
+def normalize(text: str) -> str:
+    return text.strip().lower()
+
+def grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+def words(name: str) -> Tuple[str, ...]:
+    return tuple(_WORD.findall(name))
+
+def short_prefixes(*terms: str) -> Set[str]:
+    return {term[:n] for term in terms for n in range(1, PREFIX + 1) if len(term) >= n}
+
+class SearchIndex:
+    """Incrementally maintained index over ticker, name and address.
+
+    Ticker and name are indexed by trigram for substring queries and by word
+    prefix for one- and two-character queries; addresses live in a sorted list
+    for prefix lookups. Queries only touch the postings they need.
+    """
+
+    def __init__(self):
+        self._terms: Dict[str, Tuple[str, str, str, Tuple[str, ...]]] = {}  # lower-cased ticker, name, address, name words
+        self._grams: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Set[str]] = {}
+        self._ticker_prefixes: Dict[str, Set[str]] = {}
+        self._tickers: Dict[str, Set[str]] = {}
+        self._addresses: List[Tuple[str, str]] = []  # sorted (lower-cased address, address)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, token_address: str) -> bool:
+        return token_address in self._terms
+
+    def add(self, token: TokenData):
+        """Index a token, re-indexing it only if its ticker or name changed"""
+        address = token.token_address
+        name = normalize(token.token_name)
+        terms = (normalize(token.token_ticker), name, address.lower(), words(name))
+        existing = self._terms.get(address)
+        if existing == terms:
+            return
+        if existing is not None:
+            self.remove(address)
+
+        ticker, name, lowered, name_words = terms
+        self._terms[address] = terms
+        for gram in grams(ticker) | grams(name):
+            self._grams.setdefault(gram, set()).add(address)
+        for prefix in short_prefixes(ticker, *name_words):
+            self._prefixes.setdefault(prefix, set()).add(address)
+        for prefix in short_prefixes(ticker):
+            self._ticker_prefixes.setdefault(prefix, set()).add(address)
+        self._tickers.setdefault(ticker, set()).add(address)
+        insort(self._addresses, (lowered, address))
+
+    def update(self, tokens: Iterable[TokenData], removed: Iterable[str] = ()):
+        for token in tokens:
+            self.add(token)
+        for address in removed:
+            self.remove(address)
+
+    def remove(self, token_address: str):
+        terms = self._terms.pop(token_address, None)
+        if terms is None:
+            return
+        ticker, name, lowered, name_words = terms
+        for gram in grams(ticker) | grams(name):
+            self._discard(self._grams, gram, token_address)
+        for prefix in short_prefixes(ticker, *name_words):
+            self._discard(self._prefixes, prefix, token_address)
+        for prefix in short_prefixes(ticker):
+            self._discard(self._ticker_prefixes, prefix, token_address)
+        self._discard(self._tickers, ticker, token_address)
+        del self._addresses[bisect_left(self._addresses, (lowered, token_address))]
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[str]], term: str, address: str):
+        entries = postings.get(term)
+        if entries is not None:
+            entries.discard(address)
+            if not entries:
+                del postings[term]
+
+    def _address_prefix(self, query: str) -> Set[str]:
+        found = set()
+        addresses = self._addresses
+        for i in range(bisect_left(addresses, (query, "")), len(addresses)):
+            lowered, address = addresses[i]
+            if not lowered.startswith(query):
+                break
+            found.add(address)
+        return found
+
+    def _tiers(self, query: str) -> List[Set[str]]:
+        """Matching addresses grouped by tier, best first"""
+        if len(query) < GRAM:
+            # Short queries only match prefixes, so tiers fall out of set arithmetic
+            exact = self._tickers.get(query, set())
+            ticker_prefix = self._ticker_prefixes.get(query, set()) - exact
+            rest = (self._prefixes.get(query, set()) | self._address_prefix(query)) - exact - ticker_prefix
+            return [exact, ticker_prefix, rest, set()]
+
+        # Intersect smallest postings first; any missing gram means no text match
+        postings = sorted((self._grams.get(g, set()) for g in grams(query)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        candidates |= self._address_prefix(query)
+
+        tiers: List[Set[str]] = [set(), set(), set(), set()]
+        for address in candidates:
+            match = self.tier(query, address)
+            if match is not None:
+                tiers[match].add(address)
+        return tiers
+
+    def tier(self, query: str, token_address: str) -> Optional[int]:
+        """Best match tier for one indexed token, or None if it doesn't match"""
+        terms = self._terms.get(token_address)
+        if terms is None:
+            return None
+        ticker, name, address, name_words = terms
+        if ticker == query or address == query:
+            return EXACT
+        if ticker.startswith(query):
+            return TICKER_PREFIX
+        if address.startswith(query) or any(word.startswith(query) for word in name_words):
+            return PREFIX_MATCH
+        if query in ticker or query in name:
+            return SUBSTRING
+        return None
+
+    def search(
+        self,
+        query: str,
+        key: Callable[[str], Optional[tuple]],
+        limit: int,
+        after: Optional[RankKey] = None
+    ) -> Tuple[int, List[RankKey]]:
+        """Count all matches and return the best `limit` of them after `after`.
+
+        Results are ordered by tier, then by `key(address)`; tokens for which
+        `key` returns None are skipped. Each result is (tier, *key). Work is
+        proportional to the number of candidates, never the whole universe.
+        """
+        query = normalize(query)
+        if not query:
+            return 0, []
+
+        total = 0
+        ranked: List[RankKey] = []
+        for tier, addresses in enumerate(self._tiers(query)):
+            keys = list(filter(None, map(key, addresses)))
+            total += len(keys)
+            if after is not None:
+                if after[0] > tier:
+                    continue
+                if after[0] == tier:
+                    bound = tuple(after[1:])
+                    keys = [k for k in keys if k > bound]
+            if len(ranked) < limit:
+                ranked.extend((tier, *k) for k in heapq.nsmallest(limit - len(ranked), keys))
+        return total, ranked
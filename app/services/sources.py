@@ -0,0 +1,403 @@
+# app/services/sources.py
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from app.models.token import TokenData
+from app.services.dex_clients import (
+    PooledClient, DexScreenerClient, JupiterPriceClient, GeckoTerminalClient, BirdeyeClient
+)
+from app.config import settings
+
+@dataclass
+class Quote:
+    """What one source reports for one token; None where it has no opinion"""
+    price: Optional[float] = None
+    liquidity: Optional[float] = None
+    volume: Optional[float] = None
+    token: Optional[TokenData] = None  # full record, from sources that list tokens
+
+    @classmethod
+    def of(cls, token: TokenData) -> "Quote":
+        return cls(
+            price=token.price_sol or None,
+            liquidity=token.liquidity_sol or None,
+            volume=token.volume_sol or None,
+            token=token
+        )
+
+class TokenSource(ABC):
+    """One upstream that contributes quotes to the trending universe.
+
+    Sources that `discover` list tokens of their own, with metadata; the
+    others only quote addresses we already track.
+    """
+    name = ""
+    client_class: Type[PooledClient] = PooledClient
+    discovers = True
+
+    def __init__(self, client: Optional[PooledClient] = None):
+        self.client = client or self.client_class()
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return True
+
+    @abstractmethod
+    async def fetch(self, known: List[str]) -> Dict[str, Quote]:
+        """Quotes by token address; `known` are the addresses already tracked"""
+
+# name -> source class; see register_source
+SOURCES: Dict[str, Type[TokenSource]] = {}
+
+def register_source(name: str) -> Callable[[Type[TokenSource]], Type[TokenSource]]:
+    """Class decorator making a source selectable through settings.TOKEN_SOURCES"""
+    def register(cls: Type[TokenSource]) -> Type[TokenSource]:
+        cls.name = name
+        SOURCES[name] = cls
+        return cls
+    return register
+
+def create_sources(names: List[str], clients: Optional[Dict[str, PooledClient]] = None) -> List[TokenSource]:
+    """Instantiate the named sources, reusing `clients` the caller already holds"""
+    sources = []
+    for name in names:
+        cls = SOURCES.get(name)
+        if cls is None:
+            print(f"Unknown token source: {name}")
+        elif not cls.enabled():
+            print(f"Token source {name} is not configured, skipping it")
+        else:
+            sources.append(cls((clients or {}).get(name)))
+    return sources
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+def merge_pair(result: Dict[str, TokenData], pair: Dict[str, Any]):
+    """Fold one DexScreener pair into the tokens merged so far"""
+    base_token = pair.get("baseToken", {})
+    token_address = base_token.get("address")
+
+    if not token_address:
+        return
+
+    # Check if token already in result (avoid duplicates)
+    existing_token = result.get(token_address)
+
+    if existing_token:
+        # Update existing token with additional data
+        txns = pair.get("txns", {}).get("h24", {})
+        # Make sure we're handling the different possible formats of txns
+        if isinstance(txns, dict):
+            txn_count = txns.get("buys", 0) + txns.get("sells", 0)
+        else:
+            txn_count = int(txns) if txns else 0
+
+        existing_token.transaction_count += txn_count
+
+        # Use the protocol with higher liquidity
+        liquidity_usd = pair.get("liquidity", {}).get("usd", 0)
+        if isinstance(liquidity_usd, (int, float)) and liquidity_usd > existing_token.liquidity_sol:
+            existing_token.protocol = pair.get("dexId", "Unknown")
+            existing_token.liquidity_sol = float(liquidity_usd)
+    else:
+        # Create new token entry
+        try:
+            # Get price
+            price_usd = pair.get("priceUsd", 0)
+            price_sol = float(price_usd) if price_usd else 0
+
+            # Get liquidity
+            liquidity = pair.get("liquidity", {}).get("usd", 0)
+            liquidity_sol = float(liquidity) if liquidity else 0
+
+            # Get volume
+            volume = pair.get("volume", {}).get("h24", 0)
+            volume_sol = float(volume) if volume else 0
+
+            # Get transaction count
+            txns = pair.get("txns", {}).get("h24", {})
+            if isinstance(txns, dict):
+                txn_count = txns.get("buys", 0) + txns.get("sells", 0)
+            else:
+                txn_count = int(txns) if txns else 0
+
+            # Get price change
+            price_change = pair.get("priceChange", {}).get("h1", 0)
+            price_1hr_change = float(price_change) if price_change else 0
+
+            # Get market cap (fdv)
+            market_cap = pair.get("fdv", 0)
+            market_cap_sol = float(market_cap) if market_cap else 0
+
+            token = TokenData(
+                token_address=token_address,
+                token_name=base_token.get("name", "Unknown"),
+                token_ticker=base_token.get("symbol", "UNKNOWN"),
+                price_sol=price_sol,
+                market_cap_sol=market_cap_sol,
+                volume_sol=volume_sol,
+                liquidity_sol=liquidity_sol,
+                transaction_count=txn_count,
+                price_1hr_change=price_1hr_change,
+                protocol=pair.get("dexId", "Unknown")
+            )
+            result[token_address] = token
+        except Exception as e:
+            print(f"Error creating token data: {e}")
+
+async def merge_trending(client: DexScreenerClient, query: str) -> Dict[str, TokenData]:
+    """Merge search results pair by pair, without materializing the response.
+
+    A failure mid-stream restarts the merge from scratch on retry.
+    """
+    async def merge():
+        result: Dict[str, TokenData] = {}
+        async for pair in client.stream_search(query):
+            merge_pair(result, pair)
+        return result
+    return await client.guard.call(merge)
+
+@register_source("dexscreener")
+class DexScreenerSource(TokenSource):
+    client_class = DexScreenerClient
+
+    def __init__(self, client: Optional[DexScreenerClient] = None, query: str = "solana trending"):
+        super().__init__(client)
+        self.query = query
+
+    async def fetch(self, known: List[str]) -> Dict[str, Quote]:
+        tokens = await merge_trending(self.client, self.query)
+        return {address: Quote.of(token) for address, token in tokens.items()}
+
+@register_source("jupiter")
+class JupiterSource(TokenSource):
+    """Prices for tokens we already track; Jupiter lists nothing of its own"""
+    client_class = JupiterPriceClient
+    discovers = False
+
+    async def fetch(self, known: List[str]) -> Dict[str, Quote]:
+        if not known:
+            return {}
+        return parse_jupiter_prices(await self.client.get_prices(known))
+
+def parse_jupiter_prices(body: Dict[str, Any]) -> Dict[str, Quote]:
+    """Price-only quotes from a Jupiter price response"""
+    return {
+        address: Quote(price=_float(entry.get("price")))
+        for address, entry in (body.get("data") or {}).items()
+        if entry
+    }
+
+@register_source("geckoterminal")
+class GeckoTerminalSource(TokenSource):
+    client_class = GeckoTerminalClient
+
+    async def fetch(self, known: List[str]) -> Dict[str, Quote]:
+        return parse_geckoterminal_pools(await self.client.trending_pools())
+
+def _related_id(pool: Dict[str, Any], name: str) -> Optional[str]:
+    related = ((pool.get("relationships") or {}).get(name) or {}).get("data") or {}
+    return related.get("id")
+
+def parse_geckoterminal_pools(body: Dict[str, Any]) -> Dict[str, Quote]:
+    """Quotes from a trending_pools response, one per base token, from its most liquid pool"""
+    included = {
+        item.get("id"): item.get("attributes") or {}
+        for item in body.get("included") or []
+        if item.get("type") == "token"
+    }
+    quotes: Dict[str, Quote] = {}
+    for pool in body.get("data") or []:
+        attributes = pool.get("attributes") or {}
+        token_id = _related_id(pool, "base_token") or ""
+        meta = included.get(token_id, {})
+        # Ids look like "solana_<address>"
+        address = meta.get("address") or token_id.partition("_")[2]
+        if not address:
+            continue
+
+        txns = (attributes.get("transactions") or {}).get("h24") or {}
+        txn_count = int(txns.get("buys", 0) or 0) + int(txns.get("sells", 0) or 0)
+        liquidity = _float(attributes.get("reserve_in_usd"))
+        existing = quotes.get(address)
+        if existing is not None:
+            # Another pool of the same token: count its trades, keep the deeper pool's numbers
+            existing.token.transaction_count += txn_count
+            if (liquidity or 0) <= (existing.liquidity or 0):
+                continue
+            txn_count = existing.token.transaction_count
+
+        pool_name = attributes.get("name") or ""
+        token = TokenData(
+            token_address=address,
+            token_name=meta.get("name") or pool_name.split(" / ")[0] or "Unknown",
+            token_ticker=meta.get("symbol") or "UNKNOWN",
+            price_sol=_float(attributes.get("base_token_price_usd")) or 0,
+            market_cap_sol=_float(attributes.get("market_cap_usd")) or _float(attributes.get("fdv_usd")) or 0,
+            volume_sol=_float((attributes.get("volume_usd") or {}).get("h24")) or 0,
+            liquidity_sol=liquidity or 0,
+            transaction_count=txn_count,
+            price_1hr_change=float((attributes.get("price_change_percentage") or {}).get("h1") or 0),
+            protocol=_related_id(pool, "dex") or "Unknown"
+        )
+        quotes[address] = Quote.of(token)
+    return quotes
+
+@register_source("birdeye")
+class BirdeyeSource(TokenSource):
+    client_class = BirdeyeClient
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return bool(settings.BIRDEYE_API_KEY)
+
+    async def fetch(self, known: List[str]) -> Dict[str, Quote]:
+        return parse_birdeye_tokens(await self.client.trending_tokens())
+
+def parse_birdeye_tokens(body: Dict[str, Any]) -> Dict[str, Quote]:
+    """Quotes from a token_trending response"""
+    data = body.get("data") or {}
+    quotes: Dict[str, Quote] = {}
+    for item in data.get("tokens") or data.get("items") or []:
+        address = item.get("address")
+        if not address:
+            continue
+        token = TokenData(
+            token_address=address,
+            token_name=item.get("name") or "Unknown",
+            token_ticker=item.get("symbol") or "UNKNOWN",
+            price_sol=_float(item.get("price")) or 0,
+            market_cap_sol=_float(item.get("marketcap")) or _float(item.get("fdv")) or 0,
+            volume_sol=_float(item.get("volume24hUSD")) or 0,
+            liquidity_sol=_float(item.get("liquidity")) or 0,
+            transaction_count=0,
+            price_1hr_change=0,
+            protocol="Unknown"  # Birdeye aggregates across DEXes
+        )
+        quotes[address] = Quote.of(token)
+    return quotes
+
+class SourceFanIn:
+    """Fetches every source concurrently, each bounded by its own deadline.
+
+    A source that fails or runs out of time is left out of the cycle, so
+    the slowest source delays a refresh by at most its deadline.
+    """
+
+    def __init__(self, sources: List[TokenSource], deadlines: Dict[str, float], default_deadline: float = 5.0):
+        self.sources = sources
+        self.deadlines = {source.name: deadlines.get(source.name, default_deadline) for source in sources}
+        self.stats = {
+            source.name: {"fetches": 0, "timeouts": 0, "errors": 0, "quotes": 0, "last_ms": None}
+            for source in sources
+        }
+
+    @property
+    def discovering(self) -> List[str]:
+        return [source.name for source in self.sources if source.discovers]
+
+    @property
+    def quoting(self) -> List[TokenSource]:
+        """Sources that only price addresses they are given"""
+        return [source for source in self.sources if not source.discovers]
+
+    async def fetch(self, known: List[str]) -> Dict[str, Dict[str, Quote]]:
+        """Quotes per source that answered in time; `known` is what price-only sources are asked about"""
+        return await self._fetch_all(self.sources, known)
+
+    async def quote(self, addresses: List[str]) -> Dict[str, Dict[str, Quote]]:
+        """Ask just the price-only sources about `addresses`, within the same deadlines"""
+        return await self._fetch_all(self.quoting, addresses)
+
+    async def _fetch_all(self, sources: List[TokenSource], known: List[str]) -> Dict[str, Dict[str, Quote]]:
+        results = await asyncio.gather(*(self._fetch(source, known) for source in sources))
+        return {source.name: quotes for source, quotes in zip(sources, results) if quotes is not None}
+
+    async def _fetch(self, source: TokenSource, known: List[str]) -> Optional[Dict[str, Quote]]:
+        stats = self.stats[source.name]
+        deadline = self.deadlines[source.name]
+        stats["fetches"] += 1
+        start = time.monotonic()
+        try:
+            quotes = await asyncio.wait_for(source.fetch(known), deadline)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            print(f"Token source {source.name} missed its {deadline}s deadline")
+            return None
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"Error fetching token source {source.name}: {e}")
+            return None
+        finally:
+            stats["last_ms"] = round((time.monotonic() - start) * 1000, 1)
+        stats["quotes"] = len(quotes)
+        return quotes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: dict(stats, deadline=self.deadlines[name]) for name, stats in self.stats.items()}
+
+def weighted_median(values: List[Tuple[float, float]]) -> float:
+    """Median of (value, weight) pairs, each value counting `weight` times"""
+    ordered = sorted(values)
+    half = sum(weight for _, weight in ordered) / 2
+    total = 0.0
+    for value, weight in ordered:
+        total += weight
+        if total >= half:
+            return value
+    return ordered[-1][0]
+
+def reconcile(values: List[Tuple[Optional[float], float]], max_deviation: float) -> Optional[float]:
+    """Weighted mean of (value, weight) pairs, ignoring values more than
+    `max_deviation` times off the weighted median, so one broken source
+    can't drag the result.
+    """
+    values = [(value, weight) for value, weight in values if value is not None and weight > 0]
+    if not values:
+        return None
+    median = weighted_median(values)
+    kept = [(value, weight) for value, weight in values if median / max_deviation <= value <= median * max_deviation]
+    return sum(value * weight for value, weight in kept) / sum(weight for _, weight in kept)
+
+RECONCILED_FIELDS = (("price_sol", "price"), ("liquidity_sol", "liquidity"), ("volume_sol", "volume"))
+
+def merge_quotes(
+    results: Dict[str, Dict[str, Quote]],
+    weights: Dict[str, float],
+    max_deviation: float = 5.0
+) -> Dict[str, TokenData]:
+    """One TokenData per listed token, reconciled across sources.
+
+    Name, ticker and the other metadata come from the highest-weighted
+    source listing the token; price, liquidity and volume are weighted over
+    every source quoting them (see reconcile). Tokens that no source lists
+    are dropped.
+    """
+    # Stable sort: equal weights keep the configured source order
+    ranked = sorted(results, key=lambda name: -weights.get(name, 1.0))
+    merged: Dict[str, TokenData] = {}
+    for name in ranked:
+        for address, quote in results[name].items():
+            if quote.token is not None and address not in merged:
+                merged[address] = quote.token
+    if len(results) < 2:
+        return merged
+
+    for address, token in merged.items():
+        quotes = [(results[name][address], weights.get(name, 1.0)) for name in ranked if address in results[name]]
+        if len(quotes) < 2:
+            continue
+        update = {}
+        for field, attribute in RECONCILED_FIELDS:
+            value = reconcile([(getattr(quote, attribute), weight) for quote, weight in quotes], max_deviation)
+            if value is not None:
+                update[field] = value
+        merged[address] = token.model_copy(update=update)
+    return merged
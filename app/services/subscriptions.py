@@ -0,0 +1,213 @@
+# app/services/subscriptions.py
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from app.services.token_store import SORT_FIELDS, SnapshotDiff, TokenSnapshot
+
+MAX_TOP_N = 500
+
+@dataclass(frozen=True)
+class TokenFilter:
+    """Server-side filter for a subscription. Equal filters share one evaluation."""
+    min_liquidity: Optional[float] = None
+    min_volume: Optional[float] = None
+    protocol: Optional[str] = None
+    top_n: Optional[int] = None
+    sort_by: str = "volume_sol"
+
+    @classmethod
+    def from_message(cls, data: Dict[str, Any]) -> "TokenFilter":
+        """Build a filter from a subscribe message; raises ValueError for bad input"""
+        if not isinstance(data, dict):
+            raise ValueError("filter must be an object")
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+
+        sort_by = data.get("sort_by", "volume_sol")
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"sort_by must be one of {', '.join(SORT_FIELDS)}")
+        top_n = data.get("top_n")
+        if top_n is not None and (not isinstance(top_n, int) or not 0 < top_n <= MAX_TOP_N):
+            raise ValueError(f"top_n must be between 1 and {MAX_TOP_N}")
+        protocol = data.get("protocol")
+
+        return cls(
+            min_liquidity=float(data["min_liquidity"]) if data.get("min_liquidity") is not None else None,
+            min_volume=float(data["min_volume"]) if data.get("min_volume") is not None else None,
+            protocol=str(protocol).lower() if protocol else None,
+            top_n=top_n,
+            sort_by=sort_by
+        )
+
+    def select(self, snapshot: TokenSnapshot) -> Set[str]:
+        """Addresses matching the filter, walking the pre-sorted ordering"""
+        selected: Set[str] = set()
+        for token in snapshot.orderings.get(self.sort_by, ()):
+            if self.min_liquidity is not None and token.liquidity_sol < self.min_liquidity:
+                continue
+            if self.min_volume is not None and token.volume_sol < self.min_volume:
+                continue
+            if self.protocol is not None and token.protocol.lower() != self.protocol:
+                continue
+            selected.add(token.token_address)
+            if self.top_n is not None and len(selected) >= self.top_n:
+                break
+        return selected
+
+class TokenSubscriptions:
+    """Which subscriber cares about which token.
+
+    Subscribers watch explicit addresses and/or one filter. Both resolve to
+    entries in an inverted index (address -> subscribers), so routing an
+    update costs O(interested subscribers), not O(connections). Identical
+    filters are grouped and evaluated once per refresh.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Hashable]] = {}
+        self.watched: Dict[Hashable, Set[str]] = {}
+        self.filters: Dict[Hashable, TokenFilter] = {}
+        self.groups: Dict[TokenFilter, Set[Hashable]] = {}
+        self.members: Dict[TokenFilter, Set[str]] = {}
+        self.seq: Dict[Hashable, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.watched or self.filters)
+
+    def __contains__(self, subscriber: Hashable) -> bool:
+        return subscriber in self.watched or subscriber in self.filters
+
+    def interest(self, subscriber: Hashable) -> Set[str]:
+        addresses = set(self.watched.get(subscriber, ()))
+        token_filter = self.filters.get(subscriber)
+        if token_filter is not None:
+            addresses |= self.members.get(token_filter, set())
+        return addresses
+
+    def _link(self, subscriber: Hashable, addresses: Iterable[str]):
+        for address in addresses:
+            self.subscribers.setdefault(address, set()).add(subscriber)
+
+    def _unlink(self, subscriber: Hashable, addresses: Iterable[str]):
+        watched = self.watched.get(subscriber, set())
+        token_filter = self.filters.get(subscriber)
+        members = self.members.get(token_filter, set()) if token_filter is not None else set()
+        for address in addresses:
+            # Still interested through the other kind of subscription
+            if address in watched or address in members:
+                continue
+            entries = self.subscribers.get(address)
+            if entries is not None:
+                entries.discard(subscriber)
+                if not entries:
+                    del self.subscribers[address]
+
+    def watch(self, subscriber: Hashable, addresses: Iterable[str]) -> Set[str]:
+        """Add explicit addresses; returns the ones that weren't watched yet"""
+        watched = self.watched.setdefault(subscriber, set())
+        new = set(addresses) - watched
+        watched |= new
+        self._link(subscriber, new)
+        return new
+
+    def unwatch(self, subscriber: Hashable, addresses: Optional[Iterable[str]] = None):
+        watched = self.watched.get(subscriber)
+        if not watched:
+            return
+        dropped = set(watched) if addresses is None else watched & set(addresses)
+        watched -= dropped
+        if not watched:
+            del self.watched[subscriber]
+        self._unlink(subscriber, dropped)
+
+    def set_filter(self, subscriber: Hashable, token_filter: TokenFilter, snapshot: TokenSnapshot) -> Set[str]:
+        """Replace the subscriber's filter; returns the addresses it currently matches"""
+        self.clear_filter(subscriber)
+        self.filters[subscriber] = token_filter
+        group = self.groups.setdefault(token_filter, set())
+        if not group:
+            self.members[token_filter] = token_filter.select(snapshot)
+        group.add(subscriber)
+        self._link(subscriber, self.members[token_filter])
+        return set(self.members[token_filter])
+
+    def clear_filter(self, subscriber: Hashable):
+        token_filter = self.filters.get(subscriber)
+        if token_filter is None:
+            return
+        members = self.members[token_filter]
+        group = self.groups[token_filter]
+        group.discard(subscriber)
+        del self.filters[subscriber]
+        self._unlink(subscriber, members)
+        if not group:
+            del self.groups[token_filter]
+            del self.members[token_filter]
+
+    def remove(self, subscriber: Hashable):
+        self.unwatch(subscriber)
+        self.clear_filter(subscriber)
+        self.seq.pop(subscriber, None)
+
+    def next_seq(self, subscriber: Hashable) -> int:
+        self.seq[subscriber] = self.seq.get(subscriber, 0) + 1
+        return self.seq[subscriber]
+
+    def refresh_filters(self, snapshot: TokenSnapshot) -> Dict[Hashable, Tuple[Set[str], Set[str]]]:
+        """Re-evaluate each distinct filter; returns (entered, left) per affected subscriber"""
+        moves: Dict[Hashable, Tuple[Set[str], Set[str]]] = {}
+        for token_filter, group in self.groups.items():
+            old = self.members[token_filter]
+            new = token_filter.select(snapshot)
+            if new == old:
+                continue
+            entered, left = new - old, old - new
+            self.members[token_filter] = new
+            for subscriber in group:
+                self._link(subscriber, entered)
+                self._unlink(subscriber, left)
+                moves[subscriber] = (entered, left)
+        return moves
+
+    def route(self, diff: SnapshotDiff, snapshot: TokenSnapshot) -> Dict[Hashable, Dict[str, List[str]]]:
+        """Addresses each subscriber should hear about, by delta section.
+
+        Filter membership is refreshed first, so tokens entering a filter are
+        reported as added and tokens leaving it as removed.
+        """
+        routes: Dict[Hashable, Dict[str, List[str]]] = {}
+
+        def section(subscriber: Hashable, name: str) -> List[str]:
+            entry = routes.get(subscriber)
+            if entry is None:
+                entry = routes[subscriber] = {"added": [], "removed": [], "changed": []}
+            return entry[name]
+
+        # Removed tokens are still indexed until the filters are refreshed
+        for address in diff.removed:
+            for subscriber in self.subscribers.get(address, ()):
+                section(subscriber, "removed").append(address)
+
+        moves = self.refresh_filters(snapshot)
+        entering = {}
+        for subscriber, (entered, left) in moves.items():
+            # Explicitly watched tokens were already known to the subscriber
+            watched = self.watched.get(subscriber, set())
+            entering[subscriber] = entered - watched
+            for address in entering[subscriber]:
+                section(subscriber, "added").append(address)
+            for address in left - watched:
+                if address in snapshot.tokens:
+                    section(subscriber, "removed").append(address)
+
+        for token in diff.added:
+            for subscriber in self.subscribers.get(token.token_address, ()):
+                if token.token_address not in entering.get(subscriber, ()):
+                    section(subscriber, "added").append(token.token_address)
+
+        for address in diff.changed:
+            for subscriber in self.subscribers.get(address, ()):
+                if address not in entering.get(subscriber, ()):
+                    section(subscriber, "changed").append(address)
+
+        return routes
@@ -0,0 +1,233 @@
+# app/services/token_store.py
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import base64
+import json
+import time
+from app.models.token import TokenData
+from app.services.token_windows import WindowStats
+
+SORT_FIELDS = ("volume_sol", "market_cap_sol", "price_1hr_change")
+
+IndexKey = Tuple[float, str]
+
+# Fields compared to decide whether a token actually changed between cycles
+TRACKED_FIELDS = tuple(name for name in TokenData.model_fields if name != "last_updated")
+
+def windowed_ordering(sort_by: str, window: str) -> str:
+    """Name of the ordering that sorts by a window's value rather than upstream's"""
+    return f"{sort_by}@{window}"
+
+@dataclass(frozen=True)
+class TokenSnapshot:
+    """Immutable, versioned view of the token universe, pre-sorted for every sort option"""
+    version: int
+    tokens: Mapping[str, TokenData]
+    orderings: Mapping[str, Tuple[TokenData, ...]]
+    keys: Mapping[str, Tuple[IndexKey, ...]]
+    windows: Mapping[str, Mapping[str, WindowStats]] = field(default_factory=lambda: MappingProxyType({}))
+    created_at: float = field(default_factory=time.time)
+    fetched_at: Optional[float] = None  # when the listed data came from upstream; defaults to created_at
+    _key_maps: Dict[str, Dict[str, IndexKey]] = field(default_factory=dict, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the data was fetched, which republishing doesn't reset"""
+        fetched_at = self.created_at if self.fetched_at is None else self.fetched_at
+        return max(0.0, time.time() - fetched_at)
+
+    def key_map(self, ordering: str) -> Dict[str, IndexKey]:
+        """Address -> key in `ordering`, built on first use and kept for this snapshot"""
+        keys = self._key_maps.get(ordering)
+        if keys is None:
+            keys = self._key_maps[ordering] = {key[1]: key for key in self.keys[ordering]}
+        return keys
+
+    def seek(self, sort_by: str, after: Optional[IndexKey]) -> int:
+        """Position of the first token that sorts strictly after `after` (O(log n))"""
+        if after is None:
+            return 0
+        return bisect_right(self.keys[sort_by], after)
+
+    @classmethod
+    def empty(cls, sort_fields: Iterable[str] = SORT_FIELDS) -> "TokenSnapshot":
+        return cls(
+            version=0,
+            tokens=MappingProxyType({}),
+            orderings=MappingProxyType({f: () for f in sort_fields}),
+            keys=MappingProxyType({f: () for f in sort_fields})
+        )
+
+@dataclass(frozen=True)
+class SnapshotDiff:
+    """What changed between two snapshots: new tokens, dropped addresses and changed fields"""
+    added: List[TokenData]
+    removed: List[str]
+    changed: Dict[str, Dict[str, Any]]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+def diff_snapshots(old: Mapping[str, TokenData], new: Mapping[str, TokenData]) -> SnapshotDiff:
+    added = []
+    changed = {}
+    for address, token in new.items():
+        previous = old.get(address)
+        if previous is None:
+            added.append(token)
+            continue
+        if previous is token:
+            continue
+        fields = {
+            name: getattr(token, name)
+            for name in TRACKED_FIELDS
+            if getattr(previous, name) != getattr(token, name)
+        }
+        if fields:
+            fields["last_updated"] = token.last_updated
+            changed[address] = fields
+    removed = [address for address in old if address not in new]
+    return SnapshotDiff(added, removed, changed)
+
+def encode_cursor(sort_by: str, key: tuple, version: int) -> str:
+    """Opaque keyset cursor pointing just past `key` in `sort_by` order.
+
+    Keys are (-value, address), optionally preceded by a search match tier.
+    """
+    raw = json.dumps([sort_by, *key, version], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, tuple, int]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_by, *key, address, version = json.loads(base64.urlsafe_b64decode(padded))
+        if len(key) not in (1, 2):
+            raise ValueError("unexpected key length")
+        return str(sort_by), tuple(float(v) for v in key) + (str(address),), int(version)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class TokenStore:
+    """Tokens keyed by address with sort indexes kept up to date on every write.
+
+    Each index is a sorted list of (-value, token_address) so that ascending
+    order is "highest value first" with the address as a stable tie-breaker.
+    """
+
+    def __init__(self, sort_fields: Iterable[str] = SORT_FIELDS):
+        self.tokens: Dict[str, TokenData] = {}
+        self.indexes: Dict[str, List[IndexKey]] = {field: [] for field in sort_fields}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __contains__(self, token_address: str) -> bool:
+        return token_address in self.tokens
+
+    @staticmethod
+    def index_key(token: TokenData, field: str) -> IndexKey:
+        return (-float(getattr(token, field)), token.token_address)
+
+    def get(self, token_address: str) -> Optional[TokenData]:
+        return self.tokens.get(token_address)
+
+    def upsert(self, token: TokenData) -> bool:
+        """Insert or replace a token. Returns True if any tracked field changed."""
+        existing = self.tokens.get(token.token_address)
+        self.tokens[token.token_address] = token
+
+        if existing is None:
+            for field, index in self.indexes.items():
+                insort(index, self.index_key(token, field))
+            return True
+
+        for field, index in self.indexes.items():
+            old_key = self.index_key(existing, field)
+            new_key = self.index_key(token, field)
+            if old_key != new_key:
+                del index[bisect_left(index, old_key)]
+                insort(index, new_key)
+
+        return any(getattr(existing, name) != getattr(token, name) for name in TRACKED_FIELDS)
+
+    def remove(self, token_address: str) -> Optional[TokenData]:
+        token = self.tokens.pop(token_address, None)
+        if token is not None:
+            for field, index in self.indexes.items():
+                del index[bisect_left(index, self.index_key(token, field))]
+        return token
+
+    def replace(self, tokens: Iterable[TokenData]) -> Tuple[List[TokenData], List[str]]:
+        """Make the store hold exactly `tokens`, touching only what changed.
+
+        Returns the changed or added tokens and the addresses that were removed.
+        """
+        if not self.tokens:
+            return self._bulk_load(tokens), []
+
+        changed = []
+        seen = set()
+        for token in tokens:
+            seen.add(token.token_address)
+            if self.upsert(token):
+                changed.append(token)
+
+        removed = [address for address in self.tokens if address not in seen]
+        for address in removed:
+            self.remove(address)
+
+        return changed, removed
+
+    def _bulk_load(self, tokens: Iterable[TokenData]) -> List[TokenData]:
+        # Sorting once is much cheaper than insort-ing into an empty index
+        for token in tokens:
+            self.tokens[token.token_address] = token
+        for field in self.indexes:
+            self.indexes[field] = sorted(self.index_key(t, field) for t in self.tokens.values())
+        return list(self.tokens.values())
+
+    def range(self, sort_by: str, start: int, limit: int) -> List[TokenData]:
+        """Read one page of tokens in `sort_by` order without sorting"""
+        return [self.tokens[address] for _, address in self.indexes[sort_by][start:start + limit]]
+
+    def snapshot(
+        self,
+        version: int,
+        windows: Optional[Mapping[str, Mapping[str, WindowStats]]] = None,
+        fetched_at: Optional[float] = None
+    ) -> TokenSnapshot:
+        """Freeze the current contents into a snapshot readers can use without locking.
+
+        Window stats, if given, are frozen alongside and get their own volume ordering.
+        """
+        orderings = {
+            field: tuple(self.tokens[address] for _, address in index)
+            for field, index in self.indexes.items()
+        }
+        keys = {field: tuple(index) for field, index in self.indexes.items()}
+
+        for window, stats in (windows or {}).items():
+            index = sorted(
+                (-stats[address].volume_sol if address in stats else -token.volume_sol, address)
+                for address, token in self.tokens.items()
+            )
+            name = windowed_ordering("volume_sol", window)
+            orderings[name] = tuple(self.tokens[address] for _, address in index)
+            keys[name] = tuple(index)
+
+        return TokenSnapshot(
+            version=version,
+            tokens=MappingProxyType(dict(self.tokens)),
+            orderings=MappingProxyType(orderings),
+            keys=MappingProxyType(keys),
+            windows=MappingProxyType({
+                window: MappingProxyType(dict(stats)) for window, stats in (windows or {}).items()
+            }),
+            fetched_at=fetched_at
+        )
@@ -0,0 +1,164 @@
+# app/services/token_windows.py
+import time
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from app.models.token import TokenData
+
+# time_filter -> (span, bucket width) in seconds. Buckets are coarser for longer
+# spans so every ring stays under ~100 slots per token.
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1h": (3600, 60),
+    "24h": (86400, 900),
+    "7d": (604800, 7200)
+}
+
+# Span of the rolling volume and txn counters reported upstream
+UPSTREAM_SPAN = 86400
+
+class WindowStats(NamedTuple):
+    volume_sol: float
+    transaction_count: int
+    price_change: float
+
+class RollingWindow:
+    """Ring of time buckets with running totals, so reads are O(1).
+
+    Each bucket holds the volume and txns observed during it and the price at
+    its start; the running totals always cover exactly the buckets in the ring.
+    """
+    __slots__ = ("bucket_seconds", "size", "volume", "txns", "prices",
+                 "head", "head_bucket", "filled", "total_volume", "total_txns", "last_price")
+
+    def __init__(self, span: int, bucket_seconds: int):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, span // bucket_seconds)
+        self.volume = [0.0] * self.size
+        self.txns = [0.0] * self.size
+        self.prices = [0.0] * self.size
+        self.head = 0
+        self.head_bucket: Optional[int] = None
+        self.filled = 0
+        self.total_volume = 0.0
+        self.total_txns = 0.0
+        self.last_price = 0.0
+
+    def _advance(self, now: float):
+        bucket = int(now // self.bucket_seconds)
+        if self.head_bucket is None:
+            self.head_bucket = bucket
+            self.filled = 1
+            return
+        # Ticks are shorter than a bucket, so this loop is O(1) amortized
+        for _ in range(min(bucket - self.head_bucket, self.size)):
+            self.head = (self.head + 1) % self.size
+            self.total_volume -= self.volume[self.head]
+            self.total_txns -= self.txns[self.head]
+            self.volume[self.head] = 0.0
+            self.txns[self.head] = 0.0
+            self.prices[self.head] = self.last_price
+            self.filled = min(self.filled + 1, self.size)
+        self.head_bucket = max(self.head_bucket, bucket)
+
+    def add(self, now: float, volume: float, txns: float, price: float):
+        fresh = self.head_bucket is None
+        self._advance(now)
+        if fresh:
+            self.prices[self.head] = price
+        self.volume[self.head] += volume
+        self.txns[self.head] += txns
+        self.total_volume += volume
+        self.total_txns += txns
+        self.last_price = price
+
+    @property
+    def opening_price(self) -> float:
+        """Price at the start of the oldest bucket still in the ring"""
+        return self.prices[(self.head - self.filled + 1) % self.size]
+
+    def stats(self) -> WindowStats:
+        opening = self.opening_price
+        change = (self.last_price - opening) / opening * 100 if opening else 0.0
+        return WindowStats(max(0.0, self.total_volume), max(0, round(self.total_txns)), change)
+
+class TokenWindows:
+    """Per-token rolling windows fed once per scheduler tick.
+
+    Upstream only reports 24h rolling counters, so activity between two ticks
+    is estimated as the counter's growth plus the share of the previous value
+    that aged out meanwhile (assuming activity was spread evenly).
+    """
+
+    def __init__(self, windows: Mapping[str, Tuple[int, int]] = WINDOWS):
+        self.windows = dict(windows)
+        self._rings: Dict[str, Dict[str, RollingWindow]] = {}
+        self._last: Dict[str, Tuple[float, float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def __contains__(self, token_address: str) -> bool:
+        return token_address in self._rings
+
+    def observe(self, tokens: Iterable[TokenData], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for token in tokens:
+            address = token.token_address
+            rings = self._rings.get(address)
+            previous = self._last.get(address)
+            self._last[address] = (now, token.volume_sol, token.transaction_count)
+
+            if rings is None:
+                rings = self._rings[address] = {
+                    name: RollingWindow(span, width) for name, (span, width) in self.windows.items()
+                }
+                # Seed each window with its share of the 24h counters
+                for name, ring in rings.items():
+                    share = min(self.windows[name][0], UPSTREAM_SPAN) / UPSTREAM_SPAN
+                    ring.add(now, token.volume_sol * share, token.transaction_count * share, token.price_sol)
+                continue
+
+            seen_at, last_volume, last_txns = previous
+            aged_out = min(max(now - seen_at, 0.0), UPSTREAM_SPAN) / UPSTREAM_SPAN
+            volume = max(0.0, token.volume_sol - last_volume * (1 - aged_out))
+            txns = max(0.0, token.transaction_count - last_txns * (1 - aged_out))
+            for ring in rings.values():
+                ring.add(now, volume, txns, token.price_sol)
+
+    def forget(self, token_addresses: Iterable[str]):
+        for address in token_addresses:
+            self._rings.pop(address, None)
+            self._last.pop(address, None)
+
+    def stats(self, token_address: str, window: str) -> Optional[WindowStats]:
+        rings = self._rings.get(token_address)
+        return rings[window].stats() if rings else None
+
+    def snapshot(self, tokens: Mapping[str, TokenData]) -> Dict[str, Dict[str, WindowStats]]:
+        """Stats for every window and tracked token in `tokens`.
+
+        The 24h volume and txn counters come straight from upstream; only the
+        price change is computed locally for that window.
+        """
+        result: Dict[str, Dict[str, WindowStats]] = {name: {} for name in self.windows}
+        for address, token in tokens.items():
+            rings = self._rings.get(address)
+            if rings is None:
+                continue
+            for name, ring in rings.items():
+                stats = ring.stats()
+                if self.windows[name][0] == UPSTREAM_SPAN:
+                    stats = stats._replace(volume_sol=token.volume_sol, transaction_count=token.transaction_count)
+                result[name][address] = stats
+        return result
+
+def project(token: TokenData, stats: Optional[WindowStats]) -> TokenData:
+    """Copy of `token` with volume, txns and price change for one window"""
+    if stats is None:
+        return token
+    return token.model_copy(update={
+        "volume_sol": stats.volume_sol,
+        "transaction_count": stats.transaction_count,
+        "price_change": stats.price_change
+    })
+
+def project_all(tokens: Iterable[TokenData], window_stats: Mapping[str, WindowStats]) -> List[TokenData]:
+    return [project(token, window_stats.get(token.token_address)) for token in tokens]
@@ -1,61 +1,278 @@
 # app/services/websocket.py
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict, Set
+from typing import Any, List, Dict, Set, Deque, Tuple, Optional, Callable
+from collections import deque
+from datetime import datetime
 import json
 import asyncio
+from app.config import settings
 from app.models.token import WebSocketMessage
+from app.services.subscriptions import TokenFilter, TokenSubscriptions
+from app.services.broadcast import BroadcastBus
+from app.services.token_store import SnapshotDiff, TokenSnapshot
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Topics whose messages are sequenced deltas; replacing a queued one would leave a gap
+SEQUENCED_TOPICS = {"tokens"}
+
+class ConnectionWriter:
+    """Bounded outbound queue for one socket, drained by its own writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_error: Callable[[WebSocket], None],
+        max_size: int = 64,
+        policy: str = "drop_oldest"
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.websocket = websocket
+        self.on_error = on_error
+        self.max_size = max_size
+        self.policy = policy
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self.task = asyncio.create_task(self._drain())
+
+    def enqueue(self, payload: str, key: Optional[str] = None) -> bool:
+        """Queue a pre-serialized payload. Returns False when the consumer should be dropped."""
+        if self.closed:
+            return False
+
+        # A newer message for the same key supersedes the one still waiting
+        if self.policy == "coalesce" and key is not None:
+            for i, (queued_key, _) in enumerate(self.queue):
+                if queued_key == key:
+                    self.queue[i] = (key, payload)
+                    self.dropped += 1
+                    return True
+
+        if len(self.queue) >= self.max_size:
+            if self.policy == "disconnect":
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+
+        self.queue.append((key, payload))
+        self._ready.set()
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, payload = self.queue.popleft()
+                await self.websocket.send_text(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; let the manager clean up its state
+            self.on_error(self.websocket)
+
+    def stop(self):
+        self.closed = True
+        self.queue.clear()
+        if not self.task.done():
+            self.task.cancel()
 
 class WebSocketManager:
-    def __init__(self):
+    def __init__(
+        self,
+        max_queue_size: Optional[int] = None,
+        slow_consumer_policy: Optional[str] = None
+    ):
         self.active_connections: List[WebSocket] = []
         self.subscriptions: Dict[str, Set[WebSocket]] = {}
-    
+        self.writers: Dict[WebSocket, ConnectionWriter] = {}
+        self.token_subscriptions = TokenSubscriptions()
+        self.bus: Optional[BroadcastBus] = None
+        # Sees every payload relayed over the bus before this worker's sockets do
+        self.relay_hook: Optional[Callable[[str, str], None]] = None
+        self.max_queue_size = max_queue_size or settings.WEBSOCKET_SEND_QUEUE_SIZE
+        self.slow_consumer_policy = slow_consumer_policy or settings.WEBSOCKET_SLOW_CONSUMER_POLICY
+        self.stats = {"messages_dropped": 0, "slow_consumers_disconnected": 0}
+
+    async def start_bus(self, redis):
+        """Route topic broadcasts through Redis so sockets on every worker receive them"""
+        self.bus = BroadcastBus(self.relay)
+        await self.bus.start(redis)
+
+    async def stop_bus(self):
+        if self.bus:
+            await self.bus.stop()
+            self.bus = None
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
-    
+        self._get_writer(websocket)
+
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-        
+
+        writer = self.writers.pop(websocket, None)
+        if writer:
+            self.stats["messages_dropped"] += writer.dropped
+            writer.stop()
+
         # Remove from all subscriptions
         for topic in self.subscriptions:
             self.subscriptions[topic].discard(websocket)
-    
+        self.token_subscriptions.remove(websocket)
+
     def subscribe(self, websocket: WebSocket, topic: str):
         if topic not in self.subscriptions:
             self.subscriptions[topic] = set()
         self.subscriptions[topic].add(websocket)
-    
+
     def unsubscribe(self, websocket: WebSocket, topic: str):
         if topic in self.subscriptions and websocket in self.subscriptions[topic]:
             self.subscriptions[topic].discard(websocket)
-    
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self.subscriptions.get(topic))
+
+    def subscribe_tokens(self, websocket: WebSocket, addresses: List[str]):
+        self.token_subscriptions.watch(websocket, addresses)
+
+    def subscribe_filter(self, websocket: WebSocket, token_filter: TokenFilter, snapshot: TokenSnapshot):
+        self.token_subscriptions.set_filter(websocket, token_filter, snapshot)
+
+    def unsubscribe_tokens(self, websocket: WebSocket, addresses: Optional[List[str]] = None):
+        """Drop watched addresses (all of them if none are given) and any filter"""
+        self.token_subscriptions.unwatch(websocket, addresses)
+        if addresses is None:
+            self.token_subscriptions.clear_filter(websocket)
+
+    def subscription_snapshot_message(self, websocket: WebSocket, snapshot: TokenSnapshot) -> dict:
+        """Current state of every token the socket is subscribed to"""
+        interest = self.token_subscriptions.interest(websocket)
+        return WebSocketMessage(
+            type="subscription_snapshot",
+            data={
+                "seq": self.token_subscriptions.seq.get(websocket, 0),
+                "tokens": [snapshot.tokens[a].dict() for a in interest if a in snapshot.tokens]
+            }
+        ).dict()
+
+    async def broadcast_token_delta(self, diff: SnapshotDiff, snapshot: TokenSnapshot):
+        """Send each per-token or filtered subscriber just the part of `diff` it asked for.
+
+        Every token's fragment is serialized once and spliced into the
+        per-socket payloads; each socket gets its own sequence numbers.
+        """
+        routes = self.token_subscriptions.route(diff, snapshot)
+        if not routes:
+            return
+
+        added: Dict[str, str] = {}
+        changed: Dict[str, str] = {}
+        timestamp = json.dumps(datetime.utcnow(), default=str)
+        for websocket, sections in routes.items():
+            for address in sections["added"]:
+                if address not in added:
+                    added[address] = json.dumps(snapshot.tokens[address].dict(), default=str)
+            for address in sections["changed"]:
+                if address not in changed:
+                    changed[address] = f"{json.dumps(address)}:{json.dumps(diff.changed[address], default=str)}"
+
+            payload = (
+                f'{{"type":"subscription_delta","data":{{'
+                f'"seq":{self.token_subscriptions.next_seq(websocket)},'
+                f'"added":[{",".join(added[a] for a in sections["added"])}],'
+                f'"removed":{json.dumps(sections["removed"])},'
+                f'"changed":{{{",".join(changed[a] for a in sections["changed"])}}}'
+                f'}},"timestamp":{timestamp}}}'
+            )
+            self._enqueue(websocket, payload)
+
+        await asyncio.sleep(0)
+
+    def _get_writer(self, websocket: WebSocket) -> ConnectionWriter:
+        writer = self.writers.get(websocket)
+        if writer is None:
+            writer = ConnectionWriter(
+                websocket,
+                on_error=self.disconnect,
+                max_size=self.max_queue_size,
+                policy=self.slow_consumer_policy
+            )
+            self.writers[websocket] = writer
+        return writer
+
+    def _enqueue(self, websocket: WebSocket, payload: str, key: Optional[str] = None):
+        if not self._get_writer(websocket).enqueue(payload, key):
+            self._drop_slow_consumer(websocket)
+
+    def _drop_slow_consumer(self, websocket: WebSocket):
+        self.stats["slow_consumers_disconnected"] += 1
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket))
+
+    async def _close_quietly(self, websocket: WebSocket):
+        try:
+            # 1008 = policy violation; don't let a stuck socket hold the task forever
+            await asyncio.wait_for(websocket.close(code=1008), timeout=5)
+        except Exception:
+            pass
+
+    async def send_personal(self, websocket: WebSocket, message: dict):
+        """Queue a message for a single socket, preserving order with broadcasts"""
+        self._enqueue(websocket, json.dumps(message, default=str))
+        await asyncio.sleep(0)
+
     async def broadcast_to_topic(self, topic: str, message: dict):
-        if topic not in self.subscriptions:
+        # Other workers may have subscribers we can't see
+        if topic not in self.subscriptions and self.bus is None:
             return
-        
-        disconnected = []
-        for websocket in self.subscriptions[topic]:
-            try:
-                # Make sure we're using await here
-                await websocket.send_text(json.dumps(message))
-            except Exception:
-                disconnected.append(websocket)
-        
-        # Clean up disconnected websockets
-        for ws in disconnected:
-            self.disconnect(ws)
-    
+
+        # Serialize once; every subscriber on every worker gets the same payload
+        payload = json.dumps(message, default=str)
+        if self.bus is None or not await self.bus.publish(topic, payload):
+            self.deliver_to_topic(topic, payload)
+
+        # Give the writer tasks a chance to start sending before we return
+        await asyncio.sleep(0)
+
     async def broadcast_all(self, message: dict):
-        disconnected = []
-        for websocket in self.active_connections:
+        await self.broadcast_to_topic("*", message)
+
+    def relay(self, topic: str, payload: str):
+        """Deliver a payload received over the bus, after the relay hook has seen it"""
+        if self.relay_hook is not None:
             try:
-                await websocket.send_text(json.dumps(message))
-            except Exception:
-                disconnected.append(websocket)
-        
-        for ws in disconnected:
-            self.disconnect(ws)
+                self.relay_hook(topic, payload)
+            except Exception as e:
+                print(f"Error in broadcast relay hook: {e}")
+        self.deliver_to_topic(topic, payload)
+
+    def deliver_to_topic(self, topic: str, payload: str):
+        """Queue an already serialized payload for this worker's subscribers of `topic`"""
+        sockets = self.active_connections if topic == "*" else self.subscriptions.get(topic, ())
+        key = None if topic in SEQUENCED_TOPICS else topic
+        for websocket in list(sockets):
+            self._enqueue(websocket, payload, key=key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        queued = sum(len(w.queue) for w in self.writers.values())
+        dropped = self.stats["messages_dropped"] + sum(w.dropped for w in self.writers.values())
+        return {
+            "connections": len(self.active_connections),
+            "token_subscribers": len(self.token_subscriptions.watched.keys() | self.token_subscriptions.filters.keys()),
+            "watched_tokens": len(self.token_subscriptions.subscribers),
+            "distinct_filters": len(self.token_subscriptions.groups),
+            "queued_messages": queued,
+            "messages_dropped": dropped,
+            "slow_consumers_disconnected": self.stats["slow_consumers_disconnected"],
+            "bus": self.bus.get_stats() if self.bus else None
+        }
 
 websocket_manager = WebSocketManager()
@@ -0,0 +1,135 @@
+# app/utils/json_stream.py
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Iterable, List, Optional
+
+# Structural characters while looking for the array; everything else is skipped in bulk
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_END = re.compile(r'["\\]')
+_SEPARATOR = re.compile(r'[\s,]*')
+
+_decode_item = json.JSONDecoder().raw_decode
+
+class ArrayItemScanner:
+    """Incrementally decodes the items of one top-level array in a JSON byte stream.
+
+    Feed it chunks as they arrive; it returns every item of the array under
+    `key` that is complete so far. Items are decoded one at a time by the C
+    decoder, and text before the array or of items already returned is
+    dropped, so memory is bounded by the largest item rather than the body.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = 0
+        self.last_string: Optional[str] = None
+        self.in_array = False
+        self.done = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[Any]:
+        if self.done:
+            return []
+        self.text += self._utf8.decode(chunk, final)
+        items: List[Any] = []
+        if not self.in_array:
+            self._find_array()
+        if self.in_array:
+            self._read_items(items, final)
+        self._compact()
+        return items
+
+    def _find_array(self):
+        text = self.text
+        while not self.done:
+            if self.in_string:
+                match = _STRING_END.search(text, self.pos)
+                if match is None:
+                    self.pos = len(text)
+                    return
+                index = match.start()
+                if text[index] == "\\":  # skip the escaped character
+                    if index + 1 >= len(text):
+                        self.pos = index
+                        return
+                    self.pos = index + 2
+                    continue
+                self.in_string = False
+                self.pos = index + 1
+                if self.depth == 1:
+                    self.last_string = text[self.string_start:index]
+                continue
+
+            match = _STRUCTURE.search(text, self.pos)
+            if match is None:
+                self.pos = len(text)
+                return
+            char = match.group()
+            self.pos = match.end()
+            if char == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif char == "[" and self.depth == 1 and self.last_string == self.key:
+                self.in_array = True
+                return
+            elif char in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                # Closed the top-level object without finding the array
+                self.done = self.depth <= 0
+
+    def _read_items(self, items: List[Any], final: bool):
+        text = self.text
+        while True:
+            pos = _SEPARATOR.match(text, self.pos).end()
+            self.pos = pos
+            if pos >= len(text):
+                return
+            if text[pos] == "]":
+                self.done = True
+                return
+            try:
+                item, end = _decode_item(text, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                return  # incomplete; wait for more of the item
+            if end >= len(text) and not isinstance(item, (dict, list)) and not final:
+                return  # a trailing scalar may still be cut short
+            items.append(item)
+            self.pos = end
+
+    def _compact(self):
+        keep = self.pos
+        if self.in_string:
+            keep = min(keep, self.string_start)
+        if keep:
+            self.text = self.text[keep:]
+            self.pos -= keep
+            self.string_start -= keep
+
+def iter_array_items(chunks: Iterable[bytes], key: str):
+    """Items of the array under `key`, from an iterable of byte chunks"""
+    scanner = ArrayItemScanner(key)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+        if scanner.done:
+            return
+    yield from scanner.feed(b"", final=True)
+
+async def aiter_array_items(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator[Any]:
+    """Async variant of iter_array_items for httpx byte streams"""
+    scanner = ArrayItemScanner(key)
+    async for chunk in chunks:
+        for item in scanner.feed(chunk):
+            yield item
+        if scanner.done:
+            return
+    for item in scanner.feed(b"", final=True):
+        yield item
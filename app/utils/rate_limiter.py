@@ -0,0 +1,177 @@
+# app/utils/rate_limiter.py
+import asyncio
+import heapq
+import itertools
+import time
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+from app.core.cache import cache_manager
+
+# Lower value is served first
+PRIORITY_REFRESH = 0
+PRIORITY_DETAIL = 1
+
+# Shared bucket: returns 0 when a token was taken, otherwise ms to wait.
+# Uses the Redis clock so workers with skewed clocks still agree.
+TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then return blocked end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return wait
+"""
+
+# Shared bucket: put back one token that was taken but not used
+RELEASE_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + 1)))
+end
+return 0
+"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Async token bucket for one upstream API.
+
+    Callers queue in priority order (FIFO within a priority) and are released
+    one at a time as tokens refill. With `shared=True` the budget lives in Redis
+    so every worker draws from the same quota.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        per: float = 60.0,
+        burst: Optional[int] = None,
+        shared: bool = False
+    ):
+        self.name = name
+        self.fill_rate = rate / per  # tokens per second
+        self.capacity = burst or max(1, int(rate / per * 10))  # ten seconds' worth
+        self.shared = shared
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.stats = {"acquired": 0, "queued": 0, "throttled": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: int = PRIORITY_DETAIL):
+        """Wait until a request to the upstream is allowed"""
+        if not self._waiters and await self._reserve() == 0:
+            self.stats["acquired"] += 1
+            return
+
+        self.stats["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def penalize(self, retry_after: Optional[float]):
+        """Stop releasing requests until the upstream's Retry-After has passed"""
+        self.stats["throttled"] += 1
+        delay = retry_after if retry_after is not None else 1.0 / self.fill_rate
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        # Start refilling from empty once the block is over
+        self.tokens = 0.0
+        self.updated = self.blocked_until
+        if self.shared and cache_manager.redis:
+            asyncio.ensure_future(self._block_shared(delay))
+
+    async def _block_shared(self, delay: float):
+        try:
+            await cache_manager.redis.set(f"ratelimit:{self.name}:blocked", 1, px=max(1, int(delay * 1000)))
+        except Exception as e:
+            print(f"Error sharing rate limit block for {self.name}: {e}")
+
+    async def _dispatch(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Caller was cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = await self._reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            heapq.heappop(self._waiters)
+            if future.done():
+                # Cancelled while we were reserving; give the token back
+                await self._release()
+                continue
+            self.stats["acquired"] += 1
+            future.set_result(None)
+
+    async def _release(self):
+        """Return an unused token to the bucket it was taken from"""
+        if self.shared and cache_manager.redis:
+            try:
+                await cache_manager.redis.eval(RELEASE_SCRIPT, 1, f"ratelimit:{self.name}", self.capacity)
+                return
+            except Exception as e:
+                # The token came from the local fallback bucket, or is lost with Redis
+                print(f"Error returning shared rate limit token for {self.name}: {e}")
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    async def _reserve(self) -> float:
+        """Take one token if available; otherwise return seconds until one is"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        if self.shared and cache_manager.redis:
+            try:
+                wait_ms = await cache_manager.redis.eval(
+                    TOKEN_BUCKET_SCRIPT, 2,
+                    f"ratelimit:{self.name}", f"ratelimit:{self.name}:blocked",
+                    self.fill_rate / 1000, self.capacity
+                )
+                return int(wait_ms) / 1000
+            except Exception as e:
+                # Fall back to the local bucket if Redis is unavailable
+                print(f"Error using shared rate limit for {self.name}: {e}")
+
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.fill_rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.fill_rate
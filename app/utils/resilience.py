@@ -0,0 +1,245 @@
+# app/utils/resilience.py
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import httpx
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+def _status(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code
+    return None
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether another attempt could succeed: not for client errors or an open circuit"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = _status(exc)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return True
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy, as opposed to us asking badly or too often"""
+    status = _status(exc)
+    if status is not None:
+        return status >= 500
+    return not isinstance(exc, CircuitOpenError)
+
+def full_jitter(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Uniform in [0, min(max_delay, base_delay * 2**attempt)], so retries don't synchronize"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """Fails fast after consecutive upstream failures, then lets a probe through.
+
+    closed -> open after `failure_threshold` failures in a row; open ->
+    half-open once `recovery_time` has passed, admitting `half_open_max`
+    probes; a successful probe closes the circuit, a failed one reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0, half_open_max: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_max = half_open_max
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_time:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = HALF_OPEN
+            self.probes = 0
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_max:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self.probes += 1
+
+    def release_probe(self):
+        """A probe ended without an outcome (e.g. cancelled); let another one through"""
+        if self.state == HALF_OPEN and self.probes:
+            self.probes -= 1
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            print(f"{self.name} circuit closed")
+        self.state = CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"{self.name} circuit opened after {self.failures} failures")
+                self.stats["opened"] += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, state=self.state, consecutive_failures=self.failures)
+
+class RetryBudget:
+    """Caps retries at a fraction of recent requests, plus a small floor.
+
+    Each request deposits `ratio` tokens and each retry withdraws one, so an
+    outage can at most multiply upstream traffic by 1 + ratio instead of by
+    the number of attempts.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, capacity: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.stats = {"retries": 0, "exhausted": 0}
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + amount + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            self.stats["exhausted"] += 1
+            return False
+        self.tokens -= 1
+        self.stats["retries"] += 1
+        return True
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking the hedge delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class UpstreamGuard:
+    """Circuit breaker, retry budget, jittered retries and hedging for one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        retry_ratio: float = 0.2,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_quantile = hedge_quantile
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_time)
+        self.budget = RetryBudget(retry_ratio)
+        self.latency = LatencyTracker(min_samples=hedge_min_samples)
+        self.stats = {"hedged": 0, "hedge_wins": 0}
+
+    def record(self, error: Optional[BaseException], elapsed: Optional[float] = None):
+        """Feed an outcome to the breaker; 4xx and 429 say nothing about upstream health"""
+        if error is None:
+            self.breaker.record_success()
+            if elapsed is not None:
+                self.latency.record(elapsed)
+        elif is_upstream_failure(error):
+            self.breaker.record_failure()
+        elif self.breaker.state == HALF_OPEN:
+            # The probe got an answer, so the upstream is reachable
+            self.breaker.record_success()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """Run `fn` through the breaker, retrying retryable errors within the budget.
+
+        With hedge=True a second attempt starts if the first hasn't finished
+        after the recent p95 latency; whichever succeeds first wins.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            start = time.monotonic()
+            try:
+                result = await (self._hedged(fn) if hedge else fn())
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.record(e)
+                if attempt >= self.max_retries or not is_retryable(e) or not self.budget.withdraw():
+                    raise
+                await asyncio.sleep(full_jitter(attempt, self.base_delay, self.max_delay))
+                attempt += 1
+                continue
+            self.record(None, time.monotonic() - start)
+            return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.latency.quantile(self.hedge_quantile)
+        first = asyncio.ensure_future(fn())
+        pending = {first}
+        # Cancelling the caller, at any point, cancels whatever attempt is still running
+        try:
+            if delay is None or self.breaker.state != CLOSED:
+                return await first
+
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            self.stats["hedged"] += 1
+            second = asyncio.ensure_future(fn())
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        p95 = self.latency.quantile(self.hedge_quantile)
+        return dict(
+            self.stats,
+            circuit=self.breaker.get_stats(),
+            retry_budget=dict(self.budget.stats, tokens=round(self.budget.tokens, 2)),
+            p95_ms=round(p95 * 1000, 1) if p95 is not None else None
+        )
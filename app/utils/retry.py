@@ -2,8 +2,14 @@
 import asyncio
 import functools
 from typing import Callable, Any
+from app.utils.resilience import full_jitter, is_retryable
 
-def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
+def retry_with_backoff(
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    retryable: Callable[[BaseException], bool] = is_retryable
+):
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
@@ -14,12 +20,12 @@ def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0, max_delay:
                     return await func(*args, **kwargs)
                 except Exception as e:
                     last_exception = e
-                    if attempt == max_retries:
+                    # Client errors and open circuits won't go away by asking again
+                    if attempt == max_retries or not retryable(e):
                         break
                     
-                    # Exponential backoff with jitter
-                    delay = min(base_delay * (2 ** attempt), max_delay)
-                    await asyncio.sleep(delay)
+                    # Exponential backoff with full jitter
+                    await asyncio.sleep(full_jitter(attempt, base_delay, max_delay))
             
             raise last_exception
         return wrapper
@@ -27,4 +33,3 @@ def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0, max_delay:
 
 # Add this alias to fix the test import
 retry = retry_with_backoff
-
@@ -0,0 +1,65 @@
+# app/utils/swr.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from app.utils.singleflight import SingleFlight
+
+class StaleWhileRevalidate:
+    """Serves cached values past their soft TTL while one refresh runs in the background.
+
+    Younger than `soft_ttl`, a value is served as is. Between the TTLs it is
+    still served immediately, and a single background refresh per key is
+    started. Missing or older than `hard_ttl`, callers wait for the refresh,
+    and concurrent callers share one.
+    """
+
+    def __init__(self, name: str, soft_ttl: float, hard_ttl: float):
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+        self.flights = SingleFlight()
+        self._revalidating: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"fresh": 0, "stale": 0, "blocked": 0, "revalidations": 0, "revalidation_errors": 0}
+
+    async def get(
+        self,
+        key: Hashable,
+        cached: Optional[Tuple[Any, float]],
+        refresh: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, float]:
+        """(value, age in seconds) for `key`, given what is cached as (value, age) or None.
+
+        `refresh` loads, stores and returns a new value; its result is age 0.
+        """
+        if cached is not None:
+            value, age = cached
+            if age < self.soft_ttl:
+                self.stats["fresh"] += 1
+                return value, age
+            if age < self.hard_ttl:
+                self.stats["stale"] += 1
+                self.revalidate(key, refresh)
+                return value, age
+
+        self.stats["blocked"] += 1
+        return await self.flights.do(key, refresh), 0.0
+
+    def revalidate(self, key: Hashable, refresh: Callable[[], Awaitable[Any]]):
+        """Start a background refresh of `key` unless one is already running"""
+        if key in self._revalidating:
+            return
+        self._revalidating.add(key)
+        self.stats["revalidations"] += 1
+        task = asyncio.ensure_future(self.flights.do(key, refresh))
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._finished(key, t))
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        self._revalidating.discard(key)
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["revalidation_errors"] += 1
+            print(f"Error revalidating {self.name} {key}: {task.exception()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, soft_ttl=self.soft_ttl, hard_ttl=self.hard_ttl, revalidating=len(self._revalidating))
@@ -0,0 +1,64 @@
+"""Upstream calls and price staleness: fixed 30s re-pricing versus the adaptive scheduler.
+
+Simulates ten minutes in which a small share of the universe is volatile
+(and subscribed to) while the rest barely moves, and reports how stale each
+group's prices were on average alongside the Jupiter calls spent.
+
+    python -m benchmarks.adaptive_refresh --tokens 500 --hot 0.05
+"""
+import argparse
+import math
+import random
+
+from app.models.token import TokenData
+from app.services.refresh_scheduler import RefreshScheduler
+from benchmarks.cache_codecs import synthetic_tokens
+
+DURATION = 600
+BATCH = 100
+
+def fixed(tokens, hot):
+    calls = math.ceil(len(tokens) / BATCH) * (DURATION // 30)
+    # Every token is re-priced on the same 30s cycle
+    return calls, 15.0, 15.0
+
+def adaptive(tokens, hot, calls_per_minute):
+    scheduler = RefreshScheduler(batch_size=BATCH, calls_per_minute=calls_per_minute)
+    scheduler.plan(tokens, lambda a: 3 if a in hot else 0, now=0)
+    refreshed_at = {t.token_address: 0.0 for t in tokens}
+    staleness = {True: [], False: []}
+    for second in range(1, DURATION + 1):
+        batch = scheduler.take_due(second)
+        scheduler.completed(batch, second)
+        for address in batch:
+            refreshed_at[address] = second
+        for address, at in refreshed_at.items():
+            staleness[address in hot].append(second - at)
+    mean = {k: sum(v) / len(v) for k, v in staleness.items()}
+    return scheduler.stats["calls"], mean[True], mean[False]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--hot", type=float, default=0.05, help="fraction of volatile, watched tokens")
+    parser.add_argument("--calls-per-minute", type=float, default=12.0)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    tokens = [TokenData(**t) for t in synthetic_tokens(args.tokens)]
+    hot = {t.token_address for t in rng.sample(tokens, int(len(tokens) * args.hot))}
+    tokens = [
+        t.model_copy(update={"price_1hr_change": rng.uniform(20, 60) if t.token_address in hot else rng.uniform(-1, 1)})
+        for t in tokens
+    ]
+
+    print(f"{args.tokens} tokens, {len(hot)} hot, {DURATION}s")
+    print(f"{'':10}{'calls':>8}{'hot stale':>12}{'cold stale':>12}")
+    for name, (calls, hot_stale, cold_stale) in (
+        ("fixed", fixed(tokens, hot)),
+        ("adaptive", adaptive(tokens, hot, args.calls_per_minute)),
+    ):
+        print(f"{name:10}{calls:>8}{hot_stale:>11.1f}s{cold_stale:>11.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cache codec benchmark for a trending list of TokenData dicts.
+
+Reports encode/decode time and stored size for every available codec, with
+and without compression. With --redis it also writes each encoding to Redis
+and reports MEMORY USAGE for the key.
+
+    python -m benchmarks.cache_codecs --tokens 5000 [--redis redis://localhost:6379]
+"""
+import argparse
+import random
+import time
+
+from app.core.codecs import CODECS, decode, encode
+from app.models.token import TokenData
+
+def synthetic_tokens(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    return [
+        TokenData(
+            token_address="".join(rng.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz") for _ in range(44)),
+            token_name=f"Token {i}",
+            token_ticker=f"TK{i}",
+            price_sol=rng.random(),
+            market_cap_sol=rng.uniform(1e4, 1e9),
+            volume_sol=rng.uniform(1e2, 1e7),
+            liquidity_sol=rng.uniform(1e3, 1e6),
+            transaction_count=rng.randrange(10000),
+            price_1hr_change=rng.uniform(-50, 50),
+            protocol=rng.choice(["raydium", "orca", "meteora"])
+        ).dict()
+        for i in range(count)
+    ]
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--redis", default=None, help="Redis URL for MEMORY USAGE measurements")
+    args = parser.parse_args()
+
+    tokens = synthetic_tokens(args.tokens)
+    client = None
+    if args.redis:
+        import redis
+        client = redis.Redis.from_url(args.redis)
+
+    print(f"{args.tokens} tokens")
+    print(f"{'codec':<18}{'encode ms':>10}{'decode ms':>10}{'+validate ms':>13}{'bytes':>10}{'redis bytes':>13}")
+    for name, codec in CODECS.items():
+        for compress in (0, 16384):
+            data = encode(tokens, codec, compress)
+            encode_time = best_of(lambda: encode(tokens, codec, compress))
+            decode_time = best_of(lambda: decode(data))
+            validate_time = best_of(lambda: [TokenData(**t) for t in decode(data)], repeat=2)
+
+            memory = "-"
+            if client is not None:
+                key = f"bench:codec:{name}:{compress}"
+                client.set(key, data if isinstance(data, bytes) else data.encode())
+                memory = str(client.memory_usage(key))
+                client.delete(key)
+
+            label = f"{name}{'+zlib' if compress else ''}"
+            print(
+                f"{label:<18}{encode_time * 1000:>10.2f}{decode_time * 1000:>10.2f}"
+                f"{validate_time * 1000:>13.2f}{len(data):>10}{memory:>13}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Peak memory and time to first merged token: buffered versus streamed DexScreener parsing.
+
+Builds a synthetic search response with full-size pairs (urls, socials,
+every txns/volume window) and merges it both ways: json.loads on the whole
+body, and the incremental scanner fed 64 KiB chunks with pairs projected
+before they reach the merge.
+
+    python -m benchmarks.dex_streaming --pairs 5000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from app.services.dex_clients import project_pair
+from app.services.sources import merge_pair
+from app.utils.json_stream import iter_array_items
+
+CHUNK = 64 * 1024
+
+def synthetic_body(count: int) -> bytes:
+    rng = random.Random(9)
+    windows = ("m5", "h1", "h6", "h24")
+    pairs = []
+    for i in range(count):
+        address = f"{i:044d}"
+        pairs.append({
+            "chainId": "solana",
+            "dexId": rng.choice(["raydium", "orca", "meteora"]),
+            "url": f"https://dexscreener.com/solana/{address}",
+            "pairAddress": address[::-1],
+            "labels": ["v4"],
+            "baseToken": {"address": address, "name": f"Token {i}", "symbol": f"TK{i}"},
+            "quoteToken": {"address": "So11111111111111111111111111111111111111112", "name": "Wrapped SOL", "symbol": "SOL"},
+            "priceNative": str(rng.random()),
+            "priceUsd": str(rng.random() * 100),
+            "txns": {w: {"buys": rng.randrange(1000), "sells": rng.randrange(1000)} for w in windows},
+            "volume": {w: rng.uniform(0, 1e6) for w in windows},
+            "priceChange": {w: rng.uniform(-50, 50) for w in windows},
+            "liquidity": {"usd": rng.uniform(0, 1e6), "base": rng.uniform(0, 1e9), "quote": rng.uniform(0, 1e4)},
+            "fdv": rng.uniform(0, 1e9),
+            "marketCap": rng.uniform(0, 1e9),
+            "pairCreatedAt": 1700000000000 + i,
+            "info": {
+                "imageUrl": f"https://cdn.dexscreener.com/{address}.png",
+                "websites": [{"label": "Website", "url": f"https://token{i}.example"}],
+                "socials": [{"type": "twitter", "url": f"https://x.com/token{i}"}]
+            }
+        })
+    return json.dumps({"schemaVersion": "1.0.0", "pairs": pairs}).encode()
+
+def buffered(body):
+    start = time.perf_counter()
+    data = json.loads(body)
+    result, first = {}, None
+    for pair in data["pairs"]:
+        merge_pair(result, pair)
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+def streamed(body):
+    start = time.perf_counter()
+    chunks = (body[i:i + CHUNK] for i in range(0, len(body), CHUNK))
+    result, first = {}, None
+    for pair in iter_array_items(chunks, "pairs"):
+        merge_pair(result, project_pair(pair))
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+def measure(fn, body):
+    # Time without tracing, which slows allocation-heavy code unevenly
+    first, total = fn(body)
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, total, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=5000)
+    args = parser.parse_args()
+
+    body = synthetic_body(args.pairs)
+    print(f"{args.pairs} pairs, {len(body) / 1e6:.1f} MB body (the body itself is excluded from peaks)")
+    print(f"{'':10}{'first token':>14}{'total':>12}{'peak memory':>14}")
+    for name, fn in (("buffered", buffered), ("streamed", streamed)):
+        first, total, peak = measure(fn, body)
+        print(f"{name:10}{first * 1000:>12.2f}ms{total * 1000:>10.1f}ms{peak / 1e6:>12.1f}MB")
+
+if __name__ == "__main__":
+    main()
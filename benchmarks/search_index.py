@@ -0,0 +1,71 @@
+"""Search latency against a large synthetic token universe.
+
+Compares the prebuilt search index with the old substring scan for a mix of
+ticker, name and address queries.
+
+    python -m benchmarks.search_index --tokens 100000
+"""
+import argparse
+import random
+import time
+
+from app.models.token import TokenData
+from app.services.search_index import SearchIndex
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+SYLLABLES = ["pe", "do", "bo", "wi", "ca", "mo", "in", "so", "fr", "ch", "ba", "gi", "ku", "ra", "ze", "lo", "ta", "mi"]
+
+def synthetic_tokens(count: int, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    tokens = []
+    for i in range(count):
+        words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(2)]
+        tokens.append(TokenData(
+            token_address="".join(rng.choice(ALPHABET) for _ in range(44)),
+            token_name=f"{words[0].title()} {words[1].title()}",
+            token_ticker=words[0][:5].upper(),
+            price_sol=rng.random(),
+            market_cap_sol=rng.uniform(1e4, 1e9),
+            volume_sol=rng.uniform(1e2, 1e7),
+            liquidity_sol=rng.uniform(1e3, 1e6),
+            transaction_count=rng.randrange(10000),
+            price_1hr_change=rng.uniform(-50, 50),
+            protocol="raydium"
+        ))
+    return tokens
+
+def scan(tokens, query):
+    query = query.lower()
+    return [t for t in tokens if query in t.token_name.lower() or
+            query in t.token_ticker.lower() or query in t.token_address.lower()]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    tokens = synthetic_tokens(args.tokens)
+    by_address = {t.token_address: t for t in tokens}
+    key = {a: (-t.volume_sol, a) for a, t in by_address.items()}.get
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.update(tokens)
+    print(f"{args.tokens} tokens, index built in {time.perf_counter() - start:.2f}s")
+
+    queries = [tokens[7].token_ticker, tokens[42].token_name[:7], tokens[99].token_address[:6], "bo", "p"]
+    print(f"{'query':<14}{'matches':>9}{'index us':>12}{'scan ms':>10}")
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            total, _ = index.search(query, key=key, limit=20)
+        indexed = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        scan(tokens, query)
+        scanned = time.perf_counter() - start
+        print(f"{query:<14}{total:>9}{indexed * 1e6:>12.1f}{scanned * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Payload size and serialization time of delta broadcasts versus full pushes.
+
+Simulates one steady-state refresh in which a fraction of the universe moved
+and compares the old full token_update message with the new token_delta.
+
+    python -m benchmarks.token_deltas --tokens 500 --changed 0.05
+"""
+import argparse
+import json
+import random
+import time
+
+from app.models.token import TokenData, WebSocketMessage
+from app.services.token_store import TokenStore, diff_snapshots
+from benchmarks.cache_codecs import synthetic_tokens
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--changed", type=float, default=0.05, help="fraction of tokens that moved")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    tokens = [TokenData(**t) for t in synthetic_tokens(args.tokens)]
+    store = TokenStore()
+    store.replace(tokens)
+    old = store.snapshot(1)
+
+    moved = rng.sample(tokens, int(len(tokens) * args.changed))
+    store.replace([
+        t.model_copy(update={"price_sol": t.price_sol * 1.01, "volume_sol": t.volume_sol + 10}) if t in moved else t
+        for t in tokens
+    ])
+    new = store.snapshot(2)
+
+    start = time.perf_counter()
+    full = json.dumps(WebSocketMessage(
+        type="token_update",
+        data={"tokens": [t.dict() for t in new.tokens.values()]}
+    ).dict(), default=str)
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    diff = diff_snapshots(old.tokens, new.tokens)
+    delta = json.dumps(WebSocketMessage(
+        type="token_delta",
+        data={"seq": 2, "added": [t.dict() for t in diff.added], "removed": diff.removed, "changed": diff.changed}
+    ).dict(), default=str)
+    delta_time = time.perf_counter() - start
+
+    print(f"{args.tokens} tokens, {len(moved)} changed")
+    print(f"full   {len(full):>9} bytes {full_time * 1000:>8.2f} ms")
+    print(f"delta  {len(delta):>9} bytes {delta_time * 1000:>8.2f} ms (diff included)")
+    print(f"ratio  {len(full) / max(len(delta), 1):>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Token detail latency: a plain TTL cache versus stale-while-revalidate.
+
+Replays a steady stream of lookups for a handful of tokens against a
+simulated upstream, on a compressed clock (TTLs and latencies are scaled
+down 100x), and reports request latency percentiles and upstream calls.
+With a plain TTL, every expiry makes the next requests wait on upstream;
+with soft/hard TTLs they keep reading the cache.
+
+    python -m benchmarks.token_detail_swr --rps 400 --upstream-ms 80
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.utils.singleflight import SingleFlight
+from app.utils.swr import StaleWhileRevalidate
+
+SCALE = 100  # 30s soft TTL -> 0.3s
+
+class Upstream:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def fetch(self, key: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        return {"token": key, "fetched_at": time.monotonic()}
+
+async def plain_ttl(cache, upstream, flights, key, ttl):
+    entry = cache.get(key)
+    if entry is not None and time.monotonic() - entry["fetched_at"] < ttl:
+        return entry
+
+    async def load():
+        cache[key] = value = await upstream.fetch(key)
+        return value
+    return await flights.do(key, load)
+
+async def stale_while_revalidate(cache, upstream, swr, key):
+    entry = cache.get(key)
+    cached = (entry, time.monotonic() - entry["fetched_at"]) if entry is not None else None
+
+    async def load():
+        cache[key] = value = await upstream.fetch(key)
+        return value
+    value, _ = await swr.get(key, cached, load)
+    return value
+
+async def run(lookup, keys, rps, duration):
+    # Steady state: every token has been looked up once
+    await asyncio.gather(*(lookup(key) for key in keys))
+    latencies = []
+
+    async def request(key):
+        start = time.perf_counter()
+        await lookup(key)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        tasks.append(asyncio.ensure_future(request(random.choice(keys))))
+        await asyncio.sleep(1 / rps)
+    await asyncio.gather(*tasks)
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return len(latencies), p(0.5), p(0.99), max(latencies) * 1000
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=5)
+    parser.add_argument("--rps", type=float, default=400)
+    parser.add_argument("--upstream-ms", type=float, default=80.0, help="unscaled upstream latency")
+    parser.add_argument("--duration", type=float, default=3.0, help="scaled seconds")
+    args = parser.parse_args()
+
+    random.seed(3)
+    keys = [f"token{i}" for i in range(args.tokens)]
+    soft, hard = 30.0 / SCALE, 300.0 / SCALE
+    latency = args.upstream_ms / 1000
+
+    plain_upstream, plain_flights, plain_cache = Upstream(latency), SingleFlight(), {}
+    swr_upstream, swr, swr_cache = Upstream(latency), StaleWhileRevalidate("bench", soft, hard), {}
+
+    print(f"{args.tokens} tokens, {args.rps:.0f} req/s, upstream ~{args.upstream_ms:.0f}ms, {args.duration}s")
+    print(f"{'':10}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'upstream':>10}")
+    for name, lookup, upstream in (
+        ("plain", lambda k: plain_ttl(plain_cache, plain_upstream, plain_flights, k, soft), plain_upstream),
+        ("swr", lambda k: stale_while_revalidate(swr_cache, swr_upstream, swr, k), swr_upstream),
+    ):
+        count, p50, p99, worst = await run(lookup, keys, args.rps, args.duration)
+        print(f"{name:10}{count:>10}{p50:>10.2f}{p99:>10.2f}{worst:>10.2f}{upstream.calls:>10}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
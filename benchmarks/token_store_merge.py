@@ -0,0 +1,76 @@
+"""Token merge and index micro-benchmark.
+
+Merges synthetic DexScreener pairs through sources.merge_trending
+into the indexed TokenStore, then times a second, mostly unchanged cycle and
+page reads off the sort index.
+
+    python -m benchmarks.token_store_merge --pairs 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.dex_clients import DexScreenerClient
+from app.services.sources import merge_trending
+from app.services.token_store import TokenStore
+
+def synthetic_pairs(count: int, unique: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        n = rng.randrange(unique)
+        pairs.append({
+            "dexId": rng.choice(["raydium", "orca", "meteora"]),
+            "baseToken": {"address": f"addr{n:07d}", "name": f"Token {n}", "symbol": f"T{n}"},
+            "priceUsd": str(rng.random()),
+            "liquidity": {"usd": rng.uniform(1e3, 1e6)},
+            "volume": {"h24": rng.uniform(1e2, 1e7)},
+            "txns": {"h24": {"buys": rng.randrange(1000), "sells": rng.randrange(1000)}},
+            "priceChange": {"h1": rng.uniform(-50, 50)},
+            "fdv": rng.uniform(1e4, 1e9),
+        })
+    return {"pairs": pairs}
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000:10.2f}ms")
+    return result
+
+def merge(dex_data: dict) -> list:
+    client = DexScreenerClient()
+
+    async def stream_search(query):
+        for pair in dex_data["pairs"]:
+            yield pair
+
+    client.stream_search = stream_search
+    return list(asyncio.run(merge_trending(client, "bench")).values())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=50000)
+    parser.add_argument("--unique", type=int, default=40000)
+    args = parser.parse_args()
+
+    store = TokenStore()
+    dex_data = synthetic_pairs(args.pairs, args.unique)
+    print(f"{args.pairs} pairs, up to {args.unique} unique tokens")
+
+    tokens = timed("merge pairs", lambda: merge(dex_data))
+    timed("initial index build", lambda: store.replace(tokens))
+
+    # Next cycle: 5% of tokens change volume, the rest are identical
+    rng = random.Random(11)
+    for pair in rng.sample(dex_data["pairs"], len(dex_data["pairs"]) // 20):
+        pair["volume"]["h24"] = rng.uniform(1e2, 1e7)
+    tokens = timed("merge pairs (cycle 2)", lambda: merge(dex_data))
+    changed, removed = timed("incremental index update", lambda: store.replace(tokens))
+    print(f"{'changed / removed':<32} {len(changed)} / {len(removed)}")
+
+    timed("page read (deep, 100 items)", lambda: store.range("volume_sol", len(tokens) // 2, 100))
+    timed("full sort (old request path)", lambda: sorted(tokens, key=lambda t: t.volume_sol, reverse=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Broadcast fan-out benchmark.
+
+Measures per-socket delivery latency for one broadcast to many subscribers,
+some of which are deliberately slow, and compares it with the old sequential
+send loop.
+
+    python -m benchmarks.websocket_fanout --subscribers 5000 --slow 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from app.services.websocket import WebSocketManager
+
+class MockSocket:
+    def __init__(self, delay: float, latencies: List[float], started: List[float]):
+        self.delay = delay
+        self.latencies = latencies
+        self.started = started
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, payload: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.latencies.append(time.perf_counter() - self.started[0])
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def build_message(tokens: int) -> dict:
+    return {
+        "type": "token_update",
+        "data": {"tokens": [
+            {"token_address": f"addr{i}", "price_sol": i * 0.001, "volume_sol": i * 10.0}
+            for i in range(tokens)
+        ]}
+    }
+
+async def run_fanout(subscribers: int, slow: int, delay: float, message: dict):
+    manager = WebSocketManager(max_queue_size=64, slow_consumer_policy="drop_oldest")
+    latencies: List[float] = []
+    started = [0.0]
+    sockets = [
+        MockSocket(delay if i < slow else 0.0, latencies, started)
+        for i in range(subscribers)
+    ]
+    for ws in sockets:
+        await manager.connect(ws)
+        manager.subscribe(ws, "tokens")
+
+    started[0] = time.perf_counter()
+    await manager.broadcast_to_topic("tokens", message)
+    broadcast_time = time.perf_counter() - started[0]
+
+    while len(latencies) < subscribers - slow:
+        await asyncio.sleep(0.001)
+    fast = list(latencies)
+
+    for ws in sockets:
+        manager.disconnect(ws)
+    return broadcast_time, fast
+
+async def run_sequential(subscribers: int, slow: int, delay: float, message: dict):
+    latencies: List[float] = []
+    started = [time.perf_counter()]
+    sockets = [
+        MockSocket(delay if i < slow else 0.0, latencies, started)
+        for i in range(subscribers)
+    ]
+    for ws in sockets:
+        await ws.send_text(json.dumps(message))
+    return time.perf_counter() - started[0], latencies
+
+def report(name: str, broadcast_time: float, latencies: List[float]):
+    print(
+        f"{name:<12} broadcast={broadcast_time * 1000:8.2f}ms "
+        f"p50={percentile(latencies, 0.50) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:8.2f}ms "
+        f"delivered={len(latencies)}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="send delay of slow sockets (s)")
+    parser.add_argument("--tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    message = build_message(args.tokens)
+    print(f"{args.subscribers} subscribers, {args.slow} slow ({args.delay * 1000:.0f}ms/send)")
+    report("fan-out", *await run_fanout(args.subscribers, args.slow, args.delay, message))
+    report("sequential", *await run_sequential(args.subscribers, args.slow, args.delay, message))
+
+if __name__ == "__main__":
+    asyncio.run(main())
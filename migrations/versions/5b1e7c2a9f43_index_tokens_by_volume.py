@@ -0,0 +1,28 @@
+"""Index tokens by volume for warm start
+
+Revision ID: 5b1e7c2a9f43
+Revises: d0f109f36640
+Create Date: 2026-10-18 10:12:31.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7c2a9f43'
+down_revision: Union[str, Sequence[str], None] = 'd0f109f36640'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_tokens_volume_sol'), 'tokens', ['volume_sol'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tokens_volume_sol'), table_name='tokens')
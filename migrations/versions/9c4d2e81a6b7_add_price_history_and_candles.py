@@ -0,0 +1,52 @@
+"""Add price history and candles
+
+Revision ID: 9c4d2e81a6b7
+Revises: 5b1e7c2a9f43
+Create Date: 2026-10-18 11:40:05.918342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d2e81a6b7'
+down_revision: Union[str, Sequence[str], None] = '5b1e7c2a9f43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('token_price_history',
+    sa.Column('token_address', sa.String(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('price_sol', sa.Float(), nullable=False),
+    sa.Column('volume_sol', sa.Float(), nullable=False),
+    sa.Column('liquidity_sol', sa.Float(), nullable=False),
+    sa.Column('market_cap_sol', sa.Float(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('token_address', 'recorded_at')
+    )
+    op.create_index('ix_token_price_history_recorded_at', 'token_price_history', ['recorded_at'], unique=False, postgresql_using='brin')
+    op.create_table('token_candles',
+    sa.Column('token_address', sa.String(), nullable=False),
+    sa.Column('interval', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=False),
+    sa.Column('high', sa.Float(), nullable=False),
+    sa.Column('low', sa.Float(), nullable=False),
+    sa.Column('close', sa.Float(), nullable=False),
+    sa.Column('volume_sol', sa.Float(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('token_address', 'interval', 'bucket_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('token_candles')
+    op.drop_index('ix_token_price_history_recorded_at', table_name='token_price_history', postgresql_using='brin')
+    op.drop_table('token_price_history')
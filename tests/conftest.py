@@ -0,0 +1,21 @@
+import pytest
+from app.models.token import TokenData
+
+@pytest.fixture
+def make_token():
+    """Factory for TokenData; keyword arguments override the default fields"""
+    def make(address: str, **fields) -> TokenData:
+        defaults = dict(
+            token_address=address,
+            token_name=f"Token {address}",
+            token_ticker=address.upper(),
+            price_sol=1.0,
+            market_cap_sol=100.0,
+            volume_sol=100.0,
+            liquidity_sol=100.0,
+            transaction_count=10,
+            price_1hr_change=0.0,
+            protocol="raydium"
+        )
+        return TokenData(**{**defaults, **fields})
+    return make
@@ -1,7 +1,11 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
 from app.services.aggregation import DataAggregationService
 from app.models.token import TokenData
+from app.services.subscriptions import TokenSubscriptions
+from app.services.sources import merge_trending
 
 @pytest.fixture
 def aggregation_service():
@@ -71,4 +75,422 @@ async def test_aggregate_tokens(aggregation_service):
             # Verify token was created correctly
             assert token is not None
             assert token.token_address == "test_address"
-            assert token.token_name == "Test Token"
\ No newline at end of file
+
+            assert token.token_name == "Test Token"
+@pytest.mark.asyncio
+async def test_filtered_tokens_read_from_snapshot(aggregation_service, make_token):
+    """Test that list requests are served from the published snapshot without upstream calls"""
+    aggregation_service.token_store.replace([
+        make_token(f"addr{i}", market_cap_sol=100 * i, volume_sol=1000 * i, price_1hr_change=float(i))
+        for i in range(5)
+    ])
+    aggregation_service.publish_snapshot()
+
+    with patch.object(aggregation_service, 'fetch_trending_tokens', new_callable=AsyncMock) as mock_fetch:
+        result = await aggregation_service.get_filtered_tokens(limit=2, sort_by="volume_sol")
+
+    mock_fetch.assert_not_called()
+    assert [t.token_address for t in result["tokens"]] == ["addr4", "addr3"]
+    assert result["total_count"] == 5
+    assert result["has_more"] is True
+    assert result["snapshot_version"] == 1
+
+@pytest.mark.asyncio
+async def test_keyset_pagination_across_refresh(aggregation_service, make_token):
+    """Test that paging continues from the same snapshot after a refresh reorders tokens"""
+    aggregation_service.token_store.replace([make_token(f"addr{i}", volume_sol=1000 - i) for i in range(6)])
+    aggregation_service.publish_snapshot()
+
+    first = await aggregation_service.get_filtered_tokens(limit=3)
+    assert [t.token_address for t in first["tokens"]] == ["addr0", "addr1", "addr2"]
+
+    # Refresh moves the last token to the top
+    aggregation_service.token_store.upsert(make_token("addr5", volume_sol=5000))
+    aggregation_service.publish_snapshot()
+
+    second = await aggregation_service.get_filtered_tokens(limit=3, cursor=first["next_cursor"])
+    assert [t.token_address for t in second["tokens"]] == ["addr3", "addr4", "addr5"]
+    assert second["snapshot_version"] == first["snapshot_version"]
+    assert second["has_more"] is False
+
+@pytest.mark.asyncio
+async def test_warm_start_and_persist_changed_tokens(aggregation_service, make_token):
+    """Test that persisted tokens are served at startup and only changes are written back"""
+    repository = AsyncMock()
+    repository.load_tokens.return_value = [make_token("addr0", volume_sol=10), make_token("addr1", volume_sol=20)]
+    aggregation_service.repository = repository
+    aggregation_service.price_history = AsyncMock()
+
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=[{}]):
+        await aggregation_service.warm_start()
+
+    assert [t.token_address for t in aggregation_service.snapshot.orderings["volume_sol"]] == ["addr1", "addr0"]
+
+    changed, _ = aggregation_service.token_store.replace([make_token("addr0", volume_sol=10), make_token("addr1", volume_sol=99)])
+    aggregation_service._queue_persist(changed)
+    await aggregation_service.persist_pending()
+
+    written = list(repository.upsert_tokens.call_args[0][0])
+    assert [t.token_address for t in written] == ["addr1"]
+    recorded = list(aggregation_service.price_history.record.call_args[0][0])
+    assert [t.token_address for t in recorded] == ["addr1"]
+    assert aggregation_service._pending_persist == {}
+
+@pytest.mark.asyncio
+async def test_time_filter_uses_window_volume(aggregation_service, make_token):
+    """Test that time_filter sorts and reports by the requested window"""
+    # addr0 has the larger 24h volume, addr1 is far more active right now
+    aggregation_service.token_store.replace([make_token("addr0", volume_sol=10000), make_token("addr1", volume_sol=2400)])
+    aggregation_service.token_windows.observe(aggregation_service.token_store.tokens.values(), now=0)
+    aggregation_service.token_store.upsert(make_token("addr1", volume_sol=4400))
+    aggregation_service.token_windows.observe(aggregation_service.token_store.tokens.values(), now=30)
+    aggregation_service.publish_snapshot()
+
+    day = await aggregation_service.get_filtered_tokens(time_filter="24h")
+    hour = await aggregation_service.get_filtered_tokens(time_filter="1h")
+
+    assert [t.token_address for t in day["tokens"]] == ["addr0", "addr1"]
+    assert day["tokens"][0].volume_sol == 10000
+    assert [t.token_address for t in hour["tokens"]] == ["addr1", "addr0"]
+    assert hour["tokens"][0].volume_sol < 4400
+    assert hour["tokens"][0].price_change == 0.0
+
+@pytest.mark.asyncio
+async def test_search_ranks_exact_ticker_and_pages(aggregation_service, make_token):
+    """Test that search uses the index, ranks exact tickers first and pages with cursors"""
+    tokens = [
+        make_token(f"addr{i}", token_ticker=ticker, token_name=f"{ticker} Token", volume_sol=volume)
+        for i, (ticker, volume) in enumerate([("PEPE", 10), ("PEPEX", 900), ("PEPEY", 500), ("WIF", 1000)])
+    ]
+    aggregation_service.token_store.replace(tokens)
+    aggregation_service.search_index.update(tokens)
+    aggregation_service.publish_snapshot()
+
+    first = await aggregation_service.get_filtered_tokens(limit=2, search="pepe")
+    assert [t.token_address for t in first["tokens"]] == ["addr0", "addr1"]
+    assert first["total_count"] == 3
+    assert first["has_more"] is True
+
+    second = await aggregation_service.get_filtered_tokens(limit=2, search="pepe", cursor=first["next_cursor"])
+    assert [t.token_address for t in second["tokens"]] == ["addr2"]
+    assert second["has_more"] is False
+
+@pytest.mark.asyncio
+async def test_broadcast_sends_sequenced_deltas(aggregation_service, make_token):
+    """Test that only changes are broadcast, with consecutive sequence numbers"""
+    with patch('app.services.aggregation.websocket_manager') as manager:
+        manager.has_subscribers.return_value = True
+        manager.token_subscriptions = TokenSubscriptions()
+        manager.broadcast_to_topic = AsyncMock()
+        manager.bus = None
+
+        aggregation_service.token_store.replace([make_token("addr0", volume_sol=10), make_token("addr1", volume_sol=20)])
+        await aggregation_service.broadcast_token_updates(aggregation_service.publish_snapshot())
+        aggregation_service.token_store.replace([make_token("addr0", volume_sol=10), make_token("addr1", volume_sol=30), make_token("addr2", volume_sol=5)])
+        await aggregation_service.broadcast_token_updates(aggregation_service.publish_snapshot())
+        # Nothing changed, so nothing is sent and the sequence doesn't move
+        aggregation_service.token_store.replace([make_token("addr0", volume_sol=10), make_token("addr1", volume_sol=30), make_token("addr2", volume_sol=5)])
+        await aggregation_service.broadcast_token_updates(aggregation_service.publish_snapshot())
+
+    assert manager.broadcast_to_topic.call_count == 2
+    first, second = [c[0][1]["data"] for c in manager.broadcast_to_topic.call_args_list]
+    assert first["seq"] == 1
+    assert len(first["added"]) == 2
+    assert second["seq"] == 2
+    assert [t["token_address"] for t in second["added"]] == ["addr2"]
+    assert second["changed"]["addr1"]["volume_sol"] == 30
+    assert "addr0" not in second["changed"]
+
+    snapshot = aggregation_service.token_snapshot_message()
+    assert snapshot["data"]["seq"] == 2
+    assert [t["token_address"] for t in snapshot["data"]["tokens"]] == ["addr1", "addr0", "addr2"]
+
+@pytest.mark.asyncio
+async def test_follower_syncs_from_leader_cache(aggregation_service, make_token):
+    """Test that a follower adopts the leader's published universe and sequence"""
+    tokens = [make_token("addr0").dict()]
+    published = {"fencing_token": 3, "version": 7, "seq": 42, "tokens": tokens}
+    aggregation_service.is_running = True
+
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=published), \
+         patch.object(aggregation_service, 'fetch_trending_tokens', new_callable=AsyncMock) as mock_fetch, \
+         patch('app.services.aggregation.websocket_manager') as manager:
+        manager.token_subscriptions = TokenSubscriptions()
+        manager.broadcast_to_topic = AsyncMock()
+        result = await aggregation_service.get_filtered_tokens(limit=10)
+
+    mock_fetch.assert_not_called()
+    # Topic deltas come from the leader over the bus, not from followers
+    manager.broadcast_to_topic.assert_not_called()
+    assert [t.token_address for t in result["tokens"]] == ["addr0"]
+    # Resyncs on this worker line up with the leader's deltas
+    assert aggregation_service.token_snapshot_message()["data"]["seq"] == 42
+
+@pytest.mark.asyncio
+async def test_adaptive_refresh_reprices_due_tokens(aggregation_service, make_token):
+    """Test that due tokens are re-priced in one fresh batch and reach subscribers"""
+    tokens = [make_token("addr0", price_sol=0.1, price_1hr_change=40.0), make_token("addr1", price_sol=0.1, price_1hr_change=0.0)]
+    aggregation_service.token_store.replace(tokens)
+    aggregation_service.refresh_scheduler.plan(tokens, lambda address: 0, now=0)
+    jupiter_response = {"data": {"addr0": {"price": 0.2}, "addr1": {"price": 0.1}}}
+
+    with patch('app.services.aggregation.time.monotonic', return_value=1000), \
+         patch.object(aggregation_service.jupiter, 'get_prices', new_callable=AsyncMock, return_value=jupiter_response) as mock_prices, \
+         patch.object(aggregation_service, 'broadcast_token_updates', new_callable=AsyncMock) as mock_broadcast, \
+         patch.object(aggregation_service, 'persist_pending', new_callable=AsyncMock):
+        await aggregation_service.refresh_due_prices()
+
+    mock_prices.assert_awaited_once_with(["addr0", "addr1"], fresh=True)
+    assert aggregation_service.snapshot.tokens["addr0"].price_sol == 0.2
+    mock_broadcast.assert_awaited_once()
+    # Both tokens are rescheduled from the time the batch finished
+    assert aggregation_service.refresh_scheduler.take_due(now=1000) == []
+
+@pytest.mark.asyncio
+async def test_trending_pairs_are_merged_as_they_stream(aggregation_service):
+    """Test that streamed pairs for the same token fold into one entry"""
+    async def stream(query):
+        yield {"baseToken": {"address": "addr0", "name": "Zero", "symbol": "ZERO"},
+               "priceUsd": "0.5", "liquidity": {"usd": 100}, "txns": {"h24": {"buys": 1, "sells": 1}}, "dexId": "orca"}
+        yield {"baseToken": {"address": "addr0"}, "liquidity": {"usd": 900},
+               "txns": {"h24": {"buys": 2, "sells": 0}}, "dexId": "raydium"}
+
+    with patch.object(aggregation_service.dexscreener, 'stream_search', stream):
+        merged = await merge_trending(aggregation_service.dexscreener, "solana trending")
+
+    token = merged["addr0"]
+    assert token.transaction_count == 4
+    assert token.protocol == "raydium"
+
+@pytest.mark.asyncio
+async def test_token_detail_serves_stale_entry_while_revalidating(aggregation_service, make_token):
+    """Test that a detail entry past its soft TTL is served at once and refreshed in the background"""
+    stale = make_token("addr0", price_sol=0.1, last_updated=datetime.utcnow() - timedelta(seconds=60))
+    dex_response = {"pairs": [{
+        "baseToken": {"address": "addr0", "name": "Token 0", "symbol": "T0"},
+        "priceUsd": "0.2",
+        "liquidity": {"usd": 600},
+        "volume": {"h24": 20},
+        "txns": {"h24": {"buys": 70, "sells": 50}},
+        "priceChange": {"h1": 1.0},
+        "fdv": 200,
+        "dexId": "Test Protocol"
+    }]}
+    release = asyncio.Event()
+
+    async def slow_upstream(*args, **kwargs):
+        await release.wait()
+        return dex_response
+
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=stale.dict()), \
+         patch('app.services.aggregation.cache_manager.set', new_callable=AsyncMock) as mock_set, \
+         patch.object(aggregation_service.dexscreener, 'get_token_data', side_effect=slow_upstream) as mock_dex, \
+         patch.object(aggregation_service.jupiter, 'get_prices', new_callable=AsyncMock, return_value={"data": {}}):
+        # Upstream is stuck, yet every request is answered from the cache
+        tokens = await asyncio.wait_for(
+            asyncio.gather(*(aggregation_service.get_token_by_address("addr0") for _ in range(20))),
+            timeout=1
+        )
+        assert all(token.price_sol == 0.1 for token in tokens)
+
+        release.set()
+        await asyncio.sleep(0.01)
+
+    assert mock_dex.call_count == 1
+    assert mock_set.call_args[0][1]["price_sol"] == 0.2
+    assert mock_set.call_args[0][1]["transaction_count"] == 120
+    assert aggregation_service.detail_swr.stats["stale"] == 20
+
+@pytest.mark.asyncio
+async def test_token_detail_past_hard_ttl_waits_for_refresh(aggregation_service, make_token):
+    """Test that an expired detail entry is replaced before it is returned"""
+    expired = make_token("addr0", price_sol=0.1, last_updated=datetime.utcnow() - timedelta(hours=1))
+    dex_response = {"pairs": [{
+        "baseToken": {"address": "addr0", "name": "Token 0", "symbol": "T0"},
+        "priceUsd": "0.2",
+        "liquidity": {"usd": 600}
+    }]}
+
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=expired.dict()), \
+         patch('app.services.aggregation.cache_manager.set', new_callable=AsyncMock), \
+         patch.object(aggregation_service.dexscreener, 'get_token_data', new_callable=AsyncMock, return_value=dex_response), \
+         patch.object(aggregation_service.jupiter, 'get_prices', new_callable=AsyncMock, return_value={"data": {"addr0": {"price": 0.4}}}):
+        token = await aggregation_service.get_token_by_address("addr0")
+
+    # DexScreener and Jupiter prices reconciled at equal weight
+    assert token.price_sol == pytest.approx(0.3)
+    assert aggregation_service.detail_swr.stats["blocked"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_source_does_not_delay_trending_refresh(aggregation_service, make_token):
+    """Test that sources are merged in parallel and a slow one is cut off at its deadline"""
+    from app.services.sources import Quote, SourceFanIn, TokenSource
+
+    class FakeSource(TokenSource):
+        def __init__(self, name, delay, quotes, discovers=True):
+            self.name, self.delay, self.quotes, self.discovers = name, delay, quotes, discovers
+
+        async def fetch(self, known):
+            await asyncio.sleep(self.delay)
+            return self.quotes
+
+    # Tracked from an earlier cycle
+    aggregation_service.token_store.replace([make_token("old")])
+    aggregation_service.publish_snapshot()
+    aggregation_service.source_fan_in = SourceFanIn([
+        FakeSource("dexscreener", 0.01, {"a": Quote.of(make_token("a"))}),
+        FakeSource("jupiter", 0.01, {"a": Quote(price=2.0)}, discovers=False),
+        FakeSource("geckoterminal", 30, {})
+    ], {"geckoterminal": 0.1})
+
+    with patch('app.services.aggregation.cache_manager.set', new_callable=AsyncMock), \
+         patch('app.services.aggregation.settings.SOURCE_WEIGHTS', {"dexscreener": 1.0, "jupiter": 1.0}):
+        tokens = await asyncio.wait_for(aggregation_service.fetch_trending_tokens(), timeout=1)
+
+    merged = {t.token_address: t for t in tokens}
+    assert merged["a"].price_sol == pytest.approx(1.5)
+    # GeckoTerminal missed the cycle, so what it may have listed before is kept
+    assert set(merged) == {"a", "old"}
+    assert aggregation_service.source_fan_in.get_stats()["geckoterminal"]["timeouts"] == 1
+
+@pytest.mark.asyncio
+async def test_follower_resync_covers_relayed_deltas(aggregation_service, make_token):
+    """Test that a delta relayed before the next sync is part of the snapshot a resync returns"""
+    import json
+    from app.models.token import WebSocketMessage
+    from app.services.websocket import websocket_manager
+
+    published = {"fencing_token": 3, "version": 7, "seq": 42, "tokens": [make_token("addr0", price_sol=0.1).dict()]}
+    aggregation_service.is_running = True
+
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=published):
+        await aggregation_service.sync_from_leader()
+    assert aggregation_service.token_snapshot_message()["data"]["seq"] == 42
+
+    delta = WebSocketMessage(type="token_delta", data={
+        "seq": 43,
+        "added": [make_token("addr1").dict()],
+        "removed": [],
+        "changed": {"addr0": {"price_sol": 0.2, "last_updated": datetime.utcnow()}}
+    }).dict()
+    websocket_manager.relay_hook = aggregation_service.apply_relayed_delta
+    try:
+        websocket_manager.relay("tokens", json.dumps(delta, default=str))
+    finally:
+        websocket_manager.relay_hook = None
+
+    message = aggregation_service.token_snapshot_message()["data"]
+    assert message["seq"] >= 43
+    assert {t["token_address"]: t["price_sol"] for t in message["tokens"]} == {"addr0": 0.2, "addr1": 1.0}
+
+    # The periodic sync still sees the leader's older publish and must not roll back
+    published = dict(published, version=8)
+    with patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=published):
+        await aggregation_service.sync_from_leader()
+    assert aggregation_service.token_snapshot_message()["data"]["seq"] == 43
+
+@pytest.mark.asyncio
+async def test_failed_refresh_does_not_reset_snapshot_age(aggregation_service, make_token):
+    """Test that republishing after a failed fetch keeps the age of the last fetched data"""
+    import time
+
+    aggregation_service.token_store.replace([make_token("addr0")])
+    aggregation_service._fetched_at = time.time() - 100
+    aggregation_service.publish_snapshot()
+
+    with patch.object(aggregation_service.source_fan_in, 'fetch', new_callable=AsyncMock, side_effect=RuntimeError("down")), \
+         patch('app.services.aggregation.cache_manager.get', new_callable=AsyncMock, return_value=None), \
+         patch.object(aggregation_service, 'persist_pending', new_callable=AsyncMock), \
+         patch.object(aggregation_service, 'broadcast_token_updates', new_callable=AsyncMock), \
+         patch.object(aggregation_service, 'publish_to_followers', new_callable=AsyncMock):
+        await aggregation_service.update_token_data()
+
+    assert aggregation_service.snapshot.version == 2
+    assert aggregation_service.snapshot.age >= 100
+
+@pytest.mark.asyncio
+async def test_scheduled_and_request_refreshes_share_one_flight(aggregation_service):
+    """Test that a request arriving during the scheduled refresh waits on it instead of starting another"""
+    # Cold start: requests have nothing to serve until a refresh lands
+    aggregation_service.snapshot = None
+    release = asyncio.Event()
+
+    async def slow_update():
+        await release.wait()
+        aggregation_service.publish_snapshot()
+
+    with patch.object(aggregation_service, 'update_token_data', side_effect=slow_update) as mock_update:
+        scheduled = asyncio.create_task(aggregation_service.scheduled_refresh())
+        await asyncio.sleep(0)
+        request = asyncio.create_task(aggregation_service.get_snapshot())
+        await asyncio.sleep(0)
+        release.set()
+        await scheduled
+        snapshot = await request
+
+    assert mock_update.call_count == 1
+    assert snapshot is aggregation_service.snapshot
+
+@pytest.mark.asyncio
+async def test_relayed_deltas_rebuild_the_snapshot_once_per_tick(aggregation_service, make_token):
+    """Test that deltas relayed together cost one snapshot rebuild and route only their own entries"""
+    import json
+    from app.models.token import WebSocketMessage
+
+    aggregation_service.is_running = True
+    aggregation_service.token_store.replace([make_token("addr0"), make_token("addr1")])
+    aggregation_service.publish_snapshot()
+    version = aggregation_service.snapshot.version
+
+    def delta(seq, added=(), removed=(), changed=None):
+        data = {"seq": seq, "added": list(added), "removed": list(removed), "changed": changed or {}}
+        return json.dumps(WebSocketMessage(type="token_delta", data=data).dict(), default=str)
+
+    with patch('app.services.aggregation.websocket_manager') as manager:
+        manager.token_subscriptions = MagicMock(__bool__=lambda self: True)
+        manager.broadcast_token_delta = AsyncMock()
+        aggregation_service.apply_relayed_delta("tokens", delta(1, changed={"addr0": {"price_sol": 2.0}}))
+        aggregation_service.apply_relayed_delta("tokens", delta(2, added=[make_token("addr2").dict()], removed=["addr1"]))
+        assert aggregation_service.snapshot.version == version
+        await asyncio.sleep(0)
+
+    assert aggregation_service.snapshot.version == version + 1
+    assert set(aggregation_service.snapshot.tokens) == {"addr0", "addr2"}
+    diff, snapshot = manager.broadcast_token_delta.call_args[0]
+    assert manager.broadcast_token_delta.call_count == 1
+    assert [t.token_address for t in diff.added] == ["addr2"]
+    assert diff.removed == ["addr1"]
+    assert diff.changed == {"addr0": {"price_sol": 2.0}}
+
+@pytest.mark.asyncio
+async def test_newly_listed_tokens_are_quoted_in_the_same_cycle(aggregation_service, make_token):
+    """Test that price-only sources are asked about tokens discovered this cycle in a second pass"""
+    from app.services.sources import Quote, SourceFanIn, TokenSource
+
+    class Lister(TokenSource):
+        name, discovers, client = "dexscreener", True, None
+
+        async def fetch(self, known):
+            return {"old": Quote.of(make_token("old")), "new": Quote.of(make_token("new"))}
+
+    class Pricer(TokenSource):
+        name, discovers, client = "jupiter", False, None
+
+        def __init__(self):
+            self.asked = []
+
+        async def fetch(self, known):
+            self.asked.append(list(known))
+            return {address: Quote(price=2.0) for address in known}
+
+    aggregation_service.token_store.replace([make_token("old")])
+    aggregation_service.publish_snapshot()
+    pricer = Pricer()
+    aggregation_service.source_fan_in = SourceFanIn([Lister(), pricer], {})
+
+    with patch('app.services.aggregation.cache_manager.set', new_callable=AsyncMock), \
+         patch('app.services.aggregation.settings.SOURCE_WEIGHTS', {"dexscreener": 1.0, "jupiter": 1.0}):
+        tokens = await aggregation_service.fetch_trending_tokens()
+
+    assert pricer.asked == [["old"], ["new"]]
+    assert {t.token_address: t.price_sol for t in tokens} == {"old": pytest.approx(1.5), "new": pytest.approx(1.5)}
@@ -1,7 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
 from app.main import app
+from app.models.token import TokenData
 
 client = TestClient(app)
 
@@ -89,4 +92,94 @@ def test_get_token_by_address():
         response = client.get(f"/api/v1/tokens/{token_address}")
         
         assert response.status_code == 200
-        assert response.json()["token_address"] == token_address
\ No newline at end of file
+        assert response.json()["token_address"] == token_address
+
+def test_get_token_ohlcv():
+    """Test getting candles for a token"""
+    candle = SimpleNamespace(
+        bucket_start=datetime(2024, 5, 1, 12, 0),
+        open=1.0,
+        high=1.5,
+        low=0.9,
+        close=1.2,
+        volume_sol=1322.43,
+        samples=4
+    )
+    with patch('app.api.routes.tokens.price_history_service.get_candles', new_callable=AsyncMock) as mock_candles:
+        mock_candles.return_value = [candle]
+
+        response = client.get("/api/v1/tokens/test_address/ohlcv?interval=5m")
+
+        assert response.status_code == 200
+        assert response.json()["interval"] == "5m"
+        assert response.json()["candles"][0]["close"] == 1.2
+        assert mock_candles.call_args[0][:2] == ("test_address", "5m")
+
+def test_get_token_ohlcv_rejects_bad_interval():
+    """Test that unsupported intervals are rejected"""
+    response = client.get("/api/v1/tokens/test_address/ohlcv?interval=2m")
+
+    assert response.status_code == 422
+
+def test_get_token_ohlcv_accepts_aware_timestamps():
+    """Test that timezone-aware start/end are converted to naive UTC"""
+    with patch('app.api.routes.tokens.price_history_service.get_candles', new_callable=AsyncMock) as mock_candles:
+        mock_candles.return_value = []
+
+        response = client.get(
+            "/api/v1/tokens/test_address/ohlcv",
+            params={"start": "2024-05-01T14:00:00+02:00", "end": "2024-05-01T13:00:00Z"}
+        )
+
+        assert response.status_code == 200
+        assert mock_candles.call_args[0][2:] == (datetime(2024, 5, 1, 12, 0), datetime(2024, 5, 1, 13, 0))
+
+def test_token_responses_carry_age_header():
+    """Test that detail and list responses report how old their data is"""
+    token = TokenData(
+        token_address="test_address",
+        token_name="PIPE CTO",
+        token_ticker="PIPE",
+        price_sol=0.1,
+        market_cap_sol=441.41,
+        volume_sol=1322.43,
+        liquidity_sol=149.35,
+        transaction_count=2205,
+        price_1hr_change=120.61,
+        protocol="Raydium CLMM",
+        last_updated=datetime.utcnow() - timedelta(seconds=42)
+    )
+    with patch('app.api.routes.tokens.aggregation_service.get_token_by_address', new_callable=AsyncMock) as mock_get_token:
+        mock_get_token.return_value = token
+        response = client.get("/api/v1/tokens/test_address")
+
+    assert response.status_code == 200
+    assert 42 <= int(response.headers["Age"]) <= 44
+
+    with patch('app.api.routes.tokens.aggregation_service.get_filtered_tokens', new_callable=AsyncMock) as mock_get_tokens:
+        mock_get_tokens.return_value = {
+            "tokens": [token.dict()],
+            "total_count": 1,
+            "next_cursor": None,
+            "has_more": False,
+            "snapshot_version": 3,
+            "snapshot_age": 7.6
+        }
+        response = client.get("/api/v1/tokens")
+
+    assert response.status_code == 200
+    assert response.headers["Age"] == "7"
+
+def test_metrics_report_each_upstream_once():
+    """Test that sources sharing the service's clients aren't reported twice"""
+    from app.api.routes.metrics import upstream_clients
+    from app.services.aggregation import aggregation_service
+
+    clients = upstream_clients()
+    assert clients["dexscreener"] is aggregation_service.dexscreener
+    assert clients["jupiter"] is aggregation_service.jupiter
+    assert set(clients) == {"dexscreener", "jupiter", *(source.name for source in aggregation_service.sources)}
+
+    response = client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert set(response.json()["upstream"]) == set(clients)
@@ -25,6 +25,21 @@ def test_websocket_connection(websocket_client):
         assert response["type"] == "subscription_confirmed"
         assert response["topic"] == "tokens"
 
+def test_websocket_snapshot_and_resync(websocket_client):
+    """Test that token subscribers get a full snapshot up front and on resync"""
+    with websocket_client.websocket_connect("/api/v1/ws") as websocket:
+        websocket.send_text(json.dumps({"type": "subscribe", "topic": "tokens"}))
+        assert json.loads(websocket.receive_text())["type"] == "subscription_confirmed"
+
+        snapshot = json.loads(websocket.receive_text())
+        assert snapshot["type"] == "token_snapshot"
+        assert "seq" in snapshot["data"]
+
+        websocket.send_text(json.dumps({"type": "resync"}))
+        resync = json.loads(websocket.receive_text())
+        assert resync["type"] == "token_snapshot"
+        assert resync["data"]["seq"] == snapshot["data"]["seq"]
+
 @pytest.mark.asyncio
 async def test_websocket_broadcast():
     """Test broadcasting messages to WebSocket clients"""
@@ -70,4 +85,23 @@ async def test_websocket_broadcast():
     assert mock_websocket.send_text.called
     
     # Clean up
-    websocket_manager.disconnect(mock_websocket)
\ No newline at end of file
+    websocket_manager.disconnect(mock_websocket)
+
+def test_websocket_filter_subscription(websocket_client):
+    """Test subscribing with a filter and rejecting a malformed one"""
+    with websocket_client.websocket_connect("/api/v1/ws") as websocket:
+        websocket.send_text(json.dumps({"type": "subscribe", "filter": {"top_n": 0}}))
+        assert json.loads(websocket.receive_text())["type"] == "error"
+
+        websocket.send_text(json.dumps({
+            "type": "subscribe",
+            "addresses": ["test_address"],
+            "filter": {"protocol": "raydium", "top_n": 10}
+        }))
+        confirmed = json.loads(websocket.receive_text())
+        assert confirmed["type"] == "subscription_confirmed"
+        assert confirmed["addresses"] == ["test_address"]
+
+        snapshot = json.loads(websocket.receive_text())
+        assert snapshot["type"] == "subscription_snapshot"
+        assert snapshot["data"]["seq"] == 0
@@ -0,0 +1,100 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from app.services.broadcast import BroadcastBus
+
+class FakePubSub:
+    """Replays published frames to the listener"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.subscribe = AsyncMock()
+        self.unsubscribe = AsyncMock()
+        self.aclose = AsyncMock()
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        for frame in self.frames:
+            yield {"type": "message", "data": frame}
+        await asyncio.Event().wait()
+
+@pytest.mark.asyncio
+async def test_bus_relays_frames_to_local_delivery():
+    """Test that frames from the channel are split and delivered without re-serializing"""
+    delivered = []
+    redis = MagicMock()
+    redis.pubsub.return_value = FakePubSub([b'tokens\n{"type": "token_delta"}', "*\n{}"])
+    bus = BroadcastBus(lambda topic, payload: delivered.append((topic, payload)))
+
+    await bus.start(redis)
+    await asyncio.sleep(0)
+    assert bus.connected
+    assert delivered == [("tokens", '{"type": "token_delta"}'), ("*", "{}")]
+    assert bus.get_stats()["relayed"] == 2
+    await bus.stop()
+
+@pytest.mark.asyncio
+async def test_bus_publish_frames_topic_and_payload():
+    """Test publishing one pre-serialized frame per broadcast"""
+    redis = MagicMock()
+    redis.pubsub.return_value = FakePubSub([])
+    redis.publish = AsyncMock()
+    bus = BroadcastBus(lambda topic, payload: None)
+    await bus.start(redis)
+
+    assert await bus.publish("tokens", '{"a": 1}')
+    redis.publish.assert_awaited_once_with("ws:broadcast", 'tokens\n{"a": 1}')
+    assert bus.get_stats()["published"] == 1
+    await bus.stop()
+
+@pytest.mark.asyncio
+async def test_bus_falls_back_to_local_delivery_without_redis():
+    """Test that an unreachable Redis makes the caller deliver locally"""
+    redis = MagicMock()
+    redis.pubsub.return_value.subscribe = AsyncMock(side_effect=ConnectionError("refused"))
+    bus = BroadcastBus(lambda topic, payload: None)
+
+    await bus.start(redis)
+    assert not bus.connected
+    assert not await bus.publish("tokens", "{}")
+    await bus.stop()
+
+@pytest.mark.asyncio
+async def test_bus_publish_error_is_counted():
+    """Test that a failed publish is reported so the caller can deliver locally"""
+    redis = MagicMock()
+    redis.pubsub.return_value = FakePubSub([])
+    redis.publish = AsyncMock(side_effect=ConnectionError("gone"))
+    bus = BroadcastBus(lambda topic, payload: None)
+    await bus.start(redis)
+
+    assert not await bus.publish("tokens", "{}")
+    assert bus.get_stats()["publish_errors"] == 1
+    await bus.stop()
+
+@pytest.mark.asyncio
+async def test_bus_stop_releases_subscription():
+    """Test that stopping unsubscribes and closes the pub/sub connection"""
+    pubsub = FakePubSub([])
+    redis = MagicMock()
+    redis.pubsub.return_value = pubsub
+    bus = BroadcastBus(lambda topic, payload: None)
+    await bus.start(redis)
+
+    await bus.stop()
+    pubsub.unsubscribe.assert_awaited_once()
+    pubsub.aclose.assert_awaited_once()
+    assert bus.get_stats()["connected"] == 0
+
+@pytest.mark.asyncio
+async def test_bus_stop_falls_back_to_close_on_older_clients():
+    """Test that clients without aclose() are closed through close()"""
+    pubsub = FakePubSub([])
+    del pubsub.aclose
+    pubsub.close = AsyncMock()
+    redis = MagicMock()
+    redis.pubsub.return_value = pubsub
+    bus = BroadcastBus(lambda topic, payload: None)
+    await bus.start(redis)
+
+    await bus.stop()
+    pubsub.close.assert_awaited_once()
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
-from app.core.cache import CacheManager
+import json
+from app.core.cache import CacheManager, LocalCache, _MISSING
 
 @pytest.fixture
 def cache_manager():
@@ -52,4 +53,147 @@ async def test_cache_get_nonexistent(cache_manager):
     mock_redis.get.return_value = None
     value = await cache_manager.get("nonexistent_key")
     mock_redis.get.assert_called_with("nonexistent_key")
-    assert value is None
\ No newline at end of file
+    assert value is None
+
+@pytest.mark.asyncio
+async def test_cache_get_many(cache_manager):
+    """Test fetching several keys in one round-trip"""
+    mock_redis = AsyncMock()
+    cache_manager.redis = mock_redis
+    mock_redis.mget.return_value = ['{"price": 1}', None]
+
+    values = await cache_manager.get_many(["a", "b"])
+
+    mock_redis.mget.assert_called_once_with(["a", "b"])
+    assert values == [{"price": 1}, None]
+
+@pytest.mark.asyncio
+async def test_cache_set_many(cache_manager):
+    """Test writing several keys through one pipeline"""
+    mock_redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    mock_redis.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+    mock_redis.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    cache_manager.redis = mock_redis
+
+    await cache_manager.set_many({"a": 1, "b": 2}, ttl=10)
+
+    pipe.setex.assert_any_call("a", 10, "1")
+    pipe.setex.assert_any_call("b", 10, "2")
+    pipe.execute.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_hot_reads_served_from_local_tier(cache_manager):
+    """Test that repeated reads of a key only hit Redis once"""
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = '[{"token_address": "a"}]'
+    cache_manager.redis = mock_redis
+
+    for _ in range(5):
+        value = await cache_manager.get("trending_tokens")
+
+    assert value == [{"token_address": "a"}]
+    mock_redis.get.assert_called_once_with("trending_tokens")
+    assert cache_manager.stats["l1_hits"] == 4
+    assert cache_manager.stats["l2_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_set_invalidates_local_tier_and_notifies_workers(cache_manager):
+    """Test that writes drop the local copy and publish an invalidation"""
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = '"old"'
+    cache_manager.redis = mock_redis
+    await cache_manager.get("key")
+
+    await cache_manager.set("key", "new", 30)
+
+    assert cache_manager.local.get("key") is _MISSING
+    channel, payload = mock_redis.publish.call_args[0]
+    assert channel == "cache:invalidate"
+    assert json.loads(payload)["keys"] == ["key"]
+
+def test_remote_invalidation_ignores_own_messages(cache_manager):
+    """Test that invalidations from other workers evict matching keys"""
+    cache_manager.local.set("dexscreener:token:a", {"pairs": []})
+    cache_manager.local.set("trending_tokens", [])
+
+    cache_manager._apply_invalidation(None, "dexscreener:token:*")
+
+    assert len(cache_manager.local) == 1
+
+def test_local_cache_bounds():
+    """Test that the local tier evicts least-recently-used and expired entries"""
+    local = LocalCache(max_entries=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is _MISSING
+    assert local.get("a") == 1
+
+    local.set("d", 4, ttl=0)
+    assert local.get("d") is _MISSING
+
+def mock_pipeline(mock_redis, results=None):
+    """Wire `async with redis.pipeline()` to a recording pipe"""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=results)
+    mock_redis.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+    mock_redis.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    return pipe
+
+async def aiter_keys(keys):
+    for key in keys:
+        yield key
+
+@pytest.mark.asyncio
+async def test_delete_scans_and_unlinks_in_batches(cache_manager):
+    """Test that pattern deletes use SCAN and pipelined UNLINK instead of KEYS"""
+    keys = [f"dexscreener:token:{i}" for i in range(750)]
+    mock_redis = MagicMock()
+    mock_redis.scan_iter.return_value = aiter_keys(keys)
+    mock_redis.publish = AsyncMock()
+    pipe = mock_pipeline(mock_redis, results=[[100] * 5, [100, 100, 50]])
+    cache_manager.redis = mock_redis
+
+    deleted = await cache_manager.delete("dexscreener:token:*")
+
+    assert deleted == 750
+    mock_redis.keys.assert_not_called()
+    mock_redis.scan_iter.assert_called_once_with(match="dexscreener:token:*", count=500)
+    assert pipe.unlink.call_count == 8
+    assert all(len(call.args) <= 100 for call in pipe.unlink.call_args_list)
+
+@pytest.mark.asyncio
+async def test_invalidate_tag_unlinks_members(cache_manager):
+    """Test that tagged keys are dropped via their tag set, not a keyspace walk"""
+    mock_redis = MagicMock()
+    mock_redis.sscan_iter.return_value = aiter_keys(["jupiter:price:a", "jupiter:price:b"])
+    mock_redis.unlink = AsyncMock()
+    mock_redis.publish = AsyncMock()
+    pipe = mock_pipeline(mock_redis, results=[[2]])
+    cache_manager.redis = mock_redis
+    cache_manager.local.set("jupiter:price:a", {"price": 1})
+
+    deleted = await cache_manager.invalidate_tag("jupiter:price")
+
+    assert deleted == 2
+    mock_redis.scan_iter.assert_not_called()
+    pipe.unlink.assert_called_once_with("jupiter:price:a", "jupiter:price:b")
+    mock_redis.unlink.assert_called_once_with("cache:tag:jupiter:price")
+    assert cache_manager.local.get("jupiter:price:a") is _MISSING
+
+@pytest.mark.asyncio
+async def test_set_with_tags_records_membership(cache_manager):
+    """Test that tagged writes add the key to the tag set"""
+    mock_redis = MagicMock()
+    mock_redis.publish = AsyncMock()
+    pipe = mock_pipeline(mock_redis, results=[[True, 1, True]])
+    cache_manager.redis = mock_redis
+
+    await cache_manager.set("dexscreener:token:a", {"pairs": []}, ttl=30, tags=["dexscreener:token"])
+
+    pipe.setex.assert_called_once_with("dexscreener:token:a", 30, '{"pairs": []}')
+    pipe.sadd.assert_called_once_with("cache:tag:dexscreener:token", "dexscreener:token:a")
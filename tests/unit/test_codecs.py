@@ -0,0 +1,53 @@
+import pytest
+from datetime import datetime
+from app.core.codecs import CODECS, MAGIC, CodecError, encode, decode, get_codec
+
+TOKENS = [
+    {
+        "token_address": f"addr{i}",
+        "token_name": "PIPE CTO",
+        "price_sol": 4.4141209798877615e-7,
+        "transaction_count": 2205,
+        "last_updated": datetime(2025, 6, 21, 12, 0, 0)
+    }
+    for i in range(50)
+]
+
+def test_plain_json_is_written_unframed():
+    """Test that the default codec keeps the legacy on-the-wire format"""
+    assert encode("test_value") == '"test_value"'
+    assert decode('"test_value"') == "test_value"
+    assert decode(b'{"a": 1}') == {"a": 1}
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codec_round_trip(name):
+    """Test that every available codec round-trips token payloads"""
+    codec = get_codec(name)
+    data = encode(TOKENS, codec)
+
+    result = decode(data)
+
+    assert result[0]["token_address"] == "addr0"
+    assert result[0]["price_sol"] == 4.4141209798877615e-7
+    assert result[0]["last_updated"].startswith("2025-06-21")
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_large_values_are_compressed(name):
+    """Test that values above the threshold are framed and compressed"""
+    codec = get_codec(name)
+    uncompressed = codec.dumps(TOKENS)
+
+    data = encode(TOKENS, codec, compress_min_bytes=1024)
+
+    assert data.startswith(MAGIC)
+    assert len(data) < len(uncompressed)
+    assert decode(data)[-1]["token_address"] == "addr49"
+
+def test_unknown_format_version_is_rejected():
+    """Test that readers refuse frames from a newer format version"""
+    with pytest.raises(CodecError):
+        decode(MAGIC + bytes((99, 1, 0)) + b"{}")
+
+def test_unavailable_codec_falls_back_to_json():
+    """Test that configuring a missing codec doesn't break caching"""
+    assert get_codec("does-not-exist").name == "json"
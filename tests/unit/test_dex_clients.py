@@ -79,4 +79,113 @@ async def test_jupiter_get_prices(jupiter_client):
         mock_get_prices.assert_called_once_with(token_addresses)
         
         # Verify result matches our expected response
-        assert prices == mock_response
\ No newline at end of file
+        assert prices == mock_response
+
+@pytest.mark.asyncio
+async def test_concurrent_token_lookups_share_one_request(dex_screener_client):
+    """Test that identical concurrent lookups result in a single upstream call"""
+    import asyncio
+    token_address = "576P1t7XsRL4ZVj38LV2eYWxXRPguBADA8BxcNz1xo8y"
+    release = asyncio.Event()
+
+    response = MagicMock()
+    response.json.return_value = {"pairs": []}
+
+    async def slow_get(*args, **kwargs):
+        await release.wait()
+        return response
+
+    dex_screener_client.client.get.side_effect = slow_get
+
+    with patch('app.services.dex_clients.cache_manager.get', new_callable=AsyncMock, return_value=None), \
+         patch('app.services.dex_clients.cache_manager.set', new_callable=AsyncMock):
+        waiters = [asyncio.create_task(dex_screener_client.get_token_data(token_address)) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+    assert dex_screener_client.client.get.call_count == 1
+    assert all(r == {"pairs": []} for r in results)
+    assert dex_screener_client.flights.stats["coalesced"] == 19
+
+@pytest.mark.asyncio
+async def test_jupiter_fetches_only_uncached_ids_in_chunks(jupiter_client):
+    """Test that cached prices are reused and missing ids are split into chunks"""
+    ids = [f"token{i:02d}" for i in range(5)]
+    cached = [{"id": "token00", "price": 1.0}, None, {}, None, None]
+
+    def fake_get(url, params=None):
+        requested = params["ids"].split(",")
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"data": {i: {"id": i, "price": 2.0} for i in requested}}
+        return response
+
+    jupiter_client.client.get.side_effect = fake_get
+
+    with patch('app.services.dex_clients.settings.JUPITER_MAX_IDS_PER_REQUEST', 2), \
+         patch('app.services.dex_clients.cache_manager.get_many', new_callable=AsyncMock, return_value=cached), \
+         patch('app.services.dex_clients.cache_manager.set_many', new_callable=AsyncMock) as mock_set_many:
+        prices = await jupiter_client.get_prices(list(reversed(ids)))
+
+    requested = sorted(call.kwargs["params"]["ids"] for call in jupiter_client.client.get.call_args_list)
+    assert requested == ["token01,token03", "token04"]
+    assert set(prices["data"]) == {"token00", "token01", "token03", "token04"}
+    assert prices["data"]["token00"]["price"] == 1.0
+    assert mock_set_many.call_count == 2
+
+@pytest.mark.asyncio
+async def test_jupiter_fresh_prices_skip_cache(jupiter_client):
+    """Test that scheduled refreshes go upstream even when prices are cached"""
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = {"data": {"token00": {"id": "token00", "price": 3.0}}}
+    jupiter_client.client.get.return_value = response
+
+    with patch('app.services.dex_clients.cache_manager.get_many', new_callable=AsyncMock) as mock_get_many, \
+         patch('app.services.dex_clients.cache_manager.set_many', new_callable=AsyncMock):
+        prices = await jupiter_client.get_prices(["token00"], fresh=True)
+
+    mock_get_many.assert_not_called()
+    assert prices["data"]["token00"]["price"] == 3.0
+
+@pytest.mark.asyncio
+async def test_search_streams_projected_pairs():
+    """Test that search results are parsed off the stream and trimmed to the fields we use"""
+    import httpx
+    import json
+
+    body = json.dumps({"pairs": [
+        {
+            "chainId": "solana",
+            "url": "https://dexscreener.com/solana/pair",
+            "baseToken": {"address": "addr0", "name": "Zero", "symbol": "ZERO"},
+            "quoteToken": {"address": "So11111111111111111111111111111111111111112"},
+            "priceUsd": "0.5",
+            "liquidity": {"usd": 1000, "base": 10, "quote": 20},
+            "volume": {"h24": 50, "h6": 10},
+            "txns": {"h24": {"buys": 3, "sells": 2}, "h1": {"buys": 1, "sells": 0}},
+            "priceChange": {"h1": 1.5, "h24": 9.0},
+            "dexId": "raydium",
+            "info": {"imageUrl": "https://example.com/x.png"}
+        }
+    ]}).encode()
+
+    client = DexScreenerClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body)))
+
+    with patch('app.services.dex_clients.cache_manager.get', new_callable=AsyncMock, return_value=None), \
+         patch('app.services.dex_clients.cache_manager.set', new_callable=AsyncMock) as mock_set:
+        pairs = [pair async for pair in client.stream_search("solana trending")]
+
+    assert pairs == [{
+        "baseToken": {"address": "addr0", "name": "Zero", "symbol": "ZERO"},
+        "liquidity": {"usd": 1000},
+        "volume": {"h24": 50},
+        "txns": {"h24": {"buys": 3, "sells": 2}},
+        "priceChange": {"h1": 1.5},
+        "priceUsd": "0.5",
+        "dexId": "raydium"
+    }]
+    assert mock_set.await_args[0][1] == {"pairs": pairs}
+    await client.client.aclose()
@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from unittest.mock import patch
+from app.config import settings
+from app.core.http import HttpPool, InstrumentedTransport
+
+def make_transport():
+    return InstrumentedTransport(max_connections=4, limits=httpx.Limits(max_connections=4))
+
+@pytest.mark.asyncio
+async def test_request_in_flight_until_body_is_closed():
+    """Test that a streamed response holds its pool slot until the body is closed"""
+    transport = make_transport()
+
+    async def upstream(self, request):
+        await request.extensions["trace"]("connection.connect_tcp.complete", {})
+        await request.extensions["trace"]("connection.start_tls.complete", {})
+        return httpx.Response(200, stream=httpx.ByteStream(b'{"pairs": []}'))
+
+    with patch.object(httpx.AsyncHTTPTransport, "handle_async_request", upstream):
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://api.dexscreener.com/latest/dex/search") as response:
+                assert transport.in_flight == 1
+                assert await response.aread() == b'{"pairs": []}'
+            assert transport.in_flight == 0
+
+    stats = transport.get_stats()
+    assert stats["requests"] == 1
+    assert stats["peak_in_flight"] == 1
+    assert stats["tls_handshakes"] == 1
+    assert stats["saturation"] == 0
+
+@pytest.mark.asyncio
+async def test_pool_timeouts_are_counted():
+    """Test that waiting too long for a connection shows up in the stats"""
+    transport = make_transport()
+
+    async def saturated(self, request):
+        raise httpx.PoolTimeout("no free connection", request=request)
+
+    with patch.object(httpx.AsyncHTTPTransport, "handle_async_request", saturated):
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.PoolTimeout):
+                await client.get("https://price.jup.ag/v4/price")
+
+    assert transport.get_stats()["pool_timeouts"] == 1
+    assert transport.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_pool_has_one_client_per_host_and_reopens():
+    """Test per-host clients with split timeouts, recreated after the lifespan closes them"""
+    pool = HttpPool()
+    dexscreener = pool.client("dexscreener")
+
+    assert pool.client("dexscreener") is dexscreener
+    assert pool.client("jupiter") is not dexscreener
+    assert dexscreener.timeout == httpx.Timeout(
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+        read=settings.HTTP_READ_TIMEOUT,
+        write=settings.HTTP_WRITE_TIMEOUT,
+        pool=settings.HTTP_POOL_TIMEOUT
+    )
+
+    await pool.close()
+    assert dexscreener.is_closed
+    assert pool.client("dexscreener") is not dexscreener
+    assert pool.get_stats("dexscreener")["requests"] == 0
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_pool_client_sends_configured_headers():
+    """Test that per-host headers such as API keys are set on the pooled client"""
+    pool = HttpPool()
+    birdeye = pool.client("birdeye", {"X-API-KEY": "key"})
+
+    assert birdeye.headers["X-API-KEY"] == "key"
+    assert "X-API-KEY" not in pool.client("dexscreener").headers
+    await pool.close()
@@ -0,0 +1,56 @@
+import json
+import pytest
+from app.utils.json_stream import ArrayItemScanner, iter_array_items, aiter_array_items
+
+BODY = json.dumps({
+    "schemaVersion": "1.0.0",
+    "meta": {"pairs": [{"decoy": True}]},
+    "label": "pairs",
+    "pairs": [
+        {"baseToken": {"address": "a", "name": "Quote \" and } brace"}, "labels": ["v2", "[x]"]},
+        {"baseToken": {"address": "b", "name": "Back\\\\slash {"}, "txns": {"h24": {"buys": 1}}},
+        {"baseToken": {"address": "c", "name": "éè"}}
+    ],
+    "trailing": [{"ignored": True}]
+}).encode("utf-8")
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(BODY)])
+def test_items_survive_any_chunking(size):
+    """Test that objects are cut out correctly wherever chunk boundaries fall"""
+    items = list(iter_array_items(chunked(BODY, size), "pairs"))
+
+    assert [item["baseToken"]["address"] for item in items] == ["a", "b", "c"]
+    assert items[0]["baseToken"]["name"] == 'Quote " and } brace'
+    assert items[1]["baseToken"]["name"] == "Back\\\\slash {"
+    assert items[2]["baseToken"]["name"] == "éè"
+
+def test_scanner_stops_after_array_and_stays_small():
+    """Test that consumed bytes are dropped and the rest of the body is ignored"""
+    scanner = ArrayItemScanner("pairs")
+    largest = 0
+    for chunk in chunked(BODY, 16):
+        scanner.feed(chunk)
+        largest = max(largest, len(scanner.text))
+        if scanner.done:
+            break
+
+    assert scanner.done
+    assert largest < len(BODY) / 2
+
+def test_missing_or_null_array_yields_nothing():
+    """Test bodies without the array, as DexScreener returns for no results"""
+    assert list(iter_array_items([b'{"schemaVersion": "1.0.0", "pairs": null}'], "pairs")) == []
+    assert list(iter_array_items([b'{"pairs": []}'], "pairs")) == []
+
+@pytest.mark.asyncio
+async def test_async_items():
+    """Test the async variant used on httpx byte streams"""
+    async def chunks():
+        for chunk in chunked(BODY, 5):
+            yield chunk
+
+    items = [item async for item in aiter_array_items(chunks(), "pairs")]
+    assert len(items) == 3
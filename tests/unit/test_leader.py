@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.leader import LeaderElection
+
+def make_election(ttl=15.0):
+    events = []
+    async def elected():
+        events.append("elected")
+    async def demoted():
+        events.append("demoted")
+    return LeaderElection(elected, demoted, ttl=ttl), events
+
+@pytest.mark.asyncio
+async def test_acquires_lease_and_renews():
+    """Test that the first instance to set the key leads and then renews"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(side_effect=[4, 1])
+
+    await election._step()
+    assert election.is_leader and events == ["elected"]
+    assert election.fencing_token == 4
+    assert election.redis.eval.await_args[0][1:5] == (2, "aggregator:leader", "aggregator:leader:epoch", election.instance_id)
+
+    await election._step()
+    assert election.redis.eval.await_args[0][1:3] == (1, "aggregator:leader")
+    assert events == ["elected"]
+
+@pytest.mark.asyncio
+async def test_follower_when_lease_is_held():
+    """Test that an instance stays a follower while another holds the lease"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(return_value=0)
+    election.redis.get = AsyncMock(return_value=b"other")
+
+    await election._step()
+    assert not election.is_leader
+    assert election.leader == "other"
+    assert events == []
+
+@pytest.mark.asyncio
+async def test_demotes_when_renewal_fails():
+    """Test that a leader steps down once it no longer holds the lease"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(side_effect=[1, 0])
+    election.redis.get = AsyncMock(return_value=b"other")
+
+    await election._step()
+    await election._step()
+    assert not election.is_leader
+    assert events == ["elected", "demoted"]
+
+@pytest.mark.asyncio
+async def test_runs_standalone_without_redis():
+    """Test that an instance that never reaches Redis leads on its own"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(side_effect=ConnectionError("refused"))
+
+    await election._step()
+    assert election.is_leader and election.standalone
+    assert events == ["elected"]
+
+@pytest.mark.asyncio
+async def test_failover_is_measured():
+    """Test that taking over from another leader records the failover time"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(side_effect=[0, 2])
+    election.redis.get = AsyncMock(return_value=b"other")
+
+    await election._step()
+    await election._step()
+    stats = election.get_stats()
+    assert stats["is_leader"] and stats["leader"] == election.instance_id
+    assert stats["fencing_token"] == 2
+    assert stats["last_failover_seconds"] >= 0
+
+@pytest.mark.asyncio
+async def test_stale_fencing_token_steps_down():
+    """Test that a write rejected for a stale token demotes the old leader"""
+    election, events = make_election()
+    election.redis = MagicMock()
+    election.redis.eval = AsyncMock(side_effect=[1, 0])
+
+    await election._step()
+    assert not await election.fenced_set("aggregator:snapshot", "{}", ttl=60)
+    assert election.redis.eval.await_args[0][1:5] == (2, "aggregator:leader:epoch", "aggregator:snapshot", 1)
+    assert events == ["elected", "demoted"]
+    assert election.get_stats()["fenced_writes_rejected"] == 1
@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.middleware import RateLimitMiddleware
+
+def make_client(calls: int = 3, period: int = 60, max_clients: int = 100) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, calls=calls, period=period, max_clients=max_clients)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_requests_within_limit_pass():
+    """Test that requests up to the limit are served"""
+    client = make_client(calls=3)
+    for _ in range(3):
+        assert client.get("/ping").status_code == 200
+
+def test_requests_over_limit_get_429():
+    """Test that exceeding the limit returns 429 with Retry-After"""
+    client = make_client(calls=2, period=60)
+    client.get("/ping")
+    client.get("/ping")
+
+    response = client.get("/ping")
+
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_gcra_refills_over_time():
+    """Test that a client regains one request per emission interval"""
+    limiter = RateLimitMiddleware(app=None, calls=2, period=10)
+
+    assert limiter._check_local("1.1.1.1", 0.0)[0]
+    assert limiter._check_local("1.1.1.1", 0.0)[0]
+    allowed, retry_after = limiter._check_local("1.1.1.1", 0.0)
+    assert not allowed
+    assert retry_after == pytest.approx(5.0)
+    assert limiter._check_local("1.1.1.1", 5.0)[0]
+
+def test_idle_clients_evicted():
+    """Test that memory stays bounded under many distinct client IPs"""
+    limiter = RateLimitMiddleware(app=None, calls=10, period=60, max_clients=100)
+
+    for i in range(1000):
+        limiter._check_local(f"10.0.{i // 256}.{i % 256}", float(i))
+
+    assert len(limiter.requests) == 100
+    assert "10.0.3.231" in limiter.requests
+    assert "10.0.0.0" not in limiter.requests
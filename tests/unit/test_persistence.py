@@ -0,0 +1,47 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app.services.persistence import TokenRepository
+
+def mock_session_factory():
+    session = MagicMock()
+    session.execute = AsyncMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    session.begin.return_value.__aenter__ = AsyncMock()
+    session.begin.return_value.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=session), session
+
+def test_upsert_statement_uses_on_conflict(make_token):
+    """Test that the batch becomes a single INSERT ... ON CONFLICT DO UPDATE"""
+    rows = [TokenRepository.to_row(make_token(f"addr{i}")) for i in range(3)]
+
+    sql = str(TokenRepository.upsert_statement(rows).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO tokens") == 1
+    assert "ON CONFLICT (token_address) DO UPDATE SET" in sql
+    assert "price_sol = excluded.price_sol" in sql
+    assert "token_address = excluded" not in sql
+
+@pytest.mark.asyncio
+async def test_upsert_tokens_batches_in_one_transaction(make_token):
+    """Test that large cycles are chunked under the bind parameter limit"""
+    factory, session = mock_session_factory()
+    repository = TokenRepository(session_factory=factory, db_engine=MagicMock())
+
+    with patch('app.services.persistence.settings.DB_UPSERT_BATCH', 2), \
+         patch('app.services.persistence.settings.DB_COPY_THRESHOLD', 100):
+        written = await repository.upsert_tokens([make_token(f"addr{i}") for i in range(5)])
+
+    assert written == 5
+    assert session.execute.call_count == 3
+    session.begin.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_upsert_tokens_skips_empty_batches():
+    """Test that nothing is written when no token changed"""
+    factory, session = mock_session_factory()
+    repository = TokenRepository(session_factory=factory, db_engine=MagicMock())
+
+    assert await repository.upsert_tokens([]) == 0
+    factory.assert_not_called()
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app.services.price_history import PriceHistoryService, ROLLUP_SQL, bucket_floor
+
+def mock_session_factory(result=None):
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=result)
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    session.begin.return_value.__aenter__ = AsyncMock()
+    session.begin.return_value.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=session), session
+
+def test_bucket_floor():
+    """Test that timestamps are floored to the start of their interval"""
+    moment = datetime(2024, 5, 1, 12, 7, 42)
+
+    assert bucket_floor(moment, 60) == datetime(2024, 5, 1, 12, 7)
+    assert bucket_floor(moment, 300) == datetime(2024, 5, 1, 12, 5)
+    assert bucket_floor(moment, 3600) == datetime(2024, 5, 1, 12, 0)
+
+def test_bucket_floor_converts_aware_timestamps():
+    """Test that aware timestamps are floored in UTC"""
+    moment = datetime(2024, 5, 1, 14, 7, 42, tzinfo=timezone(timedelta(hours=2)))
+
+    assert bucket_floor(moment, 300) == datetime(2024, 5, 1, 12, 5)
+
+def test_rollup_sql_is_idempotent():
+    """Test that re-running a rollup overwrites candles instead of duplicating them"""
+    sql = str(ROLLUP_SQL)
+
+    assert "ON CONFLICT (token_address, interval, bucket_start) DO UPDATE" in sql
+    assert "WHERE recorded_at >= :since" in sql
+
+@pytest.mark.asyncio
+async def test_record_inserts_samples_in_batches(make_token):
+    """Test that samples are appended in chunks inside one transaction"""
+    factory, session = mock_session_factory()
+    service = PriceHistoryService(session_factory=factory)
+
+    with patch('app.services.price_history.settings.DB_UPSERT_BATCH', 2):
+        written = await service.record([make_token(f"addr{i}") for i in range(3)])
+
+    assert written == 3
+    assert session.execute.call_count == 2
+    session.begin.assert_called_once()
+    sql = str(session.execute.call_args_list[0][0][0].compile(dialect=postgresql.dialect()))
+    assert "INSERT INTO token_price_history" in sql
+    assert "ON CONFLICT DO NOTHING" in sql
+
+@pytest.mark.asyncio
+async def test_rollup_covers_every_interval():
+    """Test that one rollup pass refreshes 1m, 5m and 1h candles and prunes old samples"""
+    factory, session = mock_session_factory()
+    service = PriceHistoryService(session_factory=factory)
+
+    await service.rollup(now=datetime(2024, 5, 1, 12, 7, 42))
+
+    params = [c[0][1] for c in session.execute.call_args_list if c[0][0] is ROLLUP_SQL]
+    assert [p["interval"] for p in params] == ["1m", "5m", "1h"]
+    assert params[0]["since"] == datetime(2024, 5, 1, 12, 6)
+    assert params[2]["since"] == datetime(2024, 5, 1, 11, 0)
+    assert session.execute.call_count == 4
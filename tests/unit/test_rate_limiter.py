@@ -0,0 +1,85 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.utils.rate_limiter import TokenBucket, PRIORITY_REFRESH, PRIORITY_DETAIL, RELEASE_SCRIPT, parse_retry_after
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_throttles():
+    """Test that calls beyond the burst wait for tokens to refill"""
+    bucket = TokenBucket("test", rate=100, per=1, burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.01
+
+    await bucket.acquire()
+    assert time.monotonic() - start >= 0.009
+    assert bucket.stats["acquired"] == 6
+    assert bucket.stats["queued"] == 1
+
+@pytest.mark.asyncio
+async def test_refresh_priority_served_before_detail():
+    """Test that queued scheduler refreshes jump ahead of detail lookups"""
+    bucket = TokenBucket("test", rate=50, per=1, burst=1)
+    await bucket.acquire()
+    order = []
+
+    async def call(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(call("detail-1", PRIORITY_DETAIL))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call("detail-2", PRIORITY_DETAIL)))
+    tasks.append(asyncio.create_task(call("refresh", PRIORITY_REFRESH)))
+    await asyncio.gather(*tasks)
+
+    assert order == ["refresh", "detail-1", "detail-2"]
+
+@pytest.mark.asyncio
+async def test_penalize_honours_retry_after():
+    """Test that a 429 Retry-After blocks the bucket for that long"""
+    bucket = TokenBucket("test", rate=1000, per=1, burst=10)
+    bucket.penalize(0.05)
+
+    start = time.monotonic()
+    await bucket.acquire()
+
+    assert time.monotonic() - start >= 0.045
+    assert bucket.stats["throttled"] == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_skipped():
+    """Test that a caller cancelled while queued doesn't consume a token"""
+    bucket = TokenBucket("test", rate=100, per=1, burst=1)
+    await bucket.acquire()
+
+    cancelled = asyncio.create_task(bucket.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(bucket.acquire(), timeout=1)
+    assert bucket.queue_depth == 0
+
+@pytest.mark.asyncio
+async def test_shared_bucket_returns_unused_token_to_redis():
+    """Test that a shared bucket gives tokens back in Redis, leaving the local fallback alone"""
+    bucket = TokenBucket("test", rate=100, per=1, burst=5, shared=True)
+    bucket.tokens = 2.0
+    redis = MagicMock()
+    redis.eval = AsyncMock(return_value=0)
+
+    with patch('app.utils.rate_limiter.cache_manager.redis', redis):
+        await bucket._release()
+
+    redis.eval.assert_awaited_once_with(RELEASE_SCRIPT, 1, "ratelimit:test", 5)
+    assert bucket.tokens == 2.0
+
+def test_parse_retry_after():
+    """Test Retry-After parsing for seconds, dates and garbage"""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,62 @@
+import pytest
+from app.services.refresh_scheduler import RefreshScheduler
+
+def no_interest(address):
+    return 0
+
+def test_hot_tokens_refresh_more_often(make_token):
+    """Test that volatility, volume and interest each shorten a token's interval"""
+    scheduler = RefreshScheduler(min_interval=1, max_interval=1000)
+    tokens = [make_token("dead"), make_token("volatile", price_1hr_change=40), make_token("traded", volume_sol=1e6), make_token("watched")]
+    scheduler.plan(tokens, lambda a: 5 if a == "watched" else 0, now=0)
+
+    intervals = scheduler.intervals
+    assert intervals["volatile"] < intervals["dead"]
+    assert intervals["traded"] < intervals["dead"]
+    assert intervals["watched"] < intervals["dead"]
+
+def test_total_refresh_rate_matches_fixed_cycle(make_token):
+    """Test that hot tokens borrow rate from dead ones rather than adding to it"""
+    scheduler = RefreshScheduler(base_interval=30, min_interval=0.1, max_interval=10_000)
+    tokens = [make_token(f"t{i}", price_1hr_change=i * 3) for i in range(50)]
+    scheduler.plan(tokens, no_interest, now=0)
+
+    rate = sum(1 / interval for interval in scheduler.intervals.values())
+    assert rate == pytest.approx(50 / 30)
+
+def test_call_budget_caps_the_rate(make_token):
+    """Test that intervals stretch when the universe outgrows the call budget"""
+    scheduler = RefreshScheduler(base_interval=30, min_interval=0.1, max_interval=10_000, batch_size=10, calls_per_minute=6)
+    scheduler.plan([make_token(f"t{i}") for i in range(100)], no_interest, now=0)
+
+    # 6 calls of 10 ids a minute is one refresh per second in total
+    rate = sum(1 / interval for interval in scheduler.intervals.values())
+    assert rate == pytest.approx(1.0)
+
+def test_take_due_batches_within_budget(make_token):
+    """Test that due tokens are batched, topped up, and deferred once the budget is spent"""
+    scheduler = RefreshScheduler(base_interval=10, min_interval=1, max_interval=100, batch_size=4, calls_per_minute=6)
+    scheduler.plan([make_token(f"t{i}", price_1hr_change=i) for i in range(6)], no_interest, now=0)
+
+    assert scheduler.take_due(now=0) == []
+    batch = scheduler.take_due(now=scheduler.intervals["t5"])
+    # Most overdue first, and the call is topped up with the tokens due next
+    assert batch == ["t5", "t4", "t3", "t2"]
+
+    # t1 is due, but the one call per ten seconds is spent
+    now = scheduler.intervals["t1"] + 0.5
+    assert scheduler.take_due(now=now) == []
+    assert scheduler.stats["deferred"] == 1
+
+    scheduler.completed(batch, now=now)
+    assert scheduler.take_due(now=30)[:2] == ["t1", "t0"]
+    assert scheduler.stats["calls"] == 2
+
+def test_dropped_tokens_are_forgotten(make_token):
+    """Test that tokens leaving the universe are no longer scheduled"""
+    scheduler = RefreshScheduler(min_interval=1)
+    scheduler.plan([make_token("a"), make_token("b")], no_interest, now=0)
+    scheduler.plan([make_token("a")], no_interest, now=0)
+
+    assert set(scheduler.intervals) == {"a"}
+    assert scheduler.take_due(now=10_000) == ["a"]
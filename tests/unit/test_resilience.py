@@ -0,0 +1,152 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.utils.resilience import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, UpstreamGuard,
+    full_jitter, is_retryable, CLOSED, OPEN, HALF_OPEN
+)
+
+def status_error(status):
+    request = httpx.Request("GET", "https://api.dexscreener.com/latest/dex/search")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+def make_guard(**kwargs):
+    kwargs.setdefault("base_delay", 0)
+    return UpstreamGuard("test", **kwargs)
+
+def test_retry_classification():
+    """Test that only errors another attempt could fix are retried"""
+    assert is_retryable(status_error(503))
+    assert is_retryable(status_error(429))
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert is_retryable(Exception("unknown"))
+    assert not is_retryable(status_error(404))
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(CircuitOpenError("open"))
+
+def test_full_jitter_stays_within_cap():
+    """Test that backoff delays are spread over [0, cap]"""
+    delays = [full_jitter(5, 1.0, 10.0) for _ in range(200)]
+    assert all(0 <= d <= 10.0 for d in delays)
+    assert len(set(delays)) > 100
+
+def test_breaker_opens_then_probes():
+    """Test closed -> open -> half-open -> closed"""
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=30)
+    with patch("app.utils.resilience.time.monotonic", return_value=100):
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+    with patch("app.utils.resilience.time.monotonic", return_value=131):
+        breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # Only one probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+    assert breaker.get_stats()["rejected"] == 2
+
+def test_failed_probe_reopens():
+    """Test that a failing half-open probe opens the circuit again"""
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=0)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+def test_retry_budget_is_bounded():
+    """Test that retries stop once the budget is spent"""
+    budget = RetryBudget(ratio=0.25, min_per_second=0, capacity=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    for _ in range(4):
+        budget.deposit()
+    assert budget.withdraw()
+    assert budget.stats == {"retries": 3, "exhausted": 1}
+
+@pytest.mark.asyncio
+async def test_guard_does_not_retry_client_errors():
+    """Test that a 404 is raised at once and doesn't count against the upstream"""
+    guard = make_guard()
+    fn = AsyncMock(side_effect=status_error(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        await guard.call(fn)
+    assert fn.call_count == 1
+    assert guard.breaker.failures == 0
+
+@pytest.mark.asyncio
+async def test_guard_retries_server_errors_then_fails_fast():
+    """Test retries on 5xx, and that an open circuit stops calls reaching the upstream"""
+    guard = make_guard(max_retries=1, failure_threshold=2)
+    fn = AsyncMock(side_effect=[status_error(503), "ok"])
+    assert await guard.call(fn) == "ok"
+    assert fn.call_count == 2
+
+    fn = AsyncMock(side_effect=status_error(503))
+    with pytest.raises(httpx.HTTPStatusError):
+        await guard.call(fn)
+    assert guard.breaker.state == OPEN
+
+    fn.reset_mock()
+    with pytest.raises(CircuitOpenError):
+        await guard.call(fn)
+    fn.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_hedge_after_p95():
+    """Test that a slow detail call is hedged and the faster attempt wins"""
+    guard = make_guard(hedge_min_samples=5)
+    for _ in range(5):
+        guard.latency.record(0.01)
+
+    calls = 0
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+            return "slow"
+        return "fast"
+
+    assert await asyncio.wait_for(guard.call(fn, hedge=True), 1) == "fast"
+    assert guard.stats == {"hedged": 1, "hedge_wins": 1}
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_cancels_attempt_before_hedge():
+    """Test that a caller cancelled during the hedge delay doesn't leave its request running"""
+    guard = make_guard(hedge_min_samples=5)
+    for _ in range(5):
+        guard.latency.record(1.0)
+
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+    async def fn():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    call = asyncio.ensure_future(guard.call(fn, hedge=True))
+    await started.wait()
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_latency_history():
+    """Test that hedging waits for enough samples to know the p95"""
+    guard = make_guard()
+    fn = AsyncMock(return_value="ok")
+    assert await guard.call(fn, hedge=True) == "ok"
+    assert fn.call_count == 1
+    assert guard.stats["hedged"] == 0
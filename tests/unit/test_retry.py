@@ -49,4 +49,18 @@ async def test_retry_all_attempts_fail():
         await decorated_func()
     
     # Verify function was called exactly three times (initial + 2 retries)
-    assert mock_func.call_count == 3
\ No newline at end of file
+    assert mock_func.call_count == 3
+
+@pytest.mark.asyncio
+async def test_retry_skips_client_errors():
+    """Test that 4xx responses other than 429 are not retried"""
+    import httpx
+    request = httpx.Request("GET", "https://api.dexscreener.com/latest/dex/tokens/x")
+    error = httpx.HTTPStatusError("not found", request=request, response=httpx.Response(404, request=request))
+    mock_func = AsyncMock(side_effect=error)
+
+    decorated_func = retry(max_retries=3, base_delay=0.01)(mock_func)
+    with pytest.raises(httpx.HTTPStatusError):
+        await decorated_func()
+
+    assert mock_func.call_count == 1
@@ -0,0 +1,67 @@
+import pytest
+from app.services.search_index import SearchIndex, EXACT, TICKER_PREFIX, PREFIX_MATCH, SUBSTRING
+
+@pytest.fixture
+def tokens(make_token):
+    return {
+        t.token_address: t for t in [
+            make_token("PepeAddr1111", token_ticker="PEPE", token_name="Pepe", volume_sol=10),
+            make_token("PepeAddr2222", token_ticker="PEPE2", token_name="Pepe Two", volume_sol=50),
+            make_token("DogeAddr3333", token_ticker="BONK", token_name="Bonk Pepe Inu", volume_sol=90),
+            make_token("WifAddr44444", token_ticker="WIF", token_name="dogwifhat", volume_sol=70)
+        ]
+    }
+
+@pytest.fixture
+def index(tokens):
+    index = SearchIndex()
+    index.update(tokens.values())
+    return index
+
+def by_volume(tokens):
+    return lambda address: (-tokens[address].volume_sol, address) if address in tokens else None
+
+def test_exact_ticker_ranks_first(index, tokens):
+    """Test that an exact ticker match beats higher-volume partial matches"""
+    total, ranked = index.search("pepe", key=by_volume(tokens), limit=10)
+
+    assert total == 3
+    assert [r[-1] for r in ranked] == ["PepeAddr1111", "PepeAddr2222", "DogeAddr3333"]
+    assert [r[0] for r in ranked] == [EXACT, TICKER_PREFIX, PREFIX_MATCH]
+
+def test_substring_and_short_prefix_queries(index, tokens):
+    """Test trigram substring matches and word-prefix matches for short queries"""
+    _, ranked = index.search("wifh", key=by_volume(tokens), limit=10)
+    assert [(r[0], r[-1]) for r in ranked] == [(SUBSTRING, "WifAddr44444")]
+
+    _, ranked = index.search("in", key=by_volume(tokens), limit=10)
+    assert [r[-1] for r in ranked] == ["DogeAddr3333"]
+
+def test_address_prefix(index, tokens):
+    """Test that addresses match by case-insensitive prefix but not substring"""
+    _, ranked = index.search("pepeaddr", key=by_volume(tokens), limit=10)
+    assert [r[-1] for r in ranked] == ["PepeAddr2222", "PepeAddr1111"]
+
+    total, _ = index.search("addr", key=by_volume(tokens), limit=10)
+    assert total == 0
+
+def test_top_k_and_after(index, tokens):
+    """Test that results are limited and resume strictly after a rank key"""
+    total, first = index.search("pepe", key=by_volume(tokens), limit=2)
+    total_after, rest = index.search("pepe", key=by_volume(tokens), limit=2, after=first[-1])
+
+    assert total == total_after == 3
+    assert len(first) == 2
+    assert [r[-1] for r in rest] == ["DogeAddr3333"]
+
+def test_incremental_updates(index, tokens, make_token):
+    """Test that renamed and removed tokens leave no stale postings"""
+    index.add(make_token("WifAddr44444", token_ticker="CAT", token_name="catwifhat"))
+    index.update([], removed=["DogeAddr3333"])
+    del tokens["DogeAddr3333"]
+    tokens["WifAddr44444"] = make_token("WifAddr44444", token_ticker="CAT", token_name="catwifhat")
+
+    assert index.search("dogwif", key=by_volume(tokens), limit=10) == (0, [])
+    assert index.search("bonk", key=by_volume(tokens), limit=10) == (0, [])
+    assert index.search("catwif", key=by_volume(tokens), limit=10)[0] == 1
+    assert len(index) == 3
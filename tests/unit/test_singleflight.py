@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock
+from app.utils.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    """Test that concurrent calls with the same key share one execution"""
+    flights = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"price": 1.0}
+
+    waiters = [asyncio.create_task(flights.do("token:a", fetch)) for _ in range(50)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(r == {"price": 1.0} for r in results)
+    assert flights.stats == {"calls": 50, "executions": 1, "coalesced": 49}
+    assert flights.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    """Test that distinct keys are not coalesced"""
+    flights = SingleFlight()
+    fetch = AsyncMock(side_effect=["a", "b"])
+
+    results = await asyncio.gather(
+        flights.do("a", fetch),
+        flights.do("b", fetch)
+    )
+
+    assert sorted(results) == ["a", "b"]
+    assert fetch.call_count == 2
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    """Test that a failed call fails every waiter and is not remembered"""
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("upstream down")
+
+    waiters = [asyncio.create_task(flights.do("k", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert await flights.do("k", AsyncMock(return_value="ok")) == "ok"
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_others():
+    """Test that one caller going away leaves the shared call running"""
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flights.do("k", fetch))
+    second = asyncio.create_task(flights.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
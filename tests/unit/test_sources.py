@@ -0,0 +1,171 @@
+import pytest
+import asyncio
+import json
+import time
+import httpx
+from unittest.mock import patch, AsyncMock
+from app.services.dex_clients import GeckoTerminalClient, BirdeyeClient
+from app.services.sources import (
+    SOURCES, Quote, SourceFanIn, TokenSource, BirdeyeSource, GeckoTerminalSource,
+    create_sources, merge_quotes, reconcile, register_source
+)
+
+def mock_client(client, body, requests=None):
+    def handler(request):
+        if requests is not None:
+            requests.append(request)
+        return httpx.Response(200, content=json.dumps(body).encode())
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+@pytest.mark.asyncio
+async def test_geckoterminal_source_parses_trending_pools():
+    """Test that pools are folded per base token, keeping the deepest pool's numbers"""
+    body = {
+        "data": [
+            {
+                "id": "solana_pool1",
+                "type": "pool",
+                "attributes": {
+                    "name": "BONK / SOL",
+                    "base_token_price_usd": "0.00002",
+                    "fdv_usd": "1500000",
+                    "reserve_in_usd": "50000",
+                    "volume_usd": {"h24": "90000"},
+                    "transactions": {"h24": {"buys": 10, "sells": 5}},
+                    "price_change_percentage": {"h1": "2.5"}
+                },
+                "relationships": {
+                    "base_token": {"data": {"id": "solana_bonk", "type": "token"}},
+                    "dex": {"data": {"id": "raydium", "type": "dex"}}
+                }
+            },
+            {
+                "id": "solana_pool2",
+                "type": "pool",
+                "attributes": {
+                    "name": "BONK / USDC",
+                    "base_token_price_usd": "0.000021",
+                    "reserve_in_usd": "80000",
+                    "volume_usd": {"h24": "40000"},
+                    "transactions": {"h24": {"buys": 3, "sells": 2}}
+                },
+                "relationships": {
+                    "base_token": {"data": {"id": "solana_bonk", "type": "token"}},
+                    "dex": {"data": {"id": "orca", "type": "dex"}}
+                }
+            }
+        ],
+        "included": [
+            {"id": "solana_bonk", "type": "token", "attributes": {"address": "bonk", "name": "Bonk", "symbol": "BONK"}}
+        ]
+    }
+    requests = []
+    source = GeckoTerminalSource(mock_client(GeckoTerminalClient(), body, requests))
+
+    with patch('app.services.dex_clients.cache_manager.get', new_callable=AsyncMock, return_value=None), \
+         patch('app.services.dex_clients.cache_manager.set', new_callable=AsyncMock):
+        quotes = await source.fetch([])
+
+    assert requests[0].url.path == "/api/v2/networks/solana/trending_pools"
+    token = quotes["bonk"].token
+    assert (token.token_name, token.token_ticker, token.protocol) == ("Bonk", "BONK", "orca")
+    assert token.price_sol == 0.000021
+    assert token.liquidity_sol == 80000
+    assert token.transaction_count == 20
+    assert quotes["bonk"].volume == 40000
+    await source.client.client.aclose()
+
+@pytest.mark.asyncio
+async def test_birdeye_source_parses_trending_tokens():
+    """Test that Birdeye's trending list becomes quotes"""
+    body = {"success": True, "data": {"updateUnixTime": 1700000000, "tokens": [
+        {"address": "wif", "name": "dogwifhat", "symbol": "WIF", "price": 2.5, "liquidity": 3000000, "volume24hUSD": 9000000},
+        {"name": "no address"}
+    ]}}
+    requests = []
+    source = BirdeyeSource(mock_client(BirdeyeClient(api_key="key"), body, requests))
+
+    with patch('app.services.dex_clients.cache_manager.get', new_callable=AsyncMock, return_value=None), \
+         patch('app.services.dex_clients.cache_manager.set', new_callable=AsyncMock):
+        quotes = await source.fetch([])
+
+    assert requests[0].url.params["sort_by"] == "rank"
+    assert list(quotes) == ["wif"]
+    assert (quotes["wif"].price, quotes["wif"].liquidity, quotes["wif"].volume) == (2.5, 3000000, 9000000)
+    assert source.client.headers["X-API-KEY"] == "key"
+    await source.client.client.aclose()
+
+def test_registry_creates_configured_sources():
+    """Test that sources come from the registry, skipping unknown and unconfigured ones"""
+    @register_source("test_source")
+    class TestSource(TokenSource):
+        async def fetch(self, known):
+            return {}
+
+    try:
+        with patch('app.services.sources.settings.BIRDEYE_API_KEY', None):
+            sources = create_sources(["test_source", "birdeye", "nope"], {"test_source": "shared client"})
+        assert [source.name for source in sources] == ["test_source"]
+        assert sources[0].client == "shared client"
+    finally:
+        del SOURCES["test_source"]
+
+class SleepySource(TokenSource):
+    def __init__(self, name, delay, quotes=None, discovers=True):
+        self.name = name
+        self.delay = delay
+        self.quotes = quotes or {}
+        self.discovers = discovers
+        self.client = None
+
+    async def fetch(self, known):
+        await asyncio.sleep(self.delay)
+        return self.quotes
+
+@pytest.mark.asyncio
+async def test_fan_in_fetches_concurrently_within_deadlines(make_token):
+    """Test that sources run in parallel and a slow one is dropped at its deadline"""
+    fast = SleepySource("fast", 0.05, {"a": Quote.of(make_token("a"))})
+    also_fast = SleepySource("also_fast", 0.05, {"a": Quote(price=2.0)}, discovers=False)
+    slow = SleepySource("slow", 10)
+    fan_in = SourceFanIn([fast, also_fast, slow], {"slow": 0.1}, default_deadline=1.0)
+
+    start = time.monotonic()
+    results = await fan_in.fetch([])
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert set(results) == {"fast", "also_fast"}
+    assert fan_in.discovering == ["fast", "slow"]
+    stats = fan_in.get_stats()
+    assert stats["slow"]["timeouts"] == 1
+    assert stats["slow"]["deadline"] == 0.1
+    assert stats["fast"]["quotes"] == 1
+
+def test_reconcile_weights_values_and_ignores_outliers():
+    """Test that the merge is a weighted mean around the weighted median"""
+    assert reconcile([(1.0, 1.0), (2.0, 3.0)], max_deviation=5) == pytest.approx(1.75)
+    # A source quoting 1000x off doesn't move the result
+    assert reconcile([(1.0, 1.0), (1.2, 1.0), (1000.0, 0.5)], max_deviation=5) == pytest.approx(1.1)
+    assert reconcile([(None, 1.0), (3.0, 0.0)], max_deviation=5) is None
+
+def test_merge_quotes_takes_metadata_from_heaviest_source(make_token):
+    """Test that listing sources provide metadata and every source moves the numbers"""
+    results = {
+        "dexscreener": {"a": Quote.of(make_token("a", price_sol=1.0, liquidity_sol=100, token_name="Dex name"))},
+        "geckoterminal": {
+            "a": Quote.of(make_token("a", price_sol=2.0, liquidity_sol=300, token_name="Gecko name")),
+            "b": Quote.of(make_token("b"))
+        },
+        "jupiter": {"a": Quote(price=1.0), "unlisted": Quote(price=5.0)}
+    }
+    weights = {"dexscreener": 1.0, "geckoterminal": 0.5, "jupiter": 1.0}
+
+    merged = merge_quotes(results, weights)
+
+    assert set(merged) == {"a", "b"}
+    assert merged["a"].token_name == "Dex name"
+    assert merged["a"].price_sol == pytest.approx((1.0 + 1.0 + 2.0 * 0.5) / 2.5)
+    assert merged["a"].liquidity_sol == pytest.approx((100 + 300 * 0.5) / 1.5)
+    assert merged["b"].price_sol == 1.0
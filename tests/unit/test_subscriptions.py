@@ -0,0 +1,69 @@
+import pytest
+from app.services.subscriptions import TokenFilter, TokenSubscriptions
+from app.services.token_store import TokenStore, diff_snapshots
+
+def snapshot_of(tokens, version=1):
+    store = TokenStore()
+    store.replace(tokens)
+    return store.snapshot(version)
+
+def test_filter_from_message_validates():
+    """Test that filters are normalized and bad input is rejected"""
+    token_filter = TokenFilter.from_message({"protocol": "Orca", "top_n": 3, "min_liquidity": 50})
+
+    assert token_filter == TokenFilter(min_liquidity=50.0, protocol="orca", top_n=3)
+    with pytest.raises(ValueError):
+        TokenFilter.from_message({"top_n": 0})
+    with pytest.raises(ValueError):
+        TokenFilter.from_message({"sort_by": "name"})
+    with pytest.raises(ValueError):
+        TokenFilter.from_message({"max_price": 1})
+
+def test_filter_select_top_n_and_predicates(make_token):
+    """Test that selection walks the sorted ordering and stops at top_n"""
+    snapshot = snapshot_of([
+        make_token("a", volume_sol=300, liquidity_sol=10),
+        make_token("b", volume_sol=200, protocol="orca"),
+        make_token("c", volume_sol=100),
+        make_token("d", volume_sol=50)
+    ])
+
+    assert TokenFilter(top_n=2).select(snapshot) == {"a", "b"}
+    assert TokenFilter(min_liquidity=50, top_n=2).select(snapshot) == {"b", "c"}
+    assert TokenFilter(protocol="orca").select(snapshot) == {"b"}
+
+def test_inverted_index_tracks_interest(make_token):
+    """Test that watching and filtering link subscribers to addresses and unlink cleanly"""
+    subs = TokenSubscriptions()
+    snapshot = snapshot_of([make_token("a", volume_sol=300), make_token("b", volume_sol=200)])
+
+    subs.watch("ws1", ["a", "c"])
+    subs.set_filter("ws1", TokenFilter(top_n=1), snapshot)
+    subs.set_filter("ws2", TokenFilter(top_n=1), snapshot)
+    assert subs.subscribers["a"] == {"ws1", "ws2"}
+    assert len(subs.groups) == 1
+
+    # Still interested in "a" through the filter
+    subs.unwatch("ws1", ["a"])
+    assert subs.subscribers["a"] == {"ws1", "ws2"}
+
+    subs.remove("ws1")
+    subs.remove("ws2")
+    assert subs.subscribers == {}
+    assert not subs
+
+def test_route_only_reaches_interested_subscribers(make_token):
+    """Test that changes go to watchers and filter membership moves become added/removed"""
+    subs = TokenSubscriptions()
+    old = snapshot_of([make_token("a", volume_sol=300), make_token("b", volume_sol=200), make_token("c", volume_sol=100)])
+    subs.watch("watcher", ["c"])
+    subs.set_filter("top1", TokenFilter(top_n=1), old)
+    subs.watch("idle", ["zzz"])
+
+    new = snapshot_of([make_token("a", volume_sol=150), make_token("b", volume_sol=200), make_token("c", volume_sol=120)], 2)
+    routes = subs.route(diff_snapshots(old.tokens, new.tokens), new)
+
+    assert set(routes) == {"watcher", "top1"}
+    assert routes["watcher"] == {"added": [], "removed": [], "changed": ["c"]}
+    assert routes["top1"] == {"added": ["b"], "removed": ["a"], "changed": []}
+    assert subs.interest("top1") == {"b"}
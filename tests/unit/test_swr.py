@@ -0,0 +1,80 @@
+import pytest
+import asyncio
+from app.utils.swr import StaleWhileRevalidate
+
+def counting_refresh(value="new", release=None):
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+        if release is not None:
+            await release.wait()
+        return value
+
+    return refresh, calls
+
+@pytest.mark.asyncio
+async def test_fresh_value_is_served_without_refresh():
+    """Test that a value younger than the soft TTL is returned as is"""
+    swr = StaleWhileRevalidate("test", soft_ttl=10, hard_ttl=60)
+    refresh, calls = counting_refresh()
+
+    assert await swr.get("k", ("old", 3.0), refresh) == ("old", 3.0)
+    await asyncio.sleep(0)
+    assert calls == []
+    assert swr.stats["fresh"] == 1
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_and_refreshed_once_in_background():
+    """Test that stale reads return immediately and share one background refresh"""
+    swr = StaleWhileRevalidate("test", soft_ttl=10, hard_ttl=60)
+    release = asyncio.Event()
+    refresh, calls = counting_refresh(release=release)
+
+    results = [await swr.get("k", ("old", 20.0), refresh) for _ in range(5)]
+    assert results == [("old", 20.0)] * 5
+    await asyncio.sleep(0.01)
+    assert len(calls) == 1
+    assert swr.get_stats()["revalidating"] == 1
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert swr.stats["stale"] == 5
+    assert swr.stats["revalidations"] == 1
+    assert swr.get_stats()["revalidating"] == 0
+
+    # Once it finished, the next stale read may start another
+    await swr.get("k", ("old", 20.0), refresh)
+    await asyncio.sleep(0.01)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_expired_or_missing_value_blocks_on_one_refresh():
+    """Test that callers past the hard TTL wait, coalesced onto one refresh"""
+    swr = StaleWhileRevalidate("test", soft_ttl=10, hard_ttl=60)
+    release = asyncio.Event()
+    refresh, calls = counting_refresh(release=release)
+
+    waiters = [asyncio.create_task(swr.get("k", ("old", 90.0), refresh)) for _ in range(10)]
+    waiters.append(asyncio.create_task(swr.get("k", None, refresh)))
+    await asyncio.sleep(0)
+    assert not any(w.done() for w in waiters)
+
+    release.set()
+    results = await asyncio.gather(*waiters)
+    assert results == [("new", 0.0)] * 11
+    assert len(calls) == 1
+    assert swr.stats["blocked"] == 11
+
+@pytest.mark.asyncio
+async def test_failed_revalidation_keeps_serving_stale_value():
+    """Test that a background refresh error is counted and does not reach callers"""
+    swr = StaleWhileRevalidate("test", soft_ttl=10, hard_ttl=60)
+
+    async def refresh():
+        raise RuntimeError("upstream down")
+
+    assert await swr.get("k", ("old", 20.0), refresh) == ("old", 20.0)
+    await asyncio.sleep(0.01)
+    assert swr.stats["revalidation_errors"] == 1
+    assert await swr.get("k", ("old", 25.0), refresh) == ("old", 25.0)
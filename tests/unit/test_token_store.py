@@ -0,0 +1,94 @@
+import pytest
+from app.services.token_store import TokenStore, encode_cursor, decode_cursor, diff_snapshots
+
+@pytest.fixture
+def token_store():
+    return TokenStore()
+
+def test_indexes_sorted_descending(token_store, make_token):
+    """Test that each index yields tokens highest value first"""
+    token_store.replace([
+        make_token("a", volume_sol=10, market_cap_sol=300, price_1hr_change=-5),
+        make_token("b", volume_sol=30, market_cap_sol=100, price_1hr_change=20),
+        make_token("c", volume_sol=20, market_cap_sol=200, price_1hr_change=0),
+    ])
+
+    assert [t.token_address for t in token_store.range("volume_sol", 0, 10)] == ["b", "c", "a"]
+    assert [t.token_address for t in token_store.range("market_cap_sol", 0, 10)] == ["a", "c", "b"]
+    assert [t.token_address for t in token_store.range("price_1hr_change", 0, 10)] == ["b", "c", "a"]
+    assert [t.token_address for t in token_store.range("volume_sol", 1, 1)] == ["c"]
+
+def test_upsert_moves_token_in_index(token_store, make_token):
+    """Test that updating a sort field repositions only that token"""
+    token_store.replace([make_token("a", volume_sol=10), make_token("b", volume_sol=20)])
+
+    assert token_store.upsert(make_token("a", volume_sol=50)) is True
+    assert [t.token_address for t in token_store.range("volume_sol", 0, 10)] == ["a", "b"]
+    assert len(token_store.indexes["volume_sol"]) == 2
+
+def test_replace_reports_changes_and_removals(token_store, make_token):
+    """Test that replace only reports tokens whose data actually changed"""
+    token_store.replace([make_token("a", volume_sol=10), make_token("b", volume_sol=20)])
+
+    changed, removed = token_store.replace([make_token("a", volume_sol=10), make_token("c", volume_sol=5)])
+
+    assert [t.token_address for t in changed] == ["c"]
+    assert removed == ["b"]
+    assert "b" not in token_store
+    assert all(len(index) == 2 for index in token_store.indexes.values())
+
+def test_ties_broken_by_address(token_store, make_token):
+    """Test that equal sort values have a stable order"""
+    token_store.replace([make_token("b", volume_sol=10), make_token("a", volume_sol=10)])
+
+    assert [t.token_address for t in token_store.range("volume_sol", 0, 2)] == ["a", "b"]
+
+def test_snapshot_is_isolated_from_later_writes(token_store, make_token):
+    """Test that a published snapshot does not see subsequent store updates"""
+    token_store.replace([make_token("a", volume_sol=10), make_token("b", volume_sol=20)])
+    snapshot = token_store.snapshot(version=1)
+
+    token_store.upsert(make_token("a", volume_sol=99))
+    token_store.remove("b")
+
+    assert snapshot.version == 1
+    assert [t.token_address for t in snapshot.orderings["volume_sol"]] == ["b", "a"]
+    assert snapshot.tokens["a"].volume_sol == 10
+    with pytest.raises(TypeError):
+        snapshot.tokens["c"] = make_token("c")
+
+def test_cursor_round_trip():
+    """Test that keyset cursors are opaque and decode to what was encoded"""
+    cursor = encode_cursor("volume_sol", (-1234.5, "addr1"), 7)
+
+    assert "addr1" not in cursor
+    assert decode_cursor(cursor) == ("volume_sol", (-1234.5, "addr1"), 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_snapshot_seek(token_store, make_token):
+    """Test that seeking resumes strictly after the cursor key"""
+    token_store.replace([make_token(a, volume_sol=v) for a, v in [("a", 30), ("b", 20), ("c", 10)]])
+    snapshot = token_store.snapshot(version=1)
+
+    assert snapshot.seek("volume_sol", None) == 0
+    assert snapshot.seek("volume_sol", (-20.0, "b")) == 2
+    # A key that no longer exists still lands at the right place
+    assert snapshot.seek("volume_sol", (-25.0, "zzz")) == 1
+
+def test_diff_snapshots_reports_only_changed_fields(token_store, make_token):
+    """Test that diffs carry added tokens, removed addresses and changed fields only"""
+    token_store.replace([make_token("a", volume_sol=10), make_token("b", volume_sol=20)])
+    old = token_store.snapshot(1)
+    token_store.replace([make_token("a", volume_sol=10), make_token("b", volume_sol=25), make_token("c", volume_sol=5)])
+    token_store.remove("a")
+    new = token_store.snapshot(2)
+
+    diff = diff_snapshots(old.tokens, new.tokens)
+
+    assert [t.token_address for t in diff.added] == ["c"]
+    assert diff.removed == ["a"]
+    assert set(diff.changed) == {"b"}
+    assert set(diff.changed["b"]) == {"volume_sol", "last_updated"}
+    assert diff.changed["b"]["volume_sol"] == 25
+    assert not diff_snapshots(new.tokens, new.tokens)
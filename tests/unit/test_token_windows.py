@@ -0,0 +1,75 @@
+import pytest
+from app.services.token_windows import RollingWindow, TokenWindows, project
+
+def test_rolling_window_expires_old_buckets():
+    """Test that running totals drop buckets once they leave the span"""
+    ring = RollingWindow(span=300, bucket_seconds=60)
+
+    ring.add(0, volume=10, txns=1, price=1.0)
+    ring.add(60, volume=20, txns=2, price=2.0)
+    assert ring.stats().volume_sol == 30
+    assert ring.stats().transaction_count == 3
+    assert ring.stats().price_change == 100.0
+
+    # Five buckets later the first one has aged out; the oldest remaining
+    # bucket opened at the price carried over from before it
+    ring.add(300, volume=5, txns=1, price=3.0)
+    assert ring.stats().volume_sol == 25
+    assert ring.stats().price_change == pytest.approx(200.0)
+
+def test_rolling_window_survives_long_gaps():
+    """Test that a gap longer than the span clears the totals but keeps the last price"""
+    ring = RollingWindow(span=300, bucket_seconds=60)
+
+    ring.add(0, volume=10, txns=1, price=1.0)
+    ring.add(10_000, volume=4, txns=1, price=2.0)
+
+    assert ring.stats().volume_sol == 4
+    assert ring.stats().price_change == 100.0
+
+def test_first_observation_seeds_share_of_24h_counters(make_token):
+    """Test that a new token starts with its proportional share of upstream volume"""
+    windows = TokenWindows()
+    windows.observe([make_token("a", volume_sol=2400.0, transaction_count=240)], now=0)
+
+    assert windows.stats("a", "1h").volume_sol == pytest.approx(100.0)
+    assert windows.stats("a", "1h").transaction_count == 10
+    assert windows.stats("a", "7d").volume_sol == pytest.approx(2400.0)
+
+def test_observe_accumulates_estimated_activity(make_token):
+    """Test that counter growth between ticks is added to every window"""
+    windows = TokenWindows()
+    windows.observe([make_token("a", volume_sol=2400.0, transaction_count=240)], now=0)
+    windows.observe([make_token("a", price_sol=1.5, volume_sol=2500.0, transaction_count=250)], now=30)
+
+    stats = windows.stats("a", "1h")
+    # 100 seeded + 100 growth + the ~0.8 that aged out of the 24h counter
+    assert stats.volume_sol == pytest.approx(200.83, rel=1e-3)
+    assert stats.price_change == pytest.approx(50.0)
+
+def test_snapshot_uses_upstream_24h_counters(make_token):
+    """Test that the 24h window reports upstream volume with a local price change"""
+    windows = TokenWindows()
+    windows.observe([make_token("a", volume_sol=2400.0, transaction_count=240)], now=0)
+    token = make_token("a", price_sol=2.0, volume_sol=9000.0, transaction_count=240)
+    windows.observe([token], now=30)
+
+    stats = windows.snapshot({"a": token})["24h"]["a"]
+
+    assert stats.volume_sol == 9000.0
+    assert stats.price_change == 100.0
+
+def test_forget_and_project(make_token):
+    """Test that removed tokens are dropped and projection leaves others untouched"""
+    windows = TokenWindows()
+    token = make_token("a", volume_sol=2400.0, transaction_count=240)
+    windows.observe([token], now=0)
+
+    projected = project(token, windows.stats("a", "1h"))
+    assert projected.volume_sol == pytest.approx(100.0)
+    assert projected.price_change == 0.0
+    assert token.volume_sol == 2400.0
+
+    windows.forget(["a"])
+    assert "a" not in windows
+    assert project(token, windows.stats("a", "1h")) is token
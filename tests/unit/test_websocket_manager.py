@@ -1,8 +1,9 @@
 import pytest
 import json
+import asyncio
 from unittest.mock import AsyncMock, patch
 from app.services.websocket import WebSocketManager
-from app.models.token import TokenData, WebSocketMessage
+from app.models.token import WebSocketMessage
 
 @pytest.fixture
 def websocket_manager():
@@ -77,4 +78,180 @@ async def test_broadcast_message(websocket_manager):
     
     # Verify both websockets received the message
     assert websocket1.send_text.called
-    assert websocket2.send_text.called
\ No newline at end of file
+    assert websocket2.send_text.called
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_once():
+    """Test that every subscriber receives the same pre-serialized payload"""
+    manager = WebSocketManager()
+    sockets = [AsyncMock() for _ in range(3)]
+    for ws in sockets:
+        await manager.connect(ws)
+        manager.subscribe(ws, "tokens")
+
+    with patch("app.services.websocket.json.dumps", wraps=json.dumps) as mock_dumps:
+        await manager.broadcast_to_topic("tokens", {"type": "update", "data": {"price": 1}})
+
+    assert mock_dumps.call_count == 1
+    payloads = {ws.send_text.call_args[0][0] for ws in sockets}
+    assert len(payloads) == 1
+
+    for ws in sockets:
+        manager.disconnect(ws)
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_block_others():
+    """Test that a stalled socket neither delays nor grows without bound"""
+    manager = WebSocketManager(max_queue_size=2, slow_consumer_policy="drop_oldest")
+    stalled = asyncio.Event()
+
+    async def stall(payload):
+        await stalled.wait()
+
+    slow_ws = AsyncMock()
+    slow_ws.send_text.side_effect = stall
+    fast_ws = AsyncMock()
+
+    for ws in (slow_ws, fast_ws):
+        await manager.connect(ws)
+        manager.subscribe(ws, "tokens")
+
+    for i in range(5):
+        await manager.broadcast_to_topic("tokens", {"seq": i})
+        await asyncio.sleep(0)
+
+    assert fast_ws.send_text.call_count == 5
+    assert len(manager.writers[slow_ws].queue) <= 2
+    assert manager.get_stats()["messages_dropped"] > 0
+
+    stalled.set()
+    for ws in (slow_ws, fast_ws):
+        manager.disconnect(ws)
+
+@pytest.mark.asyncio
+async def test_slow_consumer_coalesce_policy():
+    """Test that queued messages for the same topic are replaced by newer ones"""
+    manager = WebSocketManager(max_queue_size=8, slow_consumer_policy="coalesce")
+    stalled = asyncio.Event()
+
+    async def stall(payload):
+        await stalled.wait()
+
+    ws = AsyncMock()
+    ws.send_text.side_effect = stall
+    await manager.connect(ws)
+    manager.subscribe(ws, "prices")
+
+    for i in range(4):
+        await manager.broadcast_to_topic("prices", {"seq": i})
+
+    queued = [json.loads(payload) for _, payload in manager.writers[ws].queue]
+    assert queued == [{"seq": 3}]
+
+    stalled.set()
+    manager.disconnect(ws)
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_keeps_every_token_delta():
+    """Test that sequenced deltas are never replaced, so a slow client sees no gap"""
+    manager = WebSocketManager(max_queue_size=8, slow_consumer_policy="coalesce")
+    stalled = asyncio.Event()
+
+    async def stall(payload):
+        await stalled.wait()
+
+    ws = AsyncMock()
+    ws.send_text.side_effect = stall
+    await manager.connect(ws)
+    manager.subscribe(ws, "tokens")
+
+    for i in range(4):
+        await manager.broadcast_to_topic("tokens", {"type": "token_delta", "data": {"seq": i}})
+
+    queued = [json.loads(payload)["data"]["seq"] for _, payload in manager.writers[ws].queue]
+    assert queued == [1, 2, 3]
+
+    stalled.set()
+    manager.disconnect(ws)
+
+@pytest.mark.asyncio
+async def test_slow_consumer_disconnect_policy():
+    """Test that a consumer overflowing its queue is disconnected"""
+    manager = WebSocketManager(max_queue_size=1, slow_consumer_policy="disconnect")
+    stalled = asyncio.Event()
+
+    async def stall(payload):
+        await stalled.wait()
+
+    ws = AsyncMock()
+    ws.send_text.side_effect = stall
+    await manager.connect(ws)
+    manager.subscribe(ws, "tokens")
+
+    for i in range(4):
+        await manager.broadcast_to_topic("tokens", {"seq": i})
+
+    assert ws not in manager.active_connections
+    assert ws not in manager.subscriptions["tokens"]
+    assert manager.get_stats()["slow_consumers_disconnected"] == 1
+
+    stalled.set()
+    await asyncio.sleep(0)
+    ws.close.assert_called_once_with(code=1008)
+
+@pytest.mark.asyncio
+async def test_token_delta_routed_per_subscriber(make_token):
+    """Test that per-token subscribers only receive their tokens, with their own sequence"""
+    from app.services.token_store import TokenStore, diff_snapshots
+
+    manager = WebSocketManager()
+    watcher, bystander = AsyncMock(), AsyncMock()
+    for ws in (watcher, bystander):
+        await manager.connect(ws)
+    manager.subscribe_tokens(watcher, ["a"])
+    manager.subscribe_tokens(bystander, ["c"])
+
+    store = TokenStore()
+    store.replace([make_token("a", volume_sol=1), make_token("b", volume_sol=1), make_token("c", volume_sol=1)])
+    old = store.snapshot(1)
+    store.replace([make_token("a", volume_sol=2), make_token("b", volume_sol=2), make_token("c", volume_sol=1)])
+    new = store.snapshot(2)
+
+    await manager.broadcast_token_delta(diff_snapshots(old.tokens, new.tokens), new)
+    await asyncio.sleep(0)
+
+    message = json.loads(watcher.send_text.call_args[0][0])
+    assert message["type"] == "subscription_delta"
+    assert message["data"]["seq"] == 1
+    assert list(message["data"]["changed"]) == ["a"]
+    assert message["data"]["changed"]["a"]["volume_sol"] == 2
+    bystander.send_text.assert_not_called()
+
+    snapshot = manager.subscription_snapshot_message(watcher, new)
+    assert snapshot["data"]["seq"] == 1
+    assert [t["token_address"] for t in snapshot["data"]["tokens"]] == ["a"]
+
+    manager.disconnect(watcher)
+    assert "a" not in manager.token_subscriptions.subscribers
+    manager.disconnect(bystander)
+
+@pytest.mark.asyncio
+async def test_broadcast_goes_through_bus(websocket_manager):
+    """Test that topic broadcasts are published once and delivered by the relay"""
+    websocket = AsyncMock()
+    await websocket_manager.connect(websocket)
+    websocket_manager.subscribe(websocket, "tokens")
+
+    bus = AsyncMock()
+    bus.publish.return_value = True
+    websocket_manager.bus = bus
+    await websocket_manager.broadcast_to_topic("tokens", {"type": "update"})
+
+    bus.publish.assert_awaited_once_with("tokens", json.dumps({"type": "update"}))
+    # Local sockets are served when the frame comes back from the channel
+    websocket.send_text.assert_not_called()
+
+    websocket_manager.deliver_to_topic("tokens", json.dumps({"type": "update"}))
+    await asyncio.sleep(0)
+    websocket.send_text.assert_called_once()
+    websocket_manager.disconnect(websocket)